@@ -0,0 +1,305 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+from pyrobot.robot import PyRobot
+from pyrobot.indicators import Indicators
+from pyrobot.stock_frame import StockFrame
+from pyrobot.scheduler import RequestScheduler
+from pyrobot.candle_cache import CandleCache
+
+
+class SimulatedBroker():
+
+    # Takes the place of `TDClient.place_order()` and fills the working
+    # orders against each new bar.
+    def __init__(self, initial_cash: float = 100000.0, commission: float = 0.0) -> None:
+
+        self.cash = initial_cash
+        self.commission = commission
+        self.positions: Dict[str, int] = {}
+        self.working_orders: List[dict] = []
+        self.fills: List[dict] = []
+        self.current_time: datetime = None
+
+        self._order_count = 0
+
+    def login(self) -> bool:
+        return True
+
+    def place_order(self, account: str, order: dict) -> dict:
+
+        self._order_count += 1
+        order_id = str(self._order_count)
+
+        self._add_working_order(order_id=order_id, order=copy.deepcopy(order))
+
+        return {
+            'order_id': order_id,
+            'headers': {},
+            'content': b'',
+            'status_code': 201,
+            'request_body': order,
+            'request_method': 'POST'
+        }
+
+    def _add_working_order(self, order_id: str, order: dict) -> None:
+
+        order_leg = order['orderLegCollection'][0]
+        instruction = order_leg['instruction']
+
+        quantity = order_leg['quantity']
+        if instruction in ['SELL', 'SELL_SHORT']:
+            quantity = -quantity
+
+        self.working_orders.append({
+            'order_id': order_id,
+            'order': order,
+            'symbol': order_leg['instrument']['symbol'],
+            'quantity': quantity,
+            'submitted': self.current_time,
+            'triggered': False,
+            'trail_extreme': None
+        })
+
+    @staticmethod
+    def _limit_fill(buying: bool, limit_price: float, open: float, high: float, low: float) -> Optional[float]:
+
+        if buying and low <= limit_price:
+            return min(open, limit_price)
+        elif not buying and high >= limit_price:
+            return max(open, limit_price)
+
+        return None
+
+    @staticmethod
+    def _stop_hit(buying: bool, stop_price: float, high: float, low: float) -> bool:
+
+        return high >= stop_price if buying else low <= stop_price
+
+    def _fill_price(self, working_order: dict, open: float, high: float, low: float) -> Optional[float]:
+
+        order = working_order['order']
+        order_type = order['orderType']
+        buying = working_order['quantity'] > 0
+
+        if order_type == 'MARKET':
+            return open
+
+        elif order_type == 'LIMIT':
+            return self._limit_fill(buying=buying, limit_price=order['price'], open=open, high=high, low=low)
+
+        elif order_type == 'STOP':
+
+            if self._stop_hit(buying=buying, stop_price=order['stopPrice'], high=high, low=low):
+                return max(open, order['stopPrice']) if buying else min(open, order['stopPrice'])
+
+        elif order_type == 'STOP_LIMIT':
+
+            # Once the stop trades it becomes a plain limit order.
+            if not working_order['triggered']:
+                working_order['triggered'] = self._stop_hit(buying=buying, stop_price=order['stopPrice'], high=high, low=low)
+
+            if working_order['triggered']:
+                return self._limit_fill(buying=buying, limit_price=order['price'], open=open, high=high, low=low)
+
+        elif order_type == 'TRAILING_STOP':
+
+            if working_order['trail_extreme'] is None:
+                working_order['trail_extreme'] = open
+
+            offset = order.get('stopPriceOffset', 0.0)
+            extreme = working_order['trail_extreme']
+
+            if order.get('stopPriceLinkType') == 'PERCENT':
+                stop_price = extreme * (1.0 + offset / 100.0) if buying else extreme * (1.0 - offset / 100.0)
+            else:
+                stop_price = extreme + offset if buying else extreme - offset
+
+            if self._stop_hit(buying=buying, stop_price=stop_price, high=high, low=low):
+                return max(open, stop_price) if buying else min(open, stop_price)
+
+            # Trail the best price seen since the order went live.
+            working_order['trail_extreme'] = min(extreme, low) if buying else max(extreme, high)
+
+        return None
+
+    def process_bars(self, bar_time: datetime, bars: Dict[str, Tuple[float, float, float, float]]) -> List[dict]:
+
+        new_fills = []
+        still_working = []
+        triggered_children = []
+
+        for working_order in self.working_orders:
+
+            bar = bars.get(working_order['symbol'])
+
+            # Orders only fill on bars that open after they were placed.
+            if bar is None or working_order['submitted'] >= bar_time:
+                still_working.append(working_order)
+                continue
+
+            fill_price = self._fill_price(working_order=working_order, open=bar[0], high=bar[1], low=bar[2])
+
+            if fill_price is None:
+                still_working.append(working_order)
+                continue
+
+            symbol = working_order['symbol']
+            quantity = working_order['quantity']
+
+            self.positions[symbol] = self.positions.get(symbol, 0) + quantity
+            self.cash -= quantity * fill_price + self.commission
+
+            new_fills.append({
+                'order_id': working_order['order_id'],
+                'symbol': symbol,
+                'quantity': quantity,
+                'price': fill_price,
+                'order_type': working_order['order']['orderType'],
+                'datetime': bar_time
+            })
+
+            # Child orders of a TRIGGER order go live once the parent fills.
+            triggered_children += working_order['order'].get('childOrderStrategies', [])
+
+        self.working_orders = still_working
+
+        for child_order in triggered_children:
+            self._order_count += 1
+            self._add_working_order(order_id=str(self._order_count), order=copy.deepcopy(child_order))
+
+        self.fills += new_fills
+
+        return new_fills
+
+
+class Backtester():
+
+    # Replays stored candles one bar time at a time through the same
+    # StockFrame, Indicators signals and `PyRobot.execute_signals()` used
+    # live, with a simulated clock and broker.
+    def __init__(self, candles: Dict[str, np.ndarray], initial_cash: float = 100000.0, commission: float = 0.0,
+                 trading_account: str = 'backtest') -> None:
+
+        self.broker = SimulatedBroker(initial_cash=initial_cash, commission=commission)
+
+        # Nothing leaves the process, so there's no quota to respect.
+        self.trading_robot = PyRobot(
+            client_id='backtest',
+            redirect_uri='',
+            trading_account=trading_account,
+            paper_trading=False,
+            td_client=self.broker,
+            scheduler=RequestScheduler(requests_per_minute=10**9, max_retries=0)
+        )
+        self.trading_robot.clock = lambda: self.broker.current_time
+        self.trading_robot.create_portfolio()
+
+        self.stock_frame: StockFrame = self.trading_robot.create_stock_frame(data=candles)
+        self.indicator_client = Indicators(price_data_frame=self.stock_frame)
+
+    @classmethod
+    def from_cache(cls, candle_cache: CandleCache, symbols: List[str], bar_type: str, bar_size: int, start: datetime = None,
+                   end: datetime = None, **kwargs) -> 'Backtester':
+
+        symbol_columns = []
+        for symbol in symbols:
+
+            cached_candles = candle_cache.load(
+                symbol=symbol,
+                bar_type=bar_type,
+                bar_size=bar_size,
+                start=int(start.timestamp() * 1000) if start else None,
+                end=int(end.timestamp() * 1000) if end else None
+            )
+
+            columns = {column: np.array(cached_candles[column]) for column in cached_candles.dtype.names}
+            columns['symbol'] = np.full(cached_candles.shape[0], symbol, dtype=object)
+            symbol_columns.append(columns)
+
+        candles = {
+            column: np.concatenate([columns[column] for columns in symbol_columns])
+            for column in ['symbol', 'open', 'close', 'high', 'low', 'volume', 'datetime']
+        }
+
+        return cls(candles=candles, **kwargs)
+
+    def run(self, trades_to_execute: dict) -> dict:
+
+        # Indicators only look backwards, so the columns computed over the
+        # whole history already hold the value each bar would have had live.
+        frame = self.stock_frame.frame
+
+        # Evaluate every signal rule over the whole history in one pass.
+        signal_matrix = self.indicator_client.signal_matrix()
+        buy_signals = signal_matrix['buys'].to_numpy()
+        sell_signals = signal_matrix['sells'].to_numpy()
+
+        symbol_codes, symbol_names = pd.factorize(frame.index.get_level_values(0))
+        time_codes, bar_times = pd.factorize(frame.index.get_level_values(1), sort=True)
+
+        # Row positions for each bar time, in one pass.
+        time_order = np.argsort(time_codes, kind='stable')
+        time_bounds = np.searchsorted(time_codes[time_order], np.arange(bar_times.shape[0] + 1))
+
+        opens = frame['open'].to_numpy()
+        highs = frame['high'].to_numpy()
+        lows = frame['low'].to_numpy()
+        closes = frame['close'].to_numpy()
+
+        last_close = np.zeros(symbol_names.shape[0])
+        symbol_index = {symbol: position for position, symbol in enumerate(symbol_names)}
+
+        equity = np.empty(bar_times.shape[0])
+        order_responses = []
+
+        for step, bar_time in enumerate(bar_times):
+
+            positions = time_order[time_bounds[step]:time_bounds[step + 1]]
+            self.broker.current_time = bar_time.to_pydatetime()
+
+            if self.broker.working_orders:
+                self.broker.process_bars(
+                    bar_time=self.broker.current_time,
+                    bars={
+                        symbol_names[symbol_codes[position]]: (opens[position], highs[position], lows[position], closes[position])
+                        for position in positions
+                    }
+                )
+
+            last_close[symbol_codes[positions]] = closes[positions]
+
+            step_buys = positions[buy_signals[positions]]
+            step_sells = positions[sell_signals[positions]]
+
+            if step_buys.shape[0] > 0 or step_sells.shape[0] > 0:
+
+                signals = {
+                    'buys': pd.Series(data=True, index=frame.index[step_buys], dtype='bool'),
+                    'sells': pd.Series(data=True, index=frame.index[step_sells], dtype='bool')
+                }
+
+                order_responses += self.trading_robot.execute_signals(
+                    signals=signals,
+                    trades_to_execute=trades_to_execute,
+                    save=False
+                )
+
+            equity[step] = self.broker.cash + sum(
+                quantity * last_close[symbol_index[symbol]]
+                for symbol, quantity in self.broker.positions.items()
+                if symbol in symbol_index
+            )
+
+        return {
+            'equity': pd.Series(data=equity, index=bar_times, name='equity'),
+            'fills': self.broker.fills,
+            'orders': order_responses,
+            'positions': dict(self.broker.positions),
+            'cash': self.broker.cash
+        }
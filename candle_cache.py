@@ -0,0 +1,165 @@
+import os
+import pathlib
+
+import numpy as np
+
+from typing import Dict, List, Tuple, Union
+
+candle_dtype = np.dtype([
+    ('datetime', 'int64'),
+    ('open', 'float64'),
+    ('close', 'float64'),
+    ('high', 'float64'),
+    ('low', 'float64'),
+    ('volume', 'int64')
+])
+
+
+class CandleCache():
+
+    # One `.npy` file of candles per symbol and bar size, sorted by datetime
+    # (milliseconds since epoch), loaded memory-mapped. Next to it a small
+    # `.ranges.npy` file keeps the time ranges already fetched, so holes in
+    # the middle of the cache are fetched too.
+    def __init__(self, folder: Union[str, pathlib.Path]) -> None:
+
+        self.folder = pathlib.Path(folder)
+
+        if not self.folder.exists():
+            self.folder.mkdir(parents=True)
+
+    def _file_path(self, symbol: str, bar_type: str, bar_size: int) -> pathlib.Path:
+
+        return self.folder.joinpath(
+            "{symbol}_{bar_type}_{bar_size}.npy".format(
+                symbol=symbol.replace('/', '_'),
+                bar_type=bar_type,
+                bar_size=bar_size
+            )
+        )
+
+    def _ranges_path(self, symbol: str, bar_type: str, bar_size: int) -> pathlib.Path:
+
+        return self._file_path(symbol=symbol, bar_type=bar_type, bar_size=bar_size).with_suffix('.ranges.npy')
+
+    def covered_ranges(self, symbol: str, bar_type: str, bar_size: int) -> np.ndarray:
+
+        ranges_path = self._ranges_path(symbol=symbol, bar_type=bar_type, bar_size=bar_size)
+
+        if ranges_path.exists():
+            return np.load(ranges_path)
+
+        # Caches written before the ranges were kept cover first to last bar.
+        candles = self.load(symbol=symbol, bar_type=bar_type, bar_size=bar_size)
+
+        if candles.shape[0] == 0:
+            return np.empty((0, 2), dtype='int64')
+
+        return np.array([[candles['datetime'][0], candles['datetime'][-1]]], dtype='int64')
+
+    @staticmethod
+    def _merge_ranges(ranges: np.ndarray) -> np.ndarray:
+
+        # Sorted, with overlapping or touching ranges joined up.
+        ranges = np.asarray(ranges, dtype='int64').reshape(-1, 2)
+        ranges = ranges[np.argsort(ranges[:, 0], kind='stable')]
+
+        merged = []
+        for range_start, range_end in ranges.tolist():
+
+            if merged and range_start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], range_end)
+            else:
+                merged.append([range_start, range_end])
+
+        return np.array(merged, dtype='int64').reshape(-1, 2)
+
+    def load(self, symbol: str, bar_type: str, bar_size: int, start: int = None, end: int = None) -> np.ndarray:
+
+        file_path = self._file_path(symbol=symbol, bar_type=bar_type, bar_size=bar_size)
+
+        if not file_path.exists():
+            return np.empty(0, dtype=candle_dtype)
+
+        candles = np.load(file_path, mmap_mode='r')
+
+        # Slice out the requested window without touching the rest.
+        first = 0 if start is None else np.searchsorted(candles['datetime'], start, side='left')
+        last = candles.shape[0] if end is None else np.searchsorted(candles['datetime'], end, side='right')
+
+        return candles[first:last]
+
+    def missing_ranges(self, symbol: str, bar_type: str, bar_size: int, start: int, end: int) -> List[Tuple[int, int]]:
+
+        candles = self.load(symbol=symbol, bar_type=bar_type, bar_size=bar_size)
+        covered = self.covered_ranges(symbol=symbol, bar_type=bar_type, bar_size=bar_size)
+
+        # The last cached bar may have been fetched before it closed, so it
+        # doesn't count as covered and gets grabbed again.
+        if candles.shape[0] > 0:
+            last_cached = int(candles['datetime'][-1])
+            covered = np.column_stack([covered[:, 0], np.minimum(covered[:, 1], last_cached - 1)])
+            covered = covered[covered[:, 0] <= covered[:, 1]]
+
+        ranges = []
+        position = start
+
+        for range_start, range_end in covered.tolist():
+
+            if range_end < position:
+                continue
+
+            if range_start > end:
+                break
+
+            if range_start > position:
+                ranges.append((position, range_start - 1))
+
+            position = range_end + 1
+
+        if position <= end:
+            ranges.append((position, end))
+
+        return ranges
+
+    def store(self, symbol: str, bar_type: str, bar_size: int, columns: Dict[str, np.ndarray],
+              fetched_ranges: List[Tuple[int, int]] = None) -> np.ndarray:
+
+        # `fetched_ranges` are the time ranges the candles were fetched for;
+        # without them the candles only cover their own first to last bar.
+
+        new_candles = np.empty(len(columns['datetime']), dtype=candle_dtype)
+        for column in candle_dtype.names:
+            new_candles[column] = columns[column]
+
+        cached_candles = np.array(self.load(symbol=symbol, bar_type=bar_type, bar_size=bar_size))
+        covered = self.covered_ranges(symbol=symbol, bar_type=bar_type, bar_size=bar_size)
+
+        # New candles win over cached ones with the same timestamp.
+        candles = np.concatenate([new_candles, cached_candles])
+        _, keep = np.unique(candles['datetime'], return_index=True)
+        candles = candles[keep]
+
+        # Write to a temporary file first, so a crash never leaves half a cache.
+        file_path = self._file_path(symbol=symbol, bar_type=bar_type, bar_size=bar_size)
+        temporary_path = file_path.with_suffix('.tmp.npy')
+
+        np.save(temporary_path, candles)
+        os.replace(temporary_path, file_path)
+
+        if fetched_ranges is None:
+            fetched_ranges = [(int(new_candles['datetime'].min()), int(new_candles['datetime'].max()))] if new_candles.shape[0] else []
+
+        # The candles go in first, so a crash in between only means fetching a range again.
+        ranges = self._merge_ranges(np.concatenate([
+            covered,
+            np.array(fetched_ranges, dtype='int64').reshape(-1, 2)
+        ]))
+
+        ranges_path = self._ranges_path(symbol=symbol, bar_type=bar_type, bar_size=bar_size)
+        temporary_path = ranges_path.with_suffix('.tmp.npy')
+
+        np.save(temporary_path, ranges)
+        os.replace(temporary_path, ranges_path)
+
+        return candles
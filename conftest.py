@@ -0,0 +1,14 @@
+import sys
+import types
+import pathlib
+
+# The modules import each other as `pyrobot.<module>`. When the tests run
+# from a plain checkout this folder is that package, so register it as such.
+if 'pyrobot' not in sys.modules:
+
+    try:
+        import pyrobot
+    except ImportError:
+        pyrobot = types.ModuleType('pyrobot')
+        pyrobot.__path__ = [str(pathlib.Path(__file__).parent)]
+        sys.modules['pyrobot'] = pyrobot
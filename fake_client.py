@@ -0,0 +1,149 @@
+import time
+import zlib
+import threading
+
+import numpy as np
+
+from datetime import datetime
+from typing import List, Dict, Optional
+
+
+class FakeTDClient():
+
+    # Stands in for `TDClient` so the robot can run offline. Prices are a
+    # deterministic function of the symbol and the bar timestamp, so
+    # overlapping requests always agree with each other.
+    def __init__(self, latency: float = 0.0, failures: Optional[Dict[str, int]] = None) -> None:
+
+        self.latency = latency
+        self.failures = failures or {}
+        self.calls: Dict[str, int] = {}
+        self.orders: List[dict] = []
+
+        self._lock = threading.Lock()
+        self._order_count = 0
+
+    def _record_call(self, name: str, symbol: str = None) -> None:
+
+        with self._lock:
+
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+            # Fail the first few calls for a symbol, if asked to.
+            if symbol and self.failures.get(symbol, 0) > 0:
+                self.failures[symbol] -= 1
+                raise ConnectionError("Simulated failure for {symbol}".format(symbol=symbol))
+
+        if self.latency:
+            time.sleep(self.latency)
+
+    def login(self) -> bool:
+        return True
+
+    def _prices(self, symbol: str, timestamps: np.ndarray) -> Dict[str, np.ndarray]:
+
+        base_price = 20.0 + zlib.crc32(symbol.encode()) % 300
+        minutes = timestamps / 60000.0
+
+        close = base_price * (1.0 + 0.02 * np.sin(minutes / 97.0) + 0.005 * np.sin(minutes / 7.0))
+        open = base_price * (1.0 + 0.02 * np.sin((minutes - 1.0) / 97.0) + 0.005 * np.sin((minutes - 1.0) / 7.0))
+        spread = base_price * 0.001 * (1.0 + np.abs(np.sin(minutes / 3.0)))
+
+        return {
+            'open': np.round(open, 2),
+            'close': np.round(close, 2),
+            'high': np.round(np.maximum(open, close) + spread, 2),
+            'low': np.round(np.minimum(open, close) - spread, 2),
+            'volume': (1000 + (minutes.astype('int64') * 7919 + zlib.crc32(symbol.encode())) % 5000).astype('int64')
+        }
+
+    def get_price_history(self, symbol: str, period_type: str = None, period: str = None, start_date: str = None, end_date: str = None,
+                          frequency_type: str = None, frequency: str = None, extended_hours: bool = True) -> Dict:
+
+        self._record_call(name='get_price_history', symbol=symbol)
+
+        bar_lengths = {
+            'minute': 60000,
+            'daily': 86400000,
+            'weekly': 604800000
+        }
+
+        bar_length = bar_lengths[frequency_type or 'minute'] * int(frequency or 1)
+
+        end_date = int(end_date) if end_date else int(datetime.now().timestamp() * 1000)
+        start_date = int(start_date) if start_date else end_date - 86400000
+
+        # Bars open on whole multiples of the bar length.
+        first_bar = -(-start_date // bar_length) * bar_length
+        timestamps = np.arange(first_bar, end_date + 1, bar_length, dtype='int64')
+
+        prices = self._prices(symbol=symbol, timestamps=timestamps)
+
+        candles = [
+            {
+                'open': open,
+                'high': high,
+                'low': low,
+                'close': close,
+                'volume': volume,
+                'datetime': timestamp
+            }
+            for open, high, low, close, volume, timestamp in zip(
+                prices['open'].tolist(),
+                prices['high'].tolist(),
+                prices['low'].tolist(),
+                prices['close'].tolist(),
+                prices['volume'].tolist(),
+                timestamps.tolist()
+            )
+        ]
+
+        return {
+            'candles': candles,
+            'symbol': symbol,
+            'empty': len(candles) == 0
+        }
+
+    def get_quotes(self, instruments: List) -> Dict:
+
+        self._record_call(name='get_quotes')
+
+        now = int(datetime.now().timestamp() * 1000)
+        last_bar = now // 60000 * 60000
+
+        quotes = {}
+        for symbol in instruments:
+
+            prices = self._prices(symbol=symbol, timestamps=np.array([last_bar], dtype='int64'))
+
+            quotes[symbol] = {
+                'symbol': symbol,
+                'openPrice': prices['open'][0],
+                'closePrice': prices['close'][0],
+                'highPrice': prices['high'][0],
+                'lowPrice': prices['low'][0],
+                'lastPrice': prices['close'][0],
+                'askSize': int(prices['volume'][0]) // 2,
+                'bidsize': int(prices['volume'][0]) // 2,
+                'quoteTimeInLong': now
+            }
+
+        return quotes
+
+    def place_order(self, account: str, order: dict) -> dict:
+
+        self._record_call(name='place_order')
+
+        with self._lock:
+            self._order_count += 1
+            order_id = str(self._order_count)
+            self.orders.append(order)
+
+        return {
+            'order_id': order_id,
+            'headers': {},
+            'content': b'',
+            'status_code': 201,
+            'request_body': order,
+            'request_method': 'POST'
+        }
@@ -0,0 +1,250 @@
+import numpy as np
+import pandas as pd
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+
+from pyrobot.kernels import diff, running_totals, rolling_mean, ewm_mean, up_down_days, relative_strength_index
+
+
+class IndicatorState(ABC):
+
+    def __init__(self) -> None:
+
+        self.last_timestamp: Optional[pd.Timestamp] = None
+
+    @abstractmethod
+    def seed(self, values: np.ndarray) -> None:
+        pass
+
+    @abstractmethod
+    def update(self, values: np.ndarray) -> np.ndarray:
+        pass
+
+    # Snapshots rebuild a state from its class, `parameters` and the flat
+    # array `get_state()` returns.
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        return {}
+
+    @abstractmethod
+    def get_state(self) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def set_state(self, values: np.ndarray) -> None:
+        pass
+
+
+class DiffState(IndicatorState):
+
+    def __init__(self) -> None:
+
+        super().__init__()
+        self.last_value = np.nan
+
+    def seed(self, values: np.ndarray) -> None:
+
+        if values.shape[0] > 0:
+            self.last_value = values[-1]
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+
+        values = np.asarray(values, dtype='float64')
+
+        output = np.empty(values.shape[0])
+        output[0] = values[0] - self.last_value
+        output[1:] = values[1:] - values[:-1]
+
+        self.last_value = values[-1]
+
+        return output
+
+    def get_state(self) -> np.ndarray:
+        return np.array([self.last_value], dtype='float64')
+
+    def set_state(self, values: np.ndarray) -> None:
+        self.last_value = float(values[0])
+
+
+class EwmState(IndicatorState):
+
+    # Mirrors the pandas `ewm(span=...).mean()` recursion (adjust=True,
+    # ignore_na=False) so updates match a full recompute bit for bit.
+    def __init__(self, span: int) -> None:
+
+        super().__init__()
+
+        center_of_mass = (span - 1) / 2.0
+        alpha = 1.0 / (1.0 + center_of_mass)
+
+        self.span = span
+        self.decay = 1.0 - alpha
+        self.weighted = np.nan
+        self.old_weight = 1.0
+
+    def seed(self, values: np.ndarray) -> None:
+
+        values = np.asarray(values, dtype='float64')
+        observed = ~np.isnan(values)
+
+        if not observed.any():
+            return
+
+        self.weighted = ewm_mean(values=values, span=self.span)[-1]
+
+        # The old weight only depends on which rows were observed, and stops
+        # changing once it hits its floating point fixed point.
+        missing = ~observed[np.argmax(observed) + 1:]
+        last_missing = np.flatnonzero(missing)[-1] if missing.any() else -1
+
+        old_weight = 1.0
+        for position, is_missing in enumerate(missing):
+
+            previous_weight = old_weight
+            old_weight *= self.decay
+
+            if not is_missing:
+                old_weight += 1.0
+
+            if old_weight == previous_weight and position > last_missing:
+                break
+
+        self.old_weight = old_weight
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+
+        output = np.empty(len(values))
+
+        weighted = self.weighted
+        old_weight = self.old_weight
+        decay = self.decay
+
+        for position, value in enumerate(values.tolist()):
+
+            if weighted == weighted:
+
+                old_weight *= decay
+
+                if value == value:
+
+                    if weighted != value:
+                        weighted = old_weight * weighted + value
+                        weighted /= (old_weight + 1.0)
+
+                    old_weight += 1.0
+
+            elif value == value:
+                weighted = value
+
+            output[position] = weighted
+
+        self.weighted = weighted
+        self.old_weight = old_weight
+
+        return output
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        return {'span': self.span}
+
+    def get_state(self) -> np.ndarray:
+        return np.array([self.weighted, self.old_weight], dtype='float64')
+
+    def set_state(self, values: np.ndarray) -> None:
+        self.weighted = float(values[0])
+        self.old_weight = float(values[1])
+
+
+class RollingMeanState(IndicatorState):
+
+    # Keeps the last `window - 1` values and the running totals in front of
+    # them, so updates carry on the same running totals a full recompute
+    # builds and match it bit for bit.
+    def __init__(self, window: int) -> None:
+
+        super().__init__()
+        self.window = window
+        self.tail = np.empty(0)
+        self.start = (0.0, 0.0)
+
+    def _keep_tail(self, values: np.ndarray, start: Tuple[float, float]) -> None:
+
+        tail_size = min(self.window - 1, values.shape[0])
+        totals = running_totals(values=values[:values.shape[0] - tail_size], start=start)
+
+        self.tail = values[values.shape[0] - tail_size:].copy()
+        self.start = (float(totals[0, -1]), float(totals[1, -1]))
+
+    def seed(self, values: np.ndarray) -> None:
+
+        self._keep_tail(values=np.asarray(values, dtype='float64'), start=(0.0, 0.0))
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+
+        history = np.concatenate([self.tail, np.asarray(values, dtype='float64')])
+        output = rolling_mean(values=history, window=self.window, start=self.start)[self.tail.shape[0]:]
+
+        self._keep_tail(values=history, start=self.start)
+
+        return output
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        return {'window': self.window}
+
+    def get_state(self) -> np.ndarray:
+        return np.concatenate([self.start, self.tail])
+
+    def set_state(self, values: np.ndarray) -> None:
+        self.start = (float(values[0]), float(values[1]))
+        self.tail = np.array(values[2:], dtype='float64')
+
+
+class RsiState(IndicatorState):
+
+    def __init__(self, period: int) -> None:
+
+        super().__init__()
+        self.period = period
+        self.change_in_price = DiffState()
+        self.ewma_up = EwmState(span=period)
+        self.ewma_down = EwmState(span=period)
+
+    def seed(self, values: np.ndarray) -> None:
+
+        values = np.asarray(values, dtype='float64')
+
+        up_day, down_day = up_down_days(change_in_price=diff(values=values))
+
+        self.change_in_price.seed(values=values)
+        self.ewma_up.seed(values=up_day)
+        self.ewma_down.seed(values=down_day)
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+
+        change_in_price = self.change_in_price.update(values=values)
+        up_day, down_day = up_down_days(change_in_price=change_in_price)
+
+        return relative_strength_index(
+            ewma_up=self.ewma_up.update(values=up_day),
+            ewma_down=self.ewma_down.update(values=down_day)
+        )
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        return {'period': self.period}
+
+    def get_state(self) -> np.ndarray:
+
+        return np.concatenate([
+            self.change_in_price.get_state(),
+            self.ewma_up.get_state(),
+            self.ewma_down.get_state()
+        ])
+
+    def set_state(self, values: np.ndarray) -> None:
+
+        self.change_in_price.set_state(values=values[0:1])
+        self.ewma_up.set_state(values=values[1:3])
+        self.ewma_down.set_state(values=values[3:5])
@@ -5,15 +5,42 @@ import pandas as pd
 from typing import List, Dict, Union, Optional, Tuple, Any
 
 from pyrobot.stock_frame import StockFrame
+from pyrobot.indicator_state import IndicatorState, DiffState, EwmState, RollingMeanState, RsiState
+from pyrobot import kernels
 
 class Indicators():
-    def __init__(self, price_data_frame: StockFrame) -> None:
+    def __init__(self, price_data_frame: StockFrame, streaming: bool = False) -> None:
 
         self._stock_frame: StockFrame = price_data_frame
-        self._price_groups = self._stock_frame.symbol_groups
         self._current_indicators = {}
         self._indicator_signals = {}
         self._frame = self._stock_frame.frame
+        self._segments = None
+
+        # Kernel outputs shared between indicators, kept until the next refresh.
+        self._computed_series = {}
+        self._refreshing = False
+
+        # In streaming mode each indicator keeps running state per symbol,
+        # and `refresh()` only computes the rows appended since last time.
+        self._streaming = streaming
+        self._indicator_states = {}
+
+        # The earliest stored bar each symbol had replaced since the last
+        # refresh; its states get rebuilt from there.
+        self._revised: Dict[str, pd.Timestamp] = {}
+
+        if self._streaming:
+            self._stock_frame.add_bar_listener(self._on_bars)
+
+    def _on_bars(self, batch: Dict[str, np.ndarray]) -> None:
+
+        revised = batch['revised']
+
+        for symbol, datetime in zip(batch['symbol'][revised], batch['datetime'][revised]):
+
+            revised_at = pd.Timestamp(datetime, unit='ms')
+            self._revised[symbol] = min(revised_at, self._revised.get(symbol, revised_at))
 
     def set_indicator_signals(self, indicator: str, buy: float, sell: float, condition_buy: Any, condition_sell: Any) -> None:
         
@@ -27,6 +54,22 @@ class Indicators():
         self._indicator_signals[indicator]['buy_operator'] = condition_buy
         self._indicator_signals[indicator]['sell_operator'] = condition_sell
 
+    def set_indicator_signal_compare(self, indicator_1: str, indicator_2: str, condition_buy: Any, condition_sell: Any,
+                                     crossover: bool = False) -> None:
+
+        # Compares two indicator columns, e.g. `sma_50` against `sma_200`. With
+        # `crossover` the signal only fires on the bar where the comparison
+        # turns true, not on every bar after it.
+        key = "{indicator_1}_comp_{indicator_2}".format(indicator_1=indicator_1, indicator_2=indicator_2)
+
+        self._indicator_signals[key] = {
+            'indicator_1': indicator_1,
+            'indicator_2': indicator_2,
+            'buy_operator': condition_buy,
+            'sell_operator': condition_sell,
+            'crossover': crossover
+        }
+
     def get_indicator_signals(self, indicator: Optional[str]) -> Dict:
         if indicator and indicator in self._indicator_signals:
             return self._indicator_signals[indicator]
@@ -48,115 +91,403 @@ class Indicators():
         del locals_data['self']
 
         column_name = 'change_in_price'
-        self._current_indicators[column_name] = {}
-        self._current_indicators[column_name]['args'] = locals_data
-        self._current_indicators[column_name]['func'] = self.change_in_price
+        if self._register(column_name=column_name, func=self.change_in_price, args=locals_data):
+            return self._frame
 
-        self._frame[column_name] = self._price_groups['close'].transform(
+        self._frame[column_name] = self._computed(kernel=kernels.diff, source='close')
 
-            lambda x: x.diff()
-        )
+        if self._streaming:
+            self._seed_states(column_name=column_name, state_factory=DiffState)
 
     def rsi(self, period: int, method: str = 'wilders') -> pd.DataFrame:
 
         locals_data = locals()
         del locals_data['self']
 
-        column_name = 'rsi'
-        self._current_indicators[column_name] = {}
-        self._current_indicators[column_name]['args'] = locals_data
-        self._current_indicators[column_name]['func'] = self.rsi
-
-        if 'change_in_price' not in self._frame.columns:
-            self.change_in_price()
+        column_name = self._indicator_name('rsi', period)
+        if self._register(column_name=column_name, func=self.rsi, args=locals_data):
+            return self._frame
 
-        #Define the up days
-        self._frame['up_day'] = self._price_groups['change_in_price'].transform(
-            lambda x : np.where(x >= 0, x, 0)
-        )
+        # Add the RSI indicator to the data frame
+        self._frame[column_name] = self._computed(kernel=kernels.rsi, source='close', period=period)
 
-        self._frame['down_day'] = self._price_groups['change_in_price'].transform(
-            lambda x : np.where(x < 0, x.abs(), 0)
-        )
+        if self._streaming:
+            self._seed_states(column_name=column_name, state_factory=lambda: RsiState(period=period))
 
-        self._frame['ewma_up'] = self._price_groups['up_day'].transform(
-            lambda x : x.ewm(span=period).mean()
-        )
+        return self._frame
+    
+    def sma(self, period: int) -> pd.DataFrame:
+                
+        locals_data = locals()
+        del locals_data['self']
 
-        self._frame['ewma_down'] = self._price_groups['down_day'].transform(
-            lambda x : x.ewm(span=period).mean()
-        )
+        column_name = self._indicator_name('sma', period)
+        if self._register(column_name=column_name, func=self.sma, args=locals_data):
+            return self._frame
 
-        relative_strength = self._frame['ewma_up'] / self._frame['ewma_down']
+        # Add the SMA
+        self._frame[column_name] = self._computed(kernel=kernels.rolling_mean, source='close', window=period)
 
-        relative_strength_index = 100.0 - (100.0 / (1.0 + relative_strength))
+        if self._streaming:
+            self._seed_states(column_name=column_name, state_factory=lambda: RollingMeanState(window=period))
 
-        # Add the RSI indicator to the data frame
-        self._frame['rsi'] = np.where(relative_strength_index == 0, 100, 100.0 - (100.0 / (1.0 + relative_strength)))
+        return self._frame
+    
+    def ema(self, period: int, alpha: float = 0.0) -> pd.DataFrame:
+        locals_data = locals()
+        del locals_data['self']
 
-        # clean up before sending back
-        self._frame.drop(
+        column_name = self._indicator_name('ema', period)
+        if self._register(column_name=column_name, func=self.ema, args=locals_data):
+            return self._frame
 
-            labels=['ewma_up', 'ewma_down', "down_day", "up_day", "change_in_price"],
-            axis = 1,
-            inplace=True
+        # Add the EMA
+        self._frame[column_name] = self._computed(kernel=kernels.ewm_mean, source='close', span=period)
 
-        )
+        if self._streaming:
+            self._seed_states(column_name=column_name, state_factory=lambda: EwmState(span=period))
 
         return self._frame
     
-    def sma(self, period: int) -> pd.DataFrame:
-                
+    def bollinger_bands(self, period: int = 20, standard_deviations: float = 2.0) -> pd.DataFrame:
+
         locals_data = locals()
         del locals_data['self']
 
-        column_name = 'sma'
-        self._current_indicators[column_name] = {}
-        self._current_indicators[column_name]['args'] = locals_data
-        self._current_indicators[column_name]['func'] = self.sma
+        # Registered under the upper band, so asking again finds it in the frame.
+        band_upper = self._indicator_name('band_upper', period, standard_deviations)
+        if self._register(column_name=band_upper, func=self.bollinger_bands, args=locals_data):
+            return self._frame
 
-        # Add the SMA
-        self._frame[column_name] = self._price_groups['close'].transform(
-            lambda x: x.rolling(window=period).mean()
+        # Same rolling mean as `sma()` with the same period.
+        moving_average = self._computed(kernel=kernels.rolling_mean, source='close', window=period)
+        moving_std = self._computed(kernel=kernels.rolling_std, source='close', window=period)
+
+        band_lower = self._indicator_name('band_lower', period, standard_deviations)
+        band_width = self._indicator_name('band_width', period, standard_deviations)
+
+        self._frame[band_upper] = moving_average + standard_deviations * moving_std
+        self._frame[band_lower] = moving_average - standard_deviations * moving_std
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._frame[band_width] = 2.0 * standard_deviations * moving_std / moving_average
+
+        return self._frame
+
+    def rate_of_change(self, period: int = 1) -> pd.DataFrame:
+
+        locals_data = locals()
+        del locals_data['self']
+
+        column_name = self._indicator_name('rate_of_change', period)
+        if self._register(column_name=column_name, func=self.rate_of_change, args=locals_data):
+            return self._frame
+
+        self._frame[column_name] = self._computed(kernel=kernels.rate_of_change, source='close', period=period)
+
+        return self._frame
+
+    def average_true_range(self, period: int = 14) -> pd.DataFrame:
+
+        locals_data = locals()
+        del locals_data['self']
+
+        column_name = self._indicator_name('average_true_range', period)
+        if self._register(column_name=column_name, func=self.average_true_range, args=locals_data):
+            return self._frame
+
+        self._computed(kernel=kernels.true_range, source=('high', 'low', 'close'), name='true_range')
+
+        self._frame[column_name] = self._computed(kernel=kernels.wilder_mean, source='true_range', period=period)
+
+        return self._frame
+
+    def stochastic_oscillator(self, period: int = 14, smoothing_period: int = 3) -> pd.DataFrame:
+
+        locals_data = locals()
+        del locals_data['self']
+
+        column_name = self._indicator_name('stochastic_oscillator', period, smoothing_period)
+        if self._register(column_name=column_name, func=self.stochastic_oscillator, args=locals_data):
+            return self._frame
+
+        highest_high = self._computed(kernel=kernels.rolling_max, source='high', window=period)
+        lowest_low = self._computed(kernel=kernels.rolling_min, source='low', window=period)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent_k = 100.0 * (self._source(name='close') - lowest_low) / (highest_high - lowest_low)
+
+        percent_k_name = 'stochastic_k_{period}'.format(period=period)
+        self._computed_series[percent_k_name] = percent_k
+
+        self._frame[column_name] = percent_k
+        self._frame[self._indicator_name('stochastic_signal', period, smoothing_period)] = self._computed(kernel=kernels.rolling_mean, source=percent_k_name, window=smoothing_period)
+
+        return self._frame
+
+    def macd(self, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> pd.DataFrame:
+
+        locals_data = locals()
+        del locals_data['self']
+
+        column_name = self._indicator_name('macd', fast_period, slow_period, signal_period)
+        if self._register(column_name=column_name, func=self.macd, args=locals_data):
+            return self._frame
+
+        # Same averages as `ema()` with the same periods.
+        fast_average = self._computed(kernel=kernels.ewm_mean, source='close', span=fast_period)
+        slow_average = self._computed(kernel=kernels.ewm_mean, source='close', span=slow_period)
+
+        macd_name = 'macd_{fast}_{slow}'.format(fast=fast_period, slow=slow_period)
+        self._computed_series[macd_name] = fast_average - slow_average
+
+        signal_line = self._computed(kernel=kernels.ewm_mean, source=macd_name, span=signal_period)
+
+        self._frame[column_name] = self._computed_series[macd_name]
+        self._frame[self._indicator_name('macd_signal', fast_period, slow_period, signal_period)] = signal_line
+        self._frame[self._indicator_name('macd_histogram', fast_period, slow_period, signal_period)] = (
+            self._computed_series[macd_name] - signal_line
         )
 
         return self._frame
-    
-    def ema(self, period: int, alpha: float = 0.0) -> pd.DataFrame:
+
+    def mass_index(self, period: int = 9, sum_period: int = 25) -> pd.DataFrame:
+
         locals_data = locals()
         del locals_data['self']
 
-        column_name = 'ema'
-        self._current_indicators[column_name] = {}
-        self._current_indicators[column_name]['args'] = locals_data
-        self._current_indicators[column_name]['func'] = self.ema
+        column_name = self._indicator_name('mass_index', period, sum_period)
+        if self._register(column_name=column_name, func=self.mass_index, args=locals_data):
+            return self._frame
 
-        # Add the SMA
-        self._frame[column_name] = self._price_groups['close'].transform(
-            lambda x: x.ema(span=period).mean()
+        if 'price_range' not in self._computed_series:
+            self._computed_series['price_range'] = self._source(name='high') - self._source(name='low')
+
+        single_name = 'price_range_ema_{period}'.format(period=period)
+        single_average = self._computed(kernel=kernels.ewm_mean, source='price_range', span=period, name=single_name)
+        double_average = self._computed(kernel=kernels.ewm_mean, source=single_name, span=period)
+
+        ratio_name = 'mass_ratio_{period}'.format(period=period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._computed_series[ratio_name] = single_average / double_average
+
+        self._frame[column_name] = self._computed(kernel=kernels.rolling_sum, source=ratio_name, window=sum_period)
+
+        return self._frame
+
+    def kst_oscillator(self, r1: int, r2: int, r3: int, r4: int, n1: int, n2: int, n3: int, n4: int,
+                       signal_period: int = 9) -> pd.DataFrame:
+
+        locals_data = locals()
+        del locals_data['self']
+
+        column_name = self._indicator_name('kst_oscillator', r1, r2, r3, r4, n1, n2, n3, n4, signal_period)
+        if self._register(column_name=column_name, func=self.kst_oscillator, args=locals_data):
+            return self._frame
+
+        # Weighted sum of smoothed rates of change, sharing them with `rate_of_change()`.
+        kst = np.zeros(self._frame.shape[0])
+        for weight, (roc_period, smoothing_period) in enumerate(zip([r1, r2, r3, r4], [n1, n2, n3, n4]), start=1):
+
+            roc_name = 'rate_of_change_{period}'.format(period=roc_period)
+            self._computed(kernel=kernels.rate_of_change, source='close', period=roc_period, name=roc_name)
+
+            kst += weight * self._computed(kernel=kernels.rolling_mean, source=roc_name, window=smoothing_period)
+
+        kst *= 100.0
+
+        kst_name = self._indicator_name('kst', r1, r2, r3, r4, n1, n2, n3, n4)
+        self._computed_series[kst_name] = kst
+
+        self._frame[column_name] = kst
+        self._frame[self._indicator_name('kst_signal', r1, r2, r3, r4, n1, n2, n3, n4, signal_period)] = self._computed(
+            kernel=kernels.rolling_mean,
+            source=kst_name,
+            window=signal_period
         )
 
         return self._frame
-    
+
+    @staticmethod
+    def _indicator_name(indicator: str, *parameters: Any) -> str:
+
+        # `sma(period=50)` lives in `sma_50`, so several windows can sit side by side.
+        return '_'.join([indicator] + ['{parameter:g}'.format(parameter=parameter) for parameter in parameters])
+
+    def _register(self, column_name: str, func: Any, args: dict) -> bool:
+
+        registered = self._current_indicators.get(column_name)
+
+        self._current_indicators[column_name] = {}
+        self._current_indicators[column_name]['args'] = args
+        self._current_indicators[column_name]['func'] = func
+
+        # Asking for an indicator that's already in the frame is a no-op,
+        # except when `refresh()` is recomputing it.
+        return (
+            not self._refreshing and
+            registered is not None and
+            registered['args'] == args and
+            column_name in self._frame.columns
+        )
+
+    def _source(self, name: str) -> np.ndarray:
+
+        # Named intermediate series first, then the price columns.
+        if name in self._computed_series:
+            return self._computed_series[name]
+
+        return self._frame[name].to_numpy(dtype='float64')
+
+    def _computed(self, kernel: Any, source: Union[str, Tuple[str, ...]], name: str = None, **kwargs) -> np.ndarray:
+
+        # Each kernel runs once per refresh for a given input and parameters,
+        # however many indicators ask for it. A `name` lets other kernels
+        # take the result as their input.
+        key = (kernel.__name__, source, tuple(sorted(kwargs.items())))
+
+        if key not in self._computed_series:
+
+            sources = source if isinstance(source, tuple) else (source,)
+
+            self._computed_series[key] = self._apply_kernel(
+                kernel=kernel,
+                values=tuple(self._source(name=source_name) for source_name in sources),
+                **kwargs
+            )
+
+        if name:
+            self._computed_series[name] = self._computed_series[key]
+
+        return self._computed_series[key]
+
+    def _apply_kernel(self, kernel: Any, values: Tuple[np.ndarray, ...], **kwargs) -> np.ndarray:
+
+        # Run the kernel over each symbol's rows, writing into one output column.
+        if self._segments is None:
+            self._segments = list(self._stock_frame.symbol_slices.values())
+
+        return kernels.apply_by_segment(
+            kernel,
+            values=values,
+            segments=self._segments,
+            **kwargs
+        )
+
+    def _seed_states(self, column_name: str, state_factory: Any) -> None:
+
+        closes = self._frame['close'].to_numpy()
+        datetimes = self._frame.index.get_level_values(1)
+
+        states = {}
+        for symbol, symbol_slice in self._stock_frame.symbol_slices.items():
+
+            state: IndicatorState = state_factory()
+            state.seed(values=closes[symbol_slice])
+            state.last_timestamp = datetimes[symbol_slice.stop - 1]
+
+            states[symbol] = state
+
+        self._indicator_states[column_name] = {
+            'factory': state_factory,
+            'symbols': states
+        }
+
+    def _refresh_streaming(self) -> None:
+
+        closes = self._frame['close'].to_numpy()
+        datetimes = self._frame.index.get_level_values(1)
+
+        updates = {column_name: ([], []) for column_name in self._indicator_states}
+
+        for symbol, symbol_slice in self._stock_frame.symbol_slices.items():
+
+            symbol_datetimes = datetimes[symbol_slice]
+
+            for column_name, indicator_states in self._indicator_states.items():
+
+                state: IndicatorState = indicator_states['symbols'].get(symbol)
+
+                # New symbols start from an empty state and replay their rows.
+                if state is None:
+                    state = indicator_states['factory']()
+                    indicator_states['symbols'][symbol] = state
+                    first_new = symbol_slice.start
+                else:
+                    first_new = symbol_slice.start + symbol_datetimes.searchsorted(state.last_timestamp, side='right')
+
+                # A replaced bar the state already took in means seeding a
+                # fresh state from the rows before it and replaying the rest.
+                revised_at = self._revised.get(symbol)
+                if revised_at is not None and revised_at <= state.last_timestamp:
+
+                    first_new = symbol_slice.start + symbol_datetimes.searchsorted(revised_at, side='left')
+
+                    state = indicator_states['factory']()
+                    state.seed(values=closes[symbol_slice.start:first_new])
+                    indicator_states['symbols'][symbol] = state
+
+                if first_new >= symbol_slice.stop:
+                    continue
+
+                updates[column_name][0].append(np.arange(first_new, symbol_slice.stop))
+                updates[column_name][1].append(state.update(values=closes[first_new:symbol_slice.stop]))
+
+                state.last_timestamp = datetimes[symbol_slice.stop - 1]
+
+        self._revised = {}
+
+        for column_name, (positions, values) in updates.items():
+
+            if not positions:
+                continue
+
+            self._frame.iloc[
+                np.concatenate(positions),
+                self._frame.columns.get_loc(column_name)
+            ] = np.concatenate(values)
+
     def refresh(self):
         
-        # First update the groups
-        self._price_groups = self._stock_frame.symbol_groups
+        # Pick up the latest frame, the symbol slices follow it.
+        self._frame = self._stock_frame.frame
+        self._segments = None
+        self._computed_series = {}
+
+        # Only compute the new rows if we have running state.
+        if self._streaming and self._indicator_states:
+            self._refresh_streaming()
+
+        self._refreshing = True
+
+        try:
 
-        # Loop through all the stored indicators
-        for indicator in self._current_indicators:
+            # Loop through all the stored indicators
+            for indicator in list(self._current_indicators):
 
-            indicator_arguments = self._current_indicators[indicator]['args']
-            indicator_function = self._current_indicators[indicator]['func']
+                # Indicators with running state are already up to date.
+                if indicator in self._indicator_states:
+                    continue
 
-            # Update the columns
-            indicator_function(**indicator_arguments)
+                indicator_arguments = self._current_indicators[indicator]['args']
+                indicator_function = self._current_indicators[indicator]['func']
 
-    def check_signals(self) -> Union[pd.DataFrame, None]:
-        signals_df = self._stock_frame._check_signals(indicators=self._indicator_signals)
+                # Update the columns
+                indicator_function(**indicator_arguments)
+
+        finally:
+            self._refreshing = False
+
+    def check_signals(self, combine: str = 'any') -> Union[pd.DataFrame, None]:
+        signals_df = self._stock_frame._check_signals(indicators=self._indicator_signals, combine=combine)
 
         return signals_df
 
+    def signal_matrix(self, combine: str = 'any') -> pd.DataFrame:
+
+        # Evaluate the signals on every row at once, rather than just the last bar.
+        return self._stock_frame.signal_matrix(indicators=self._indicator_signals, combine=combine)
+
     
 
 
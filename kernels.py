@@ -0,0 +1,246 @@
+import numpy as np
+import pandas as pd
+
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Any, List, Tuple, Union
+
+Segment = Union[slice, np.ndarray]
+
+
+def apply_by_segment(kernel: Any, values: Union[np.ndarray, Tuple[np.ndarray, ...]], segments: List[Segment], **kwargs) -> np.ndarray:
+
+    # One output array for the whole column; every kernel writes its
+    # segment straight into it. Kernels over several inputs take a tuple.
+    if not isinstance(values, tuple):
+        values = (values,)
+
+    values = tuple(np.asarray(input_values, dtype='float64') for input_values in values)
+    output = np.full(values[0].shape[0], np.nan)
+
+    for segment in segments:
+
+        segment_values = [input_values[segment] for input_values in values]
+
+        if isinstance(segment, slice):
+            kernel(*segment_values, out=output[segment], **kwargs)
+        else:
+            output[segment] = kernel(*segment_values, out=np.empty(segment.shape[0]), **kwargs)
+
+    return output
+
+
+def shift_change(values: np.ndarray, periods: int, out: np.ndarray = None) -> np.ndarray:
+
+    values = np.asarray(values, dtype='float64')
+    out = np.empty(values.shape[0]) if out is None else out
+
+    out[:periods] = np.nan
+    np.subtract(values[periods:], values[:values.shape[0] - periods], out=out[periods:])
+
+    return out
+
+
+def diff(values: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+
+    return shift_change(values=values, periods=1, out=out)
+
+
+def running_totals(values: np.ndarray, start: Tuple[float, float] = (0.0, 0.0)) -> np.ndarray:
+
+    # Two rows: `start` followed by the running total after each value, and
+    # the rounding error of each of those additions, summed up the same way.
+    # Their sum is the total to about the accuracy of a compensated sum. The
+    # values are added strictly left to right, so carrying on from an
+    # earlier pair gives the same bits as one pass over the whole column.
+    # Non-finite values count as zero, `rolling_sum()` handles their windows.
+    values = np.asarray(values, dtype='float64')
+
+    finite = np.isfinite(values)
+    if not finite.all():
+        values = np.where(finite, values, 0.0)
+
+    totals = np.empty((2, values.shape[0] + 1))
+    totals[0, 0] = start[0]
+    totals[0, 1:] = values
+    np.cumsum(totals[0], out=totals[0])
+
+    # The exact error of each addition (TwoSum), from the totals on each side of it.
+    previous = totals[0, :-1]
+    added = totals[0, 1:] - previous
+
+    errors = totals[1, 1:]
+    np.subtract(totals[0, 1:], added, out=errors)
+    np.subtract(previous, errors, out=errors)
+    errors += values
+    errors -= added
+
+    totals[1, 0] = start[1]
+    np.cumsum(totals[1], out=totals[1])
+
+    return totals
+
+
+def rolling_sum(values: np.ndarray, window: int, out: np.ndarray = None, start: Tuple[float, float] = (0.0, 0.0)) -> np.ndarray:
+
+    values = np.asarray(values, dtype='float64')
+    out = np.empty(values.shape[0]) if out is None else out
+
+    out[:window - 1] = np.nan
+
+    if values.shape[0] < window:
+        return out
+
+    # Each window is the difference of two running totals, one pass however
+    # long the window. `start` is the pair from `running_totals()` in front
+    # of the first value, for callers that carry on from earlier rows.
+    totals = running_totals(values=values, start=start)
+    count = totals.shape[1]
+
+    np.subtract(totals[0, window:], totals[0, :count - window], out=out[window - 1:])
+    out[window - 1:] += totals[1, window:] - totals[1, :count - window]
+
+    # Windows holding a NaN or an infinity get summed directly, so they come
+    # out the way a plain sum would.
+    non_finite = ~np.isfinite(values)
+
+    if non_finite.any():
+
+        non_finite = np.cumsum(np.r_[0, non_finite])
+        has_non_finite = non_finite[window:] > non_finite[:count - window]
+
+        out[window - 1:][has_non_finite] = sliding_window_view(values, window)[has_non_finite].sum(axis=1)
+
+    return out
+
+
+def rolling_mean(values: np.ndarray, window: int, out: np.ndarray = None, start: Tuple[float, float] = (0.0, 0.0)) -> np.ndarray:
+
+    out = rolling_sum(values=values, window=window, out=out, start=start)
+    out[window - 1:] /= window
+
+    return out
+
+
+def rolling_std(values: np.ndarray, window: int, out: np.ndarray = None) -> np.ndarray:
+
+    values = np.asarray(values, dtype='float64')
+    out = np.empty(values.shape[0]) if out is None else out
+
+    if values.shape[0] == 0:
+        return out
+
+    # A sample standard deviation needs two values, `rolling(1).std()` is NaN too.
+    if window < 2:
+        out[:] = np.nan
+        return out
+
+    # Centre the prices first so the squares don't swamp the variance.
+    centered = values - np.nanmean(values) if not np.isnan(values).all() else values
+
+    mean = rolling_mean(values=centered, window=window)
+    squares = rolling_mean(values=centered * centered, window=window)
+
+    # Sample standard deviation, like `rolling(window).std()`.
+    variance = np.maximum(squares - mean * mean, 0.0) * (window / (window - 1.0))
+    np.sqrt(variance, out=out)
+
+    return out
+
+
+def _rolling_extreme(values: np.ndarray, window: int, reducer: Any, out: np.ndarray = None) -> np.ndarray:
+
+    values = np.asarray(values, dtype='float64')
+    out = np.empty(values.shape[0]) if out is None else out
+
+    out[:window - 1] = np.nan
+
+    if values.shape[0] >= window:
+        reducer(sliding_window_view(values, window), axis=1, out=out[window - 1:])
+
+    return out
+
+
+def rolling_max(values: np.ndarray, window: int, out: np.ndarray = None) -> np.ndarray:
+
+    return _rolling_extreme(values=values, window=window, reducer=np.max, out=out)
+
+
+def rolling_min(values: np.ndarray, window: int, out: np.ndarray = None) -> np.ndarray:
+
+    return _rolling_extreme(values=values, window=window, reducer=np.min, out=out)
+
+
+def rate_of_change(values: np.ndarray, period: int, out: np.ndarray = None) -> np.ndarray:
+
+    values = np.asarray(values, dtype='float64')
+    out = shift_change(values=values, periods=period, out=out)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[period:] /= values[:values.shape[0] - period]
+
+    return out
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+
+    out = np.empty(high.shape[0]) if out is None else out
+
+    # The first bar has no previous close, so its range is just high - low.
+    np.subtract(high, low, out=out)
+
+    if high.shape[0] > 1:
+        previous_close = close[:-1]
+        np.maximum(out[1:], np.abs(high[1:] - previous_close), out=out[1:])
+        np.maximum(out[1:], np.abs(low[1:] - previous_close), out=out[1:])
+
+    return out
+
+
+def ewm_mean(values: np.ndarray, span: float = None, alpha: float = None, out: np.ndarray = None) -> np.ndarray:
+
+    values = np.asarray(values, dtype='float64')
+    out = np.empty(values.shape[0]) if out is None else out
+
+    # The recursion runs in pandas' compiled window code; wrapping the array
+    # in a Series doesn't copy it.
+    out[:] = pd.Series(values, copy=False).ewm(span=span, alpha=alpha).mean().to_numpy()
+
+    return out
+
+
+def wilder_mean(values: np.ndarray, period: int, out: np.ndarray = None) -> np.ndarray:
+
+    # Wilder's smoothing is an exponential average with alpha = 1 / period.
+    return ewm_mean(values=values, alpha=1.0 / period, out=out)
+
+
+def up_down_days(change_in_price: np.ndarray) -> tuple:
+
+    up_day = np.where(change_in_price >= 0, change_in_price, 0)
+    down_day = np.where(change_in_price < 0, np.abs(change_in_price), 0)
+
+    return up_day, down_day
+
+
+def relative_strength_index(ewma_up: np.ndarray, ewma_down: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+
+    out = np.empty(ewma_up.shape[0]) if out is None else out
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative_strength = ewma_up / ewma_down
+        relative_strength_index = 100.0 - (100.0 / (1.0 + relative_strength))
+
+    out[:] = np.where(relative_strength_index == 0, 100, relative_strength_index)
+
+    return out
+
+
+def rsi(values: np.ndarray, period: int, out: np.ndarray = None) -> np.ndarray:
+
+    up_day, down_day = up_down_days(change_in_price=diff(values=values))
+
+    return relative_strength_index(
+        ewma_up=ewm_mean(values=up_day, span=period, out=up_day),
+        ewma_down=ewm_mean(values=down_day, span=period, out=down_day),
+        out=out
+    )
@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+
+from typing import Dict, TYPE_CHECKING
+
+from pyrobot.stock_frame import StockFrame
+
+if TYPE_CHECKING:
+    from pyrobot.portfolio import Portfolio
+
+
+class MarkToMarket():
+
+    # Marks the portfolio to the close of every new bar. Only the positions
+    # whose symbols are in the bar move, and the totals move by their change,
+    # so nothing is revalued in full unless the positions themselves change.
+    # Equity is `cash` plus the market value of the positions.
+    series_columns = ['equity', 'market_value', 'profit_loss', 'gross_exposure', 'net_exposure', 'drawdown']
+
+    def __init__(self, portfolio: 'Portfolio', cash: float = 0.0, capacity: int = 1024) -> None:
+
+        self.portfolio = portfolio
+        self.cash = cash
+
+        # The last close seen per symbol, kept across position changes.
+        self._last_prices: Dict[str, float] = {}
+
+        self._stock_frame: StockFrame = None
+        self._version = -1
+        self._market_value = np.zeros(0)
+
+        self.market_value = 0.0
+        self.invested_capital = 0.0
+        self.long_exposure = 0.0
+        self.short_exposure = 0.0
+
+        self.peak_equity = np.nan
+        self.max_drawdown = 0.0
+
+        # One row per bar time for the session, grown by doubling.
+        self._size = 0
+        self._times = np.zeros(capacity, dtype='int64')
+        self._series = np.zeros((capacity, len(self.series_columns)))
+
+    @property
+    def equity(self) -> float:
+        return self.cash + self.market_value
+
+    @property
+    def profit_loss(self) -> float:
+        return self.market_value - self.invested_capital
+
+    @property
+    def gross_exposure(self) -> float:
+        return self.long_exposure + self.short_exposure
+
+    @property
+    def net_exposure(self) -> float:
+        return self.long_exposure - self.short_exposure
+
+    @property
+    def drawdown(self) -> float:
+
+        if not self.peak_equity > 0:
+            return 0.0
+
+        return self.equity / self.peak_equity - 1.0
+
+    def _revalue(self) -> None:
+
+        # Positions were added, changed or removed, value them all once.
+        positions = self.portfolio.positions
+
+        prices = np.array([self._last_prices.get(symbol, np.nan) for symbol in positions.symbols], dtype='float64')
+
+        # Without a price yet a position is carried at what it cost.
+        prices = np.where(np.isnan(prices), positions.purchase_price, prices)
+
+        self._market_value = positions.quantity * prices
+        self._version = positions.version
+
+        self.market_value = float(self._market_value.sum())
+        self.invested_capital = float((positions.quantity * positions.purchase_price).sum())
+        self.long_exposure = float(self._market_value[self._market_value > 0].sum())
+        self.short_exposure = float(-self._market_value[self._market_value < 0].sum())
+
+    def _mark(self, symbols: np.ndarray, closes: np.ndarray) -> None:
+
+        positions = self.portfolio.positions
+        quantity = positions.quantity
+
+        for symbol, close in zip(symbols.tolist(), closes.tolist()):
+
+            self._last_prices[symbol] = close
+
+            if symbol not in positions:
+                continue
+
+            row = positions.row(symbol=symbol)
+
+            old_value = self._market_value[row]
+            new_value = quantity[row] * close
+            self._market_value[row] = new_value
+
+            self.market_value += new_value - old_value
+            self.long_exposure += max(new_value, 0.0) - max(old_value, 0.0)
+            self.short_exposure += max(-new_value, 0.0) - max(-old_value, 0.0)
+
+    def _record(self, timestamp: int) -> None:
+
+        equity = self.equity
+
+        if not equity <= self.peak_equity:
+            self.peak_equity = equity
+
+        self.max_drawdown = min(self.max_drawdown, self.drawdown)
+
+        # A bar revised at the last point's time replaces that point.
+        if self._size > 0 and self._times[self._size - 1] == timestamp:
+            self._size -= 1
+
+        if self._size == self._times.shape[0]:
+            self._times = np.concatenate([self._times, np.zeros_like(self._times)])
+            self._series = np.concatenate([self._series, np.zeros_like(self._series)])
+
+        self._times[self._size] = timestamp
+        self._series[self._size] = [equity, self.market_value, self.profit_loss, self.gross_exposure, self.net_exposure, self.drawdown]
+        self._size += 1
+
+        self.portfolio.market_value = self.market_value
+        self.portfolio.profit_loss = self.profit_loss
+
+    def on_bars(self, batch: Dict[str, np.ndarray]) -> None:
+
+        if self._version != self.portfolio.positions.version:
+            self._revalue()
+
+        # Catching up on several bar times records a point for each of them.
+        order = np.argsort(batch['datetime'], kind='stable')
+        datetimes = batch['datetime'][order]
+        bounds = np.flatnonzero(np.r_[True, datetimes[1:] != datetimes[:-1], True])
+
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+
+            # Bars from before the last point are late, newer closes have
+            # already been marked, so they'd only put the curve out of order.
+            if self._size > 0 and datetimes[start] < self._times[self._size - 1]:
+                continue
+
+            rows = order[start:stop]
+
+            self._mark(symbols=batch['symbol'][rows], closes=batch['close'][rows])
+            self._record(timestamp=int(datetimes[start]))
+
+    def attach(self, stock_frame: StockFrame) -> None:
+
+        if stock_frame is self._stock_frame:
+            return
+
+        # Stop following the frame we were on before.
+        if self._stock_frame is not None:
+            self._stock_frame.remove_bar_listener(self.on_bars)
+
+        # Start from the latest close already in the frame, then follow
+        # every bar added to it.
+        frame = stock_frame.frame
+        closes = frame['close'].to_numpy(dtype='float64')
+
+        for symbol, symbol_slice in stock_frame.symbol_slices.items():
+            if symbol_slice.stop > symbol_slice.start:
+                self._last_prices[symbol] = float(closes[symbol_slice.stop - 1])
+
+        self._revalue()
+
+        stock_frame.add_bar_listener(self.on_bars)
+        self._stock_frame = stock_frame
+
+    def position_profit_loss(self) -> pd.DataFrame:
+
+        if self._version != self.portfolio.positions.version:
+            self._revalue()
+
+        positions = self.portfolio.positions
+        invested_capital = positions.quantity * positions.purchase_price
+
+        return pd.DataFrame(
+            data={
+                'quantity': positions.quantity,
+                'last_price': [self._last_prices.get(symbol, np.nan) for symbol in positions.symbols],
+                'market_value': self._market_value,
+                'invested_capital': invested_capital,
+                'profit_loss': self._market_value - invested_capital
+            },
+            index=pd.Index(list(positions.symbols), name='symbol')
+        )
+
+    def equity_curve(self) -> pd.DataFrame:
+
+        return pd.DataFrame(
+            data=self._series[:self._size].copy(),
+            index=pd.DatetimeIndex(pd.to_datetime(self._times[:self._size], unit='ms'), name='datetime'),
+            columns=self.series_columns
+        )
@@ -0,0 +1,292 @@
+import os
+import json
+import bisect
+import pathlib
+import threading
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+def _default(obj: Any) -> Any:
+
+    if isinstance(obj, bytes):
+        return str(obj)
+
+
+class OrderJournal():
+
+    # Append-only log of order responses, one JSON object per line, split
+    # over numbered files of at most `max_file_size` bytes. Writing an order
+    # costs the same however long the history is.
+    def __init__(self, folder: Union[str, pathlib.Path], max_file_size: int = 64 * 1024 * 1024, fsync: bool = False,
+                 auto_flush: bool = True, legacy_file: Union[str, pathlib.Path] = None) -> None:
+
+        self.folder = pathlib.Path(folder)
+        self.max_file_size = max_file_size
+        self.fsync = fsync
+        self.auto_flush = auto_flush
+
+        # The `orders.json` list that `save_orders()` used to rewrite; its
+        # orders become the start of the journal the first time it's opened.
+        self.legacy_file = pathlib.Path(legacy_file) if legacy_file else self.folder.joinpath('orders.json')
+
+        if not self.folder.exists():
+            self.folder.mkdir(parents=True)
+
+        self._lock = threading.RLock()
+        self._file = None
+        self._file_number = 0
+        self._file_size = 0
+
+        # Built on the first query, then kept up to date by `append()`.
+        # Locations are (file number, byte offset, byte length).
+        self._index_built = False
+        self._locations: List[Tuple[int, int, int]] = []
+        self._by_order_id: Dict[str, Tuple[int, int, int]] = {}
+        self._by_idempotency_key: Dict[str, Tuple[int, int, int]] = {}
+        self._by_symbol: Dict[str, List[Tuple[int, int, int]]] = {}
+        self._timestamps: List[datetime] = []
+        self._by_time: List[Tuple[int, int, int]] = []
+
+    def _file_path(self, file_number: int) -> pathlib.Path:
+
+        return self.folder.joinpath('orders_{file_number:06d}.jsonl'.format(file_number=file_number))
+
+    def _file_numbers(self) -> List[int]:
+
+        return sorted(int(file_path.stem.split('_')[1]) for file_path in self.folder.glob('orders_*.jsonl'))
+
+    def _import_legacy_orders(self) -> None:
+
+        if self._file_numbers() or not self.legacy_file.exists():
+            return
+
+        with open(self.legacy_file, mode='r') as legacy_json:
+            orders = json.load(legacy_json)
+
+        lines = b''.join((json.dumps(obj=order, default=_default) + '\n').encode('utf-8') for order in orders)
+
+        # Written under another name first, so a crash can't leave half an import behind.
+        file_path = self._file_path(file_number=0)
+        temporary_path = file_path.with_suffix('.tmp')
+
+        with open(temporary_path, mode='wb') as journal_file:
+            journal_file.write(lines)
+
+        os.replace(temporary_path, file_path)
+
+    @staticmethod
+    def _complete_size(journal_file: Any, chunk_size: int = 4096) -> int:
+
+        # Walk back from the end to the last newline, only the tail gets read.
+        end = journal_file.seek(0, os.SEEK_END)
+        position = end
+
+        while position > 0:
+
+            start = max(position - chunk_size, 0)
+            journal_file.seek(start)
+
+            last_newline = journal_file.read(position - start).rfind(b'\n')
+            if last_newline != -1:
+                return start + last_newline + 1
+
+            position = start
+
+        return 0
+
+    def _open(self) -> None:
+
+        self._import_legacy_orders()
+
+        file_numbers = self._file_numbers()
+        self._file_number = file_numbers[-1] if file_numbers else 0
+
+        file_path = self._file_path(file_number=self._file_number)
+
+        # A crash can leave half a line at the end, drop it before appending.
+        if file_path.exists():
+
+            with open(file_path, mode='rb+') as journal_file:
+
+                complete_size = self._complete_size(journal_file=journal_file)
+
+                if complete_size != journal_file.seek(0, os.SEEK_END):
+                    journal_file.truncate(complete_size)
+
+        self._file = open(file_path, mode='ab')
+        self._file_size = self._file.tell()
+
+    def _rotate(self) -> None:
+
+        self._file.close()
+
+        self._file_number += 1
+        self._file = open(self._file_path(file_number=self._file_number), mode='ab')
+        self._file_size = 0
+
+    @staticmethod
+    def _symbols(order: dict) -> List[str]:
+
+        request_body = order.get('request_body') or {}
+
+        return [
+            leg['instrument']['symbol']
+            for leg in request_body.get('orderLegCollection', [])
+            if leg.get('instrument', {}).get('symbol')
+        ]
+
+    def _index(self, order: dict, location: Tuple[int, int, int]) -> None:
+
+        self._locations.append(location)
+
+        if order.get('order_id') is not None:
+            self._by_order_id[str(order['order_id'])] = location
+
+        # Failed orders can be sent again, so they don't claim their key.
+        if order.get('idempotency_key') is not None and 'error' not in order:
+            self._by_idempotency_key[order['idempotency_key']] = location
+
+        for symbol in self._symbols(order=order):
+            self._by_symbol.setdefault(symbol, []).append(location)
+
+        if order.get('timestamp'):
+
+            timestamp = datetime.fromisoformat(order['timestamp'])
+
+            # Orders mostly come in time order, only late ones need a bisect.
+            if not self._timestamps or timestamp >= self._timestamps[-1]:
+                self._timestamps.append(timestamp)
+                self._by_time.append(location)
+            else:
+                position = bisect.bisect_right(self._timestamps, timestamp)
+                self._timestamps.insert(position, timestamp)
+                self._by_time.insert(position, location)
+
+    def append(self, orders: List[dict]) -> None:
+
+        with self._lock:
+
+            if self._file is None:
+                self._open()
+
+            for order in orders:
+
+                line = (json.dumps(obj=order, default=_default) + '\n').encode('utf-8')
+
+                if self._file_size > 0 and self._file_size + len(line) > self.max_file_size:
+                    self._rotate()
+
+                self._file.write(line)
+
+                if self._index_built:
+                    self._index(order=order, location=(self._file_number, self._file_size, len(line)))
+
+                self._file_size += len(line)
+
+            if self.auto_flush:
+                self.flush()
+
+    def flush(self) -> None:
+
+        with self._lock:
+
+            if self._file is None:
+                return
+
+            self._file.flush()
+
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+
+        with self._lock:
+
+            if self._file is not None:
+                self.flush()
+                self._file.close()
+                self._file = None
+
+    def _build_index(self) -> None:
+
+        if self._index_built:
+            return
+
+        self._import_legacy_orders()
+        self.flush()
+
+        for file_number in self._file_numbers():
+
+            offset = 0
+            with open(self._file_path(file_number=file_number), mode='rb') as journal_file:
+
+                for line in journal_file:
+
+                    # Skip a half-written last line.
+                    if line.endswith(b'\n'):
+                        self._index(order=json.loads(line), location=(file_number, offset, len(line)))
+
+                    offset += len(line)
+
+        self._index_built = True
+
+    def _read(self, locations: List[Tuple[int, int, int]]) -> List[dict]:
+
+        self.flush()
+
+        orders = []
+        journal_files = {}
+
+        try:
+
+            for file_number, offset, length in locations:
+
+                if file_number not in journal_files:
+                    journal_files[file_number] = open(self._file_path(file_number=file_number), mode='rb')
+
+                journal_file = journal_files[file_number]
+                journal_file.seek(offset)
+                orders.append(json.loads(journal_file.read(length)))
+
+        finally:
+
+            for journal_file in journal_files.values():
+                journal_file.close()
+
+        return orders
+
+    def get(self, order_id: Union[str, int] = None, idempotency_key: str = None) -> Optional[dict]:
+
+        with self._lock:
+
+            self._build_index()
+
+            if idempotency_key is not None:
+                location = self._by_idempotency_key.get(idempotency_key)
+            else:
+                location = self._by_order_id.get(str(order_id))
+
+            return self._read(locations=[location])[0] if location else None
+
+    def query(self, symbol: str = None, start: datetime = None, end: datetime = None) -> List[dict]:
+
+        with self._lock:
+
+            self._build_index()
+
+            if start is None and end is None:
+                return self._read(locations=self._by_symbol.get(symbol, []) if symbol is not None else self._locations)
+
+            # The time index is sorted, so a range is two bisects.
+            first = 0 if start is None else bisect.bisect_left(self._timestamps, start)
+            last = len(self._timestamps) if end is None else bisect.bisect_right(self._timestamps, end)
+
+            locations = self._by_time[first:last]
+
+            if symbol is not None:
+                symbol_locations = set(self._by_symbol.get(symbol, []))
+                locations = [location for location in locations if location in symbol_locations]
+
+            return self._read(locations=locations)
@@ -0,0 +1,81 @@
+import threading
+import requests
+
+from typing import Any
+
+from requests.adapters import HTTPAdapter
+
+import td.client
+
+from td.client import TDClient
+
+
+class _PooledSession(requests.Session):
+
+    # `TDClient._make_request()` closes its session after every call, this
+    # one stays open so its connections get reused.
+    def close(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        super().close()
+
+
+class _SessionFactory():
+
+    # Stands in for the `requests` module inside `td.client`. Everything goes
+    # through to `requests`, except that `Session()` hands back the pooled
+    # session of the client making the call on this thread.
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(requests, name)
+
+    def Session(self) -> requests.Session:
+
+        session = getattr(self._local, 'session', None)
+
+        return session if session is not None else requests.Session()
+
+
+# `td` builds its sessions from the module-level `requests` name, and the
+# library has no other way to hand it one. Swapping that name once, here,
+# is the narrowest hook there is: `Session()` only returns a pooled session
+# on a thread that's inside `PooledTDClient._make_request()`, so plain
+# `TDClient`s keep getting a fresh session every call.
+_session_factory = _SessionFactory()
+td.client.requests = _session_factory
+
+
+class PooledTDClient(TDClient):
+
+    # `TDClient._make_request()` opens and closes a new `requests.Session` on
+    # every call, so concurrent requests never reuse a connection. This keeps
+    # one pooled session alive and lends it to the library's own request
+    # code, so auth, token refresh and error handling all stay in `td`.
+    # Worker threads share the session: `requests` sends through it without
+    # changing its state, and the adapter's pool is thread safe. Nothing
+    # should change its headers, cookies or adapters while calls are running.
+    def __init__(self, pool_size: int = 10, **kwargs) -> None:
+
+        super().__init__(**kwargs)
+
+        self.http_session = _PooledSession()
+
+        http_adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.http_session.mount('https://', http_adapter)
+
+    def _make_request(self, *args, **kwargs) -> Any:
+
+        previous_session = getattr(_session_factory._local, 'session', None)
+        _session_factory._local.session = self.http_session
+
+        try:
+            return super()._make_request(*args, **kwargs)
+        finally:
+            _session_factory._local.session = previous_session
+
+    def close(self) -> None:
+
+        self.http_session.shutdown()
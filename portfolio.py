@@ -1,30 +1,50 @@
 from typing import List, Dict, Union, Optional, Tuple
 from td.client import TDClient
 import numpy as np
-from numpy import DataFrame
+from pandas import DataFrame
+
+from pyrobot.scheduler import RequestScheduler
+from pyrobot.quote_cache import QuoteCache
+from pyrobot.position_store import PositionStore
+from pyrobot.stock_frame import StockFrame
+from pyrobot.risk import RiskEngine
+from pyrobot.mark_to_market import MarkToMarket
 
 class Portfolio():
     def __init__(self, account_number: Optional[str]):
         
-        self.positions = {}
+        self.positions = PositionStore()
         self.positions_count = 0
         self.market_value = 0.0
         self.profit_loss = 0.0
         self.risk_tolerance = 0.0
         self.account_number = account_number
         self._td_client: TDClient = None
+        self.scheduler: RequestScheduler = RequestScheduler()
+        self._quote_cache: QuoteCache = None
+
+        # Daily bars behind the risk numbers, and the running estimates over them.
+        self._stock_frame_daily: StockFrame = None
+        self._live_daily_bars: StockFrame = None
+        self.risk_engine: RiskEngine = RiskEngine()
 
-    def add_position(self, symbol: str, asset_type: str, purchase_date: Optional[str], quantity: int = 0, purchase_price: float = 0.0) -> dict:
+        # Keeps `market_value` and `profit_loss` marked to the latest bar.
+        self.mark_to_market: MarkToMarket = MarkToMarket(portfolio=self)
+
+    def add_position(self, symbol: str, asset_type: str, purchase_date: Optional[str], quantity: int = 0, purchase_price: float = 0.0) -> PositionStore:
         
-        self.positions[symbol] = {}
-        self.positions[symbol]['symbol'] = symbol
-        self.positions[symbol]['purchase_price'] = purchase_price
-        self.positions[symbol]['purchase_date'] = purchase_date
-        self.positions[symbol]['asset_type'] = asset_type
+        self.positions.add(
+            symbol=symbol,
+            asset_type=asset_type,
+            purchase_date=purchase_date,
+            quantity=quantity,
+            purchase_price=purchase_price
+        )
+        self.positions_count = len(self.positions)
 
         return self.positions
     
-    def add_positions(self, positions: List[dict]) -> dict:
+    def add_positions(self, positions: List[dict]) -> PositionStore:
 
         if isinstance(positions, list):
             
@@ -33,23 +53,23 @@ class Portfolio():
                 self.add_position(
                     symbol=position['symbol'],
                     asset_type=position['asset_type'],
-                    purchase_date=position.get['purchase_date', None],
-                    purchase_price=position.get['purchase_price', 0.0],
+                    purchase_date=position.get('purchase_date', None),
+                    purchase_price=position.get('purchase_price', 0.0),
                     quantity=position.get('quantity', 0)
                 )
 
-                return self.positions
+            return self.positions
 
         else:
             raise TypeError("Positions must be a list of dictionaries")
         
     def remove_position(self, symbol: str) -> Tuple[bool, str]:
 
-        if symbol in self.positions:
-            del self.positions[symbol]
-            return (True, "{Symbol} was successfully removed".format(symbol=symbol))
+        if self.positions.remove(symbol=symbol):
+            self.positions_count = len(self.positions)
+            return (True, "{symbol} was successfully removed".format(symbol=symbol))
         else:
-            return (False, "{Symbol} did not exist in the portfolio".format(symbol=symbol))
+            return (False, "{symbol} did not exist in the portfolio".format(symbol=symbol))
 
     def in_portfolio(self, symbol: str) -> bool:
         
@@ -57,16 +77,28 @@ class Portfolio():
             return True
         else:
             return False
+
+    def set_ownership_status(self, symbol: str, ownership: bool) -> None:
+
+        if symbol not in self.positions:
+            raise KeyError("{symbol} is not in the portfolio.".format(symbol=symbol))
+
+        self.positions.set_ownership(symbol=symbol, ownership=ownership)
         
     def is_profitable(self, symbol: str, current_price: float) -> bool:
 
         # Grab the purchase price
-        purchase_price = self.positions[symbol]['purchase_price']
+        purchase_price = self.positions.purchase_price[self.positions.row(symbol=symbol)]
 
         if (purchase_price <= current_price):
             return True
         elif (purchase_price > current_price):
             return False
+
+    def profitable_positions(self, current_prices: Union[dict, np.ndarray]) -> np.ndarray:
+
+        # One mask for the whole book, in position order.
+        return self.positions.valuation(prices=self.positions.price_vector(current_prices=current_prices))['is_profitable']
         
     @property
     def td_client(self) -> TDClient:
@@ -77,90 +109,202 @@ class Portfolio():
     def td_client(self, td_client: TDClient) -> None:
 
         self._td_client: TDClient = td_client
+
+    @property
+    def quote_cache(self) -> QuoteCache:
+
+        # Without a robot to share one with, keep our own.
+        if self._quote_cache is None:
+            self._quote_cache = QuoteCache(
+                fetch=lambda instruments: self.scheduler.call(self.td_client.get_quotes, lane='quotes', instruments=instruments)
+            )
+
+        return self._quote_cache
+
+    @quote_cache.setter
+    def quote_cache(self, quote_cache: QuoteCache) -> None:
+
+        self._quote_cache = quote_cache
         
 
-    def total_allocation(self) -> dict:
+    def total_allocation(self, current_prices: Union[dict, np.ndarray]) -> dict:
 
-        total_allocation = {
-            'stocks': [],
-            'fixed_income': [],
-            'options': [],
-            'futures': [],
-            'furex': []
+        valuation = self.positions.valuation(prices=self.positions.price_vector(current_prices=current_prices))
+
+        market_values = self.positions.allocation(market_value=valuation['market_value'])
+        total_market_value = sum(market_values.values())
+
+        total_allocation = {}
+        for asset_type, market_value in market_values.items():
+            total_allocation[asset_type] = {
+                'market_value': market_value,
+                'weight': market_value / total_market_value if total_market_value else 0.0
+            }
+
+        return total_allocation
+
+    def projected_market_value(self, current_prices: Union[dict, np.ndarray]) -> dict:
+
+        # Value every position against the prices in one pass, then lay the
+        # result out per symbol.
+        valuation = self.positions.valuation(prices=self.positions.price_vector(current_prices=current_prices))
+
+        columns = {
+            'current_price': valuation['current_price'].tolist(),
+            'purchase_price': self.positions.purchase_price.tolist(),
+            'quantity': self.positions.quantity.tolist(),
+            'is_profitable': valuation['is_profitable'].tolist(),
+            'total_invested_capital': valuation['invested_capital'].tolist(),
+            'total_market_value': valuation['market_value'].tolist(),
+            'total_loss_or_gain_$': valuation['profit_loss'].tolist(),
+            'total_loss_or_gain_%': valuation['profit_loss_pct'].tolist()
         }
 
-        if len(self.positions.keys()) > 0:
-            for symbol in self.positions:
-                total_allocation[self.positions[symbol]['asset_type']].append(self.positions[symbol])
+        projected_value = {
+            symbol: {column: values[row] for column, values in columns.items()}
+            for row, symbol in enumerate(self.positions.symbols)
+        }
 
-    def portfolio_variance(self, weights: dict, covariance_matrix: DataFrame) -> dict:
+        priced = ~np.isnan(valuation['current_price'])
+        profit_loss = valuation['profit_loss'][priced]
+
+        projected_value['total'] = {
+            'total_positions': len(self.positions),
+            'total_invested_capital': float(valuation['invested_capital'].sum()),
+            'total_market_value': float(np.nansum(valuation['market_value'])),
+            'total_profit_or_loss': float(profit_loss.sum()),
+            'number_of_profitable_positions': int((profit_loss > 0).sum()),
+            'number_of_non_profitable_positions': int((profit_loss < 0).sum()),
+            'number_of_breakeven_positions': int((profit_loss == 0).sum())
+        }
 
-        sorted_keys = list(weights.keys())
-        sorted_keys.sort()
+        return projected_value
+
+    def portfolio_variance(self, weights: dict, covariance_matrix: DataFrame = None) -> float:
+
+        # The risk engine looks weights up by symbol, nothing to sort.
+        if covariance_matrix is None:
+            return self.risk_engine.portfolio_variance(weights=weights)
+
+        symbols = list(weights.keys())
+
+        weight_vector = np.array([weights[symbol] for symbol in symbols])
+        covariance_matrix = covariance_matrix.reindex(index=symbols, columns=symbols).fillna(0.0).to_numpy()
 
-        sorted_weights = np.array([weights[symbol] for symbol in sorted_keys])
         portfolio_variance = np.dot(
-            sorted_weights.T,
-            np.dot(covariance_matrix, sorted_weights)
+            weight_vector.T,
+            np.dot(covariance_matrix, weight_vector)
         )
 
         return portfolio_variance
 
-    def portfolio_metrics(self) -> dict:
+    @property
+    def stock_frame_daily(self) -> StockFrame:
 
-        if not self._stock_frame_daily:
-            self._grab_daily_historical_prices()
+        return self._stock_frame_daily
 
-        # Calculate the weights.
-        porftolio_weights = self.portfolio_weights()
+    @stock_frame_daily.setter
+    def stock_frame_daily(self, stock_frame_daily: StockFrame) -> None:
 
-        # Calculate the Daily Returns (%)
-        self._stock_frame_daily.frame['daily_returns_pct'] = self._stock_frame_daily.symbol_groups['close'].transform(
-            lambda x: x.pct_change()
-        )
+        self._stock_frame_daily = stock_frame_daily
 
-        # Calculate the Daily Returns (Mean)
-        self._stock_frame_daily.frame['daily_returns_avg'] = self._stock_frame_daily.symbol_groups['daily_returns_pct'].transform(
-            lambda x: x.mean()
-        )
+    def _grab_daily_historical_prices(self) -> StockFrame:
+
+        # A year of daily bars for every position.
+        symbol_columns = []
+        for symbol in self.positions:
+
+            historical_prices_response = self.scheduler.call(
+                self.td_client.get_price_history,
+                lane='price_history',
+                symbol=symbol,
+                period_type='year',
+                period=1,
+                frequency_type='daily',
+                frequency=1
+            )
+
+            for candle in historical_prices_response['candles']:
+                candle_row = {column: candle[column] for column in ['open', 'close', 'high', 'low', 'volume', 'datetime']}
+                candle_row['symbol'] = symbol
+                symbol_columns.append(candle_row)
+
+        # Labelled the way the live frame's day bars are, so the days it
+        # rolls up land on the same rows.
+        self._stock_frame_daily = StockFrame(data=symbol_columns).resample(bar_size=1, bar_type='day', extended_hours=True)
+
+        return self._stock_frame_daily
+
+    def attach(self, stock_frame: StockFrame) -> None:
+
+        # Marks the portfolio to every bar the frame gets, and rolls those
+        # bars up into days for the risk numbers.
+        self.mark_to_market.attach(stock_frame=stock_frame)
+
+        live_daily_bars = stock_frame.resample(bar_size=1, bar_type='day')
+
+        if live_daily_bars is self._live_daily_bars:
+            return
+
+        if self._live_daily_bars is not None:
+            self._live_daily_bars.remove_bar_listener(self._on_daily_bars)
+
+        live_daily_bars.add_bar_listener(self._on_daily_bars)
+        self._live_daily_bars = live_daily_bars
 
-        # Calculate the Daily Returns (Standard Deviation)
-        self._stock_frame_daily.frame['daily_returns_std'] = self._stock_frame_daily.symbol_groups['daily_returns_pct'].transform(
-            lambda x: x.std()
+    def _on_daily_bars(self, batch: Dict[str, np.ndarray]) -> None:
+
+        if self._stock_frame_daily is None:
+            return
+
+        # Days before a symbol's last stored one are already in the risk
+        # estimates, so only the last day and newer ones are taken.
+        last_timestamps = {
+            symbol: timestamp.value // 10**6
+            for symbol, timestamp in self._stock_frame_daily.last_timestamps().items()
+        }
+        first_kept = np.array([last_timestamps.get(symbol, np.iinfo('int64').min) for symbol in batch['symbol']], dtype='int64')
+        keep = batch['datetime'] >= first_kept
+
+        self._stock_frame_daily.add_rows(
+            data={column: batch[column][keep] for column in ['symbol', 'datetime', 'open', 'close', 'high', 'low', 'volume']}
         )
 
-        # Calculate the Covariance.
-        returns_cov = self._stock_frame_daily.frame.unstack(
-            level=0)['daily_returns_pct'].cov()
+    def portfolio_metrics(self) -> dict:
 
-        # Take the other columns and get ready to add them to our dictionary.
-        returns_avg = self._stock_frame_daily.symbol_groups['daily_returns_avg'].tail(
-            n=1
-        ).to_dict()
+        if not self._stock_frame_daily:
+            self._grab_daily_historical_prices()
 
-        returns_std = self._stock_frame_daily.symbol_groups['daily_returns_std'].tail(
-            n=1
-        ).to_dict()
+        # Only the daily bars since the last call go into the running estimates.
+        self.risk_engine.add_bars(stock_frame=self._stock_frame_daily)
+
+        # Calculate the weights.
+        porftolio_weights = self.portfolio_weights()
+
+        symbols = self.risk_engine.symbols
+        returns_avg = self.risk_engine.means
+        returns_cov = self.risk_engine.covariance
+        returns_var = np.diag(returns_cov)
 
         metrics_dict = {}
 
         portfolio_variance = self.portfolio_variance(
-            weights=porftolio_weights,
-            covariance_matrix=returns_cov
+            weights=porftolio_weights
         )
 
-        for index_tuple in returns_std:
+        for row, symbol in enumerate(symbols):
 
-            symbol = index_tuple[0]
             metrics_dict[symbol] = {}
-            metrics_dict[symbol]['weight'] = porftolio_weights[symbol]
-            metrics_dict[symbol]['average_returns'] = returns_avg[index_tuple]
-            metrics_dict[symbol]['weighted_returns'] = returns_avg[index_tuple] * \
+            metrics_dict[symbol]['weight'] = porftolio_weights.get(symbol, 0.0)
+            metrics_dict[symbol]['average_returns'] = returns_avg[row]
+            metrics_dict[symbol]['weighted_returns'] = returns_avg[row] * \
                 metrics_dict[symbol]['weight']
-            metrics_dict[symbol]['standard_deviation_of_returns'] = returns_std[index_tuple]
-            metrics_dict[symbol]['variance_of_returns'] = returns_std[index_tuple] ** 2
-            metrics_dict[symbol]['covariance_of_returns'] = returns_cov.loc[[
-                symbol]].to_dict()
+            metrics_dict[symbol]['standard_deviation_of_returns'] = np.sqrt(returns_var[row])
+            metrics_dict[symbol]['variance_of_returns'] = returns_var[row]
+            metrics_dict[symbol]['covariance_of_returns'] = {
+                other_symbol: {symbol: covariance}
+                for other_symbol, covariance in zip(symbols, returns_cov[row].tolist())
+            }
 
         metrics_dict['portfolio'] = {}
         metrics_dict['portfolio']['variance'] = portfolio_variance
@@ -169,26 +313,17 @@ class Portfolio():
 
     def portfolio_weights(self) -> dict:
 
-        weights = {}
-
         # First grab all the symbols.
         symbols = self.positions.keys()
 
         # Grab the quotes.
-        quotes = self.td_client.get_quotes(instruments=list(symbols))
+        quotes = self.quote_cache.get_quotes(symbols=list(symbols))
 
         # Grab the projected market value.
-        projected_market_value_dict = self.projected_market_value(
-            current_prices=quotes
-        )
-
-        # Loop through each symbol.
-        for symbol in projected_market_value_dict:
+        market_value = self.positions.valuation(prices=self.positions.price_vector(current_prices=quotes))['market_value']
 
-            # Calculate the weights.
-            if symbol != 'total':
-                weights[symbol] = projected_market_value_dict[symbol]['total_market_value'] / \
-                    projected_market_value_dict['total']['total_market_value']
+        # Calculate the weights.
+        weights = dict(zip(self.positions.symbols, (market_value / np.nansum(market_value)).tolist()))
 
         return weights
         
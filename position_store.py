@@ -0,0 +1,208 @@
+import numpy as np
+
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Optional, Union
+
+
+class PositionStore(Mapping):
+
+    # Positions kept as one array per field, a row per symbol, so a whole
+    # book is valued with a few array operations. Still reads like the old
+    # dict of dicts: `store[symbol]`, `symbol in store`, `store.keys()`.
+    def __init__(self, capacity: int = 64) -> None:
+
+        self._symbols: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._purchase_dates: List[Optional[str]] = []
+
+        self._quantity = np.zeros(capacity)
+        self._purchase_price = np.zeros(capacity)
+        self._asset_type = np.zeros(capacity, dtype='int16')
+        self._ownership = np.zeros(capacity, dtype='bool')
+
+        # Bumped whenever rows are added, changed or moved.
+        self.version = 0
+
+        # Asset types are stored as codes into this list.
+        self.asset_types: List[str] = []
+        self._asset_type_codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._symbols))
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self._rows
+
+    def __getitem__(self, symbol: str) -> MappingProxyType:
+
+        # A read-only snapshot of the row, changes go through `add()` and
+        # `set_ownership()`.
+        row = self._rows[symbol]
+
+        return MappingProxyType({
+            'symbol': symbol,
+            'quantity': float(self._quantity[row]),
+            'purchase_price': float(self._purchase_price[row]),
+            'purchase_date': self._purchase_dates[row],
+            'asset_type': self.asset_types[self._asset_type[row]],
+            'ownership_status': bool(self._ownership[row])
+        })
+
+    def __repr__(self) -> str:
+
+        positions = {symbol: dict(self[symbol]) for symbol in self._symbols}
+
+        return 'PositionStore({positions!r})'.format(positions=positions)
+
+    @property
+    def symbols(self) -> List[str]:
+        return self._symbols
+
+    @property
+    def quantity(self) -> np.ndarray:
+        return self._quantity[:len(self._symbols)]
+
+    @property
+    def purchase_price(self) -> np.ndarray:
+        return self._purchase_price[:len(self._symbols)]
+
+    @property
+    def asset_type_codes(self) -> np.ndarray:
+        return self._asset_type[:len(self._symbols)]
+
+    @property
+    def ownership(self) -> np.ndarray:
+        return self._ownership[:len(self._symbols)]
+
+    def row(self, symbol: str) -> int:
+        return self._rows[symbol]
+
+    def _asset_type_code(self, asset_type: str) -> int:
+
+        if asset_type not in self._asset_type_codes:
+            self._asset_type_codes[asset_type] = len(self.asset_types)
+            self.asset_types.append(asset_type)
+
+        return self._asset_type_codes[asset_type]
+
+    def _grow(self) -> None:
+
+        # Double the arrays, so adding positions stays cheap on average.
+        capacity = max(2 * self._quantity.shape[0], 1)
+
+        for name in ['_quantity', '_purchase_price', '_asset_type', '_ownership']:
+
+            values = getattr(self, name)
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:values.shape[0]] = values
+
+            setattr(self, name, grown)
+
+    def add(self, symbol: str, asset_type: str, purchase_date: Optional[str], quantity: float = 0, purchase_price: float = 0.0) -> int:
+
+        row = self._rows.get(symbol)
+
+        if row is None:
+
+            if len(self._symbols) == self._quantity.shape[0]:
+                self._grow()
+
+            row = len(self._symbols)
+            self._rows[symbol] = row
+            self._symbols.append(symbol)
+            self._purchase_dates.append(purchase_date)
+
+        else:
+            self._purchase_dates[row] = purchase_date
+
+        self._quantity[row] = quantity
+        self._purchase_price[row] = purchase_price
+        self._asset_type[row] = self._asset_type_code(asset_type=asset_type)
+
+        # Anything bought at a price counts as owned.
+        self._ownership[row] = quantity > 0 and purchase_price > 0.0
+        self.version += 1
+
+        return row
+
+    def remove(self, symbol: str) -> bool:
+
+        row = self._rows.pop(symbol, None)
+
+        if row is None:
+            return False
+
+        # Move the last row into the hole, so the arrays stay packed.
+        last = len(self._symbols) - 1
+
+        if row != last:
+
+            last_symbol = self._symbols[last]
+
+            self._symbols[row] = last_symbol
+            self._purchase_dates[row] = self._purchase_dates[last]
+            self._rows[last_symbol] = row
+
+            for values in [self._quantity, self._purchase_price, self._asset_type, self._ownership]:
+                values[row] = values[last]
+
+        self._symbols.pop()
+        self._purchase_dates.pop()
+        self.version += 1
+
+        return True
+
+    def set_ownership(self, symbol: str, ownership: bool) -> None:
+
+        self._ownership[self._rows[symbol]] = ownership
+
+    def price_vector(self, current_prices: Union[Dict[str, float], Dict[str, dict], np.ndarray]) -> np.ndarray:
+
+        # Arrays are taken to be in row order already. Dicts can hold plain
+        # prices or quotes; missing symbols come out as NaN.
+        if isinstance(current_prices, np.ndarray):
+            return np.asarray(current_prices, dtype='float64')
+
+        prices = np.full(len(self._symbols), np.nan)
+
+        for row, symbol in enumerate(self._symbols):
+
+            price = current_prices.get(symbol)
+
+            if isinstance(price, dict):
+                price = price.get('lastPrice')
+
+            if price is not None:
+                prices[row] = price
+
+        return prices
+
+    def valuation(self, prices: np.ndarray) -> Dict[str, np.ndarray]:
+
+        quantity = self.quantity
+        purchase_price = self.purchase_price
+
+        market_value = quantity * prices
+        invested_capital = quantity * purchase_price
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            profit_loss_pct = np.where(invested_capital != 0, (market_value - invested_capital) / invested_capital, 0.0)
+
+        return {
+            'current_price': prices,
+            'market_value': market_value,
+            'invested_capital': invested_capital,
+            'profit_loss': market_value - invested_capital,
+            'profit_loss_pct': profit_loss_pct,
+            'is_profitable': purchase_price <= prices
+        }
+
+    def allocation(self, market_value: np.ndarray) -> Dict[str, float]:
+
+        totals = np.bincount(self.asset_type_codes, weights=np.nan_to_num(market_value), minlength=len(self.asset_types))
+
+        return {asset_type: float(total) for asset_type, total in zip(self.asset_types, totals)}
@@ -0,0 +1,114 @@
+import threading
+import time as time_true
+
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+
+class QuoteCache():
+
+    # Quotes shared by everyone asking for them. Each symbol's quote is kept
+    # for its TTL; a lookup only fetches the stale symbols, in chunks of at
+    # most `max_symbols_per_request`, and callers asking for a symbol that is
+    # already being fetched wait for that request instead of sending another.
+    def __init__(self, fetch: Callable[[List[str]], Dict[str, dict]], ttl: float = 1.0, max_symbols_per_request: int = 300,
+                 clock: Callable[[], float] = time_true.monotonic) -> None:
+
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_symbols_per_request = max_symbols_per_request
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._quotes: Dict[str, dict] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._ttls: Dict[str, float] = {}
+        self._in_flight: Dict[str, Future] = {}
+
+        self.requests = 0
+
+    def set_ttl(self, symbol: str, ttl: float) -> None:
+
+        with self._lock:
+            self._ttls[symbol] = ttl
+
+    def invalidate(self, symbols: Optional[List[str]] = None) -> None:
+
+        with self._lock:
+
+            for symbol in (list(self._fetched_at) if symbols is None else symbols):
+                self._fetched_at.pop(symbol, None)
+
+    def _fetch_symbols(self, symbols: List[str], flight: Future) -> None:
+
+        quotes = {}
+
+        try:
+
+            for start in range(0, len(symbols), self.max_symbols_per_request):
+
+                chunk = symbols[start:start + self.max_symbols_per_request]
+                quotes.update(self.fetch(chunk))
+
+                with self._lock:
+                    self.requests += 1
+
+        except Exception as error:
+
+            with self._lock:
+                for symbol in symbols:
+                    self._in_flight.pop(symbol, None)
+
+            flight.set_exception(error)
+            raise
+
+        now = self.clock()
+
+        with self._lock:
+
+            for symbol in symbols:
+
+                self._in_flight.pop(symbol, None)
+
+                # Symbols the broker didn't return stay stale.
+                if symbol in quotes:
+                    self._quotes[symbol] = quotes[symbol]
+                    self._fetched_at[symbol] = now
+
+        flight.set_result(quotes)
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, dict]:
+
+        symbols = list(dict.fromkeys(symbols))
+
+        now = self.clock()
+        to_fetch = []
+        flights = []
+
+        with self._lock:
+
+            for symbol in symbols:
+
+                fetched_at = self._fetched_at.get(symbol)
+                if fetched_at is not None and now - fetched_at < self._ttls.get(symbol, self.ttl):
+                    continue
+
+                if symbol in self._in_flight:
+                    flights.append(self._in_flight[symbol])
+                else:
+                    to_fetch.append(symbol)
+
+            # Claim the symbols we're about to fetch, so nobody else does.
+            if to_fetch:
+                flight = Future()
+                for symbol in to_fetch:
+                    self._in_flight[symbol] = flight
+
+        if to_fetch:
+            self._fetch_symbols(symbols=to_fetch, flight=flight)
+
+        for in_flight in set(flights):
+            in_flight.result()
+
+        with self._lock:
+            return {symbol: self._quotes[symbol] for symbol in symbols if symbol in self._quotes}
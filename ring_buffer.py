@@ -0,0 +1,120 @@
+import numpy as np
+
+from typing import Dict, Tuple
+
+
+class SymbolRingBuffer():
+
+    price_columns = ['open', 'close', 'high', 'low']
+
+    def __init__(self, capacity: int) -> None:
+
+        if capacity < 1:
+            raise ValueError("The ring buffer capacity must be at least 1.")
+
+        self.capacity = capacity
+
+        self._start = 0
+        self._size = 0
+
+        # Preallocate every column once, nothing grows after this.
+        self._datetimes = np.zeros(capacity, dtype='datetime64[ns]')
+        self._columns: Dict[str, np.ndarray] = {
+            column: np.full(capacity, np.nan) for column in self.price_columns
+        }
+        self._columns['volume'] = np.zeros(capacity, dtype='int64')
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+
+        # Preallocated, so this is the same whether the buffer is full or not.
+        return self._datetimes.nbytes + sum(values.nbytes for values in self._columns.values())
+
+    @property
+    def last_timestamp(self) -> np.datetime64:
+
+        if self._size == 0:
+            return None
+
+        return self._datetimes[(self._start + self._size - 1) % self.capacity]
+
+    def append(self, datetime: np.datetime64, open: float, close: float, high: float, low: float, volume: int) -> None:
+
+        datetime = np.datetime64(datetime, 'ns')
+        last_timestamp = self.last_timestamp
+
+        # Bars are expected in order, a repeated timestamp updates the last bar.
+        if last_timestamp is not None and datetime < last_timestamp:
+            return
+        elif last_timestamp is not None and datetime == last_timestamp:
+            position = (self._start + self._size - 1) % self.capacity
+        elif self._size < self.capacity:
+            position = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            position = self._start
+            self._start = (self._start + 1) % self.capacity
+
+        self._datetimes[position] = datetime
+        self._columns['open'][position] = open
+        self._columns['close'][position] = close
+        self._columns['high'][position] = high
+        self._columns['low'][position] = low
+        self._columns['volume'][position] = volume
+
+    def extend(self, datetimes: np.ndarray, columns: Dict[str, np.ndarray]) -> None:
+
+        datetimes = np.asarray(datetimes, dtype='datetime64[ns]')
+        columns = {column: np.asarray(values) for column, values in columns.items()}
+
+        last_timestamp = self.last_timestamp
+
+        if last_timestamp is not None:
+
+            # A bar matching the last timestamp updates it in place.
+            same_bar = np.flatnonzero(datetimes == last_timestamp)
+            if same_bar.shape[0] > 0:
+                position = same_bar[-1]
+                self.append(
+                    datetime=datetimes[position],
+                    **{column: values[position] for column, values in columns.items()}
+                )
+
+            newer = datetimes > last_timestamp
+            datetimes = datetimes[newer]
+            columns = {column: values[newer] for column, values in columns.items()}
+
+        # Only the newest `capacity` rows can survive, so skip the rest.
+        skipped = max(datetimes.shape[0] - self.capacity, 0)
+        count = datetimes.shape[0] - skipped
+
+        if count == 0:
+            return
+
+        positions = (self._start + self._size + skipped + np.arange(count)) % self.capacity
+
+        self._datetimes[positions] = datetimes[skipped:]
+        for column, values in self._columns.items():
+            values[positions] = columns[column][skipped:]
+
+        total = self._size + skipped + count
+        self._size = min(total, self.capacity)
+        self._start = (self._start + total - self._size) % self.capacity
+
+    def _ordered(self, values: np.ndarray) -> np.ndarray:
+
+        end = self._start + self._size
+
+        if end <= self.capacity:
+            return values[self._start:end]
+
+        return np.concatenate([values[self._start:], values[:end - self.capacity]])
+
+    def to_arrays(self) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+
+        columns = {column: self._ordered(values) for column, values in self._columns.items()}
+
+        return self._ordered(self._datetimes), columns
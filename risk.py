@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+
+from typing import Dict, List, Union
+
+from pyrobot.stock_frame import StockFrame
+
+
+class RiskEngine():
+
+    # Running means and covariances of daily returns, updated one day at a
+    # time as bars land instead of recomputed over the whole history.
+    #
+    # 'sample' keeps pairwise Welford sums, so with gaps in the data it
+    # matches pandas' pairwise `cov()`, `mean()` and `std()`. 'ewm' keeps
+    # exponentially weighted estimates with weight `alpha` on the newest day.
+    # `shrinkage` pulls the off-diagonal covariances towards zero by that
+    # fraction when the matrix is read.
+    def __init__(self, symbols: List[str] = None, estimator: str = 'sample', alpha: float = None, halflife: float = None,
+                 shrinkage: float = 0.0) -> None:
+
+        if estimator not in ['sample', 'ewm']:
+            raise ValueError("The estimator must be either 'sample' or 'ewm'.")
+
+        if estimator == 'ewm' and alpha is None:
+            if halflife is None:
+                raise ValueError("The 'ewm' estimator needs an `alpha` or a `halflife`.")
+            alpha = 1.0 - np.exp(np.log(0.5) / halflife)
+
+        if not 0.0 <= shrinkage <= 1.0:
+            raise ValueError("Shrinkage has to be between 0 and 1.")
+
+        self.estimator = estimator
+        self.alpha = alpha
+        self.shrinkage = shrinkage
+
+        self.symbols: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+        # Per pair (i, j), over the days both had a return: the count, the
+        # mean of i, and the co-moment (the variance sums on the diagonal).
+        self._counts = np.zeros((0, 0))
+        self._means = np.zeros((0, 0))
+        self._comoments = np.zeros((0, 0))
+
+        # The last close per symbol, returns are taken against it, and the
+        # time of the last bar taken in for each symbol.
+        self._last_close = np.zeros(0)
+        self.last_timestamps: Dict[str, pd.Timestamp] = {}
+
+        self.add_symbols(symbols=symbols or [])
+
+    def add_symbols(self, symbols: List[str]) -> None:
+
+        new_symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self._rows]
+
+        if not new_symbols:
+            return
+
+        old_size = len(self.symbols)
+        size = old_size + len(new_symbols)
+
+        for name in ['_counts', '_means', '_comoments']:
+            grown = np.zeros((size, size))
+            grown[:old_size, :old_size] = getattr(self, name)
+            setattr(self, name, grown)
+
+        self._last_close = np.append(self._last_close, np.full(len(new_symbols), np.nan))
+
+        for symbol in new_symbols:
+            self._rows[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+    def _load(self, returns: np.ndarray) -> None:
+
+        # With no history yet, all the sums come straight from matrix
+        # products. Each column is centred first so the products don't lose
+        # precision; covariances don't care about the shift.
+        observed = ~np.isnan(returns)
+        weights = observed.astype('float64')
+
+        shift = np.where(observed, returns, 0.0).sum(axis=0) / np.maximum(weights.sum(axis=0), 1.0)
+        centered = np.where(observed, returns - shift, 0.0)
+
+        counts = weights.T @ weights
+        sums = centered.T @ weights
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.where(counts > 0, sums / counts, 0.0)
+
+        self._counts = counts
+        self._means = means + shift[:, None]
+        self._comoments = centered.T @ centered - sums * means.T
+
+    def update(self, returns: np.ndarray) -> None:
+
+        # One day of returns in symbol order, NaN where a symbol has none.
+        observed = ~np.isnan(returns)
+        pairs = observed[:, None] & observed[None, :]
+
+        if not pairs.any():
+            return
+
+        values = np.where(observed, returns, 0.0)
+
+        if self.estimator == 'sample':
+
+            self._counts += pairs
+
+            delta = np.where(pairs, values[:, None] - self._means, 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self._means += np.where(pairs, delta / self._counts, 0.0)
+
+            self._comoments += np.where(pairs, delta * (values[None, :] - self._means.T), 0.0)
+
+        else:
+
+            first = pairs & (self._counts == 0)
+            seen = pairs & ~first
+
+            delta = np.where(seen, values[:, None] - self._means, 0.0)
+            step = self.alpha * delta
+
+            self._comoments = np.where(seen, (1.0 - self.alpha) * (self._comoments + delta * step.T), self._comoments)
+            self._means = np.where(seen, self._means + step, np.where(first, values[:, None], self._means))
+            self._counts += pairs
+
+    def extend(self, returns: np.ndarray) -> None:
+
+        if self.estimator == 'sample' and not self._counts.any():
+            self._load(returns=returns)
+            return
+
+        for day_returns in returns:
+            self.update(returns=day_returns)
+
+    def add_bars(self, stock_frame: StockFrame) -> None:
+
+        # Take in each symbol's closed daily bars newer than the last one seen
+        # for it. A symbol's latest bar may still be forming, so it waits
+        # until a newer bar arrives. Bars from a symbol lagging behind the
+        # others still get taken in, but aren't paired with returns already
+        # taken in for the other symbols on those days.
+        frame = stock_frame.frame
+        datetimes = frame.index.get_level_values(1)
+
+        self.add_symbols(symbols=list(stock_frame.symbol_slices))
+
+        rows = []
+        symbol_rows = []
+        for symbol, symbol_slice in stock_frame.symbol_slices.items():
+
+            first_new = symbol_slice.start
+            if symbol in self.last_timestamps:
+                first_new += datetimes[symbol_slice].searchsorted(self.last_timestamps[symbol], side='right')
+
+            latest_bar = symbol_slice.stop - 1
+
+            if latest_bar > first_new:
+                rows.append(np.arange(first_new, latest_bar))
+                symbol_rows.append(np.full(latest_bar - first_new, self._rows[symbol]))
+                self.last_timestamps[symbol] = datetimes[latest_bar - 1]
+
+        if not rows:
+            return
+
+        rows = np.concatenate(rows)
+        symbol_rows = np.concatenate(symbol_rows)
+        days, day_rows = np.unique(datetimes[rows].to_numpy(), return_inverse=True)
+
+        # One row of closes per new day, the last known close on top.
+        closes = np.full((days.shape[0] + 1, len(self.symbols)), np.nan)
+        closes[0] = self._last_close
+        closes[day_rows + 1, symbol_rows] = frame['close'].to_numpy(dtype='float64')[rows]
+
+        # Carry each symbol's last close down to the days it has no bar.
+        observed = ~np.isnan(closes)
+        last_observed = np.maximum.accumulate(np.where(observed, np.arange(closes.shape[0])[:, None], 0), axis=0)
+        previous = closes[last_observed, np.arange(closes.shape[1])]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.where(observed[1:], closes[1:] / previous[:-1] - 1.0, np.nan)
+
+        self.extend(returns=returns)
+
+        self._last_close = previous[-1]
+
+    @property
+    def means(self) -> np.ndarray:
+
+        return np.where(np.diag(self._counts) > 0, np.diag(self._means), np.nan)
+
+    @property
+    def covariance(self) -> np.ndarray:
+
+        if self.estimator == 'sample':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                covariance = np.where(self._counts > 1, self._comoments / (self._counts - 1.0), np.nan)
+        else:
+            covariance = np.where(self._counts > 0, self._comoments, np.nan)
+
+        # The two halves drift apart by rounding, average them back together.
+        covariance = (covariance + covariance.T) / 2.0
+
+        if self.shrinkage:
+            variances = np.diag(covariance).copy()
+            covariance = (1.0 - self.shrinkage) * covariance
+            covariance[np.diag_indices_from(covariance)] = variances
+
+        return covariance
+
+    def covariance_frame(self) -> pd.DataFrame:
+
+        return pd.DataFrame(data=self.covariance, index=self.symbols, columns=self.symbols)
+
+    def weight_vector(self, weights: Union[Dict[str, float], np.ndarray]) -> np.ndarray:
+
+        if isinstance(weights, np.ndarray):
+            return weights
+
+        # Symbols are looked up by row, nothing gets sorted.
+        vector = np.zeros(len(self.symbols))
+        for symbol, weight in weights.items():
+            if symbol in self._rows:
+                vector[self._rows[symbol]] = weight
+
+        return vector
+
+    def portfolio_variance(self, weights: Union[Dict[str, float], np.ndarray]) -> float:
+
+        vector = self.weight_vector(weights=weights)
+        covariance = np.nan_to_num(self.covariance)
+
+        return float(vector @ covariance @ vector)
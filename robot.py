@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 from td.client import TDClient
@@ -5,49 +6,110 @@ from td.utils import milliseconds_since_epoch
 
 from datetime import datetime, time, timezone, timedelta
 
-from typing import List, Dict, Union, Optional, Any
+from typing import List, Dict, Union, Optional, Any, Tuple, Iterator, Callable
 
 from pyrobot.portfolio import Portfolio
 from pyrobot.stock_frame import StockFrame
 from pyrobot.trades import Trade
+from pyrobot.pooled_client import PooledTDClient
+from pyrobot.scheduler import RequestScheduler
+from pyrobot.candle_cache import CandleCache
+from pyrobot.indicators import Indicators
+from pyrobot.streaming import BarAggregator
+from pyrobot.snapshot import Snapshot
+from pyrobot.order_journal import OrderJournal
+from pyrobot.quote_cache import QuoteCache
 
-import json
 import time as time_true
 import pathlib
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 from td.client import TDClient
 from td.utils import TDUtilities
+from td.exceptions import ExdLmtError, ServerError
 
 milliseconds_since_epoch = TDUtilities().milliseconds_since_epoch
 
+candle_columns = ['symbol', 'open', 'close', 'high', 'low', 'volume', 'datetime']
+
 class PyRobot():
 
 
-    def __init__(self, client_id: str, redirect_uri: str, credentials_path: str = None, trading_account: str = None, paper_trading: bool = True) -> None:
+    def __init__(self, client_id: str, redirect_uri: str, credentials_path: str = None, trading_account: str = None, paper_trading: bool = True,
+                 td_client: TDClient = None, max_workers: int = 1, scheduler: RequestScheduler = None, candle_cache: CandleCache = None,
+                 order_journal: OrderJournal = None, quote_cache: QuoteCache = None) -> None:
        self.trading_account: str = trading_account
        self.client_id: str = client_id
        self.redirect_uri: str = redirect_uri
        self.credentials_path: str = credentials_path
-       self.session: TDClient = self._create_session()
+       self.max_workers: int = max_workers
+       self.scheduler: RequestScheduler = scheduler or RequestScheduler(
+           retry_on=(ExdLmtError, ServerError) + RequestScheduler.transient_errors,
+           rate_limit_errors=(ExdLmtError,)
+       )
+       self.session: TDClient = td_client or self._create_session()
        self.trades: dict = {}
        self.historical_prices: dict = {}
+       self.candle_cache: CandleCache = candle_cache
+       self._order_journal: OrderJournal = order_journal
+       # Responses by idempotency key, only the most recent ones; older
+       # keys are still found in the journal.
+       self._submitted_orders: 'OrderedDict[str, dict]' = OrderedDict()
+       self.max_submitted_orders: int = 10000
+       self.quote_cache: QuoteCache = quote_cache or QuoteCache(fetch=self._fetch_quotes)
        self.stock_frame = None
        self.paper_trading = paper_trading
+       self._executor: ThreadPoolExecutor = None
+       self.clock: Callable[[], datetime] = datetime.now
     
     def _create_session(self) -> TDClient:
 
-        td_client = TDClient(
-        
-            client_id=self.client_id,
-            redirect_uri=self.redirect_uri,
-            credentials_path=self.credentials_path
+        # Concurrent requests share one pooled HTTP session.
+        if self.max_workers > 1:
+
+            td_client = PooledTDClient(
+
+                pool_size=self.max_workers,
+                client_id=self.client_id,
+                redirect_uri=self.redirect_uri,
+                credentials_path=self.credentials_path
+
+            )
+
+        else:
+
+            td_client = TDClient(
+            
+                client_id=self.client_id,
+                redirect_uri=self.redirect_uri,
+                credentials_path=self.credentials_path
+
+            )
 
-        )
         # Login to the session
         td_client.login()
 
         return td_client
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pyrobot')
+
+        return self._executor
     
+    @property
+    def order_journal(self) -> OrderJournal:
+
+        # Orders go to `data/` next to the package unless told otherwise.
+        if self._order_journal is None:
+            self._order_journal = OrderJournal(folder=pathlib.Path(__file__).parents[1].joinpath("data"))
+
+        return self._order_journal
+
     @property
     def pre_market_open(self) -> bool:
         
@@ -88,6 +150,11 @@ class PyRobot():
         
         self.portfolio = Portfolio(account_number=self.trading_account)
         self.portfolio.td_client = self.session
+        self.portfolio.scheduler = self.scheduler
+        self.portfolio.quote_cache = self.quote_cache
+
+        if self.stock_frame:
+            self.portfolio.attach(stock_frame=self.stock_frame)
         
         return self.portfolio
     
@@ -100,7 +167,7 @@ class PyRobot():
         trade.new_trade(
             trade_id=trade_id,
             order_type=order_type,
-            side=long_or_short,
+            long_or_short=long_or_short,
             enter_or_exit=enter_or_exit,
             price=price,
             stop_limit_price=stop_limit_price
@@ -114,13 +181,19 @@ class PyRobot():
 
         return trade
 
+    def _fetch_quotes(self, instruments: List[str]) -> dict:
+
+        return self.scheduler.call(self.session.get_quotes, lane='quotes', instruments=instruments)
+
     def grab_current_quotes(self) -> dict:
         symbols = self.portfolio.positions.keys()
-        quotes = self.session.get_quotes(instruments=list(symbols))
+
+        # Shared with the portfolio, so only stale quotes hit the broker.
+        quotes = self.quote_cache.get_quotes(symbols=list(symbols))
 
         return quotes
 
-    def grab_historical_prices(self, start: datetime, end: datetime, bar_size: int = 1, bar_type: str = 'minute', symbols: Optional[List[str]] = None) -> List[Dict]:
+    def grab_historical_prices(self, start: datetime, end: datetime, bar_size: int = 1, bar_type: str = 'minute', symbols: Optional[List[str]] = None, aggregate: bool = False) -> List[Dict]:
         self._bar_size = bar_size
         self._bar_type = bar_type
 
@@ -128,91 +201,256 @@ class PyRobot():
         end = str(milliseconds_since_epoch(dt_object=end))
 
         new_prices = []
+        symbol_columns = []
 
         if not symbols:
             symbols = self.portfolio.positions
 
-        for symbol in symbols:
+        if self.candle_cache:
+
+            price_columns = self._grab_cached_prices(
+                symbols=symbols,
+                start=start,
+                end=end,
+                bar_size=bar_size,
+                bar_type=bar_type
+            )
+
+        else:
+
+            price_history_responses = self._fetch_price_histories(
+                symbols=symbols,
+                start=start,
+                end=end,
+                bar_size=bar_size,
+                bar_type=bar_type
+            )
+
+            price_columns = {}
+            for symbol, historical_prices_response in price_history_responses.items():
+
+                self.historical_prices[symbol] = {}
+                self.historical_prices[symbol]['candles'] = historical_prices_response['candles']
 
-            historical_prices_response = self.session.get_price_history(
+                # Go straight to columns, the per-candle dicts are opt-in.
+                price_columns[symbol] = self._candles_to_columns(
+                    symbol=symbol,
+                    candles=historical_prices_response['candles']
+                )
+
+        for symbol, columns in price_columns.items():
+
+            symbol_columns.append(columns)
+
+            if not aggregate:
+                continue
+
+            for values in zip(*(columns[column].tolist() for column in candle_columns)):
+                new_prices.append(dict(zip(candle_columns, values)))
+
+        # Stitch every symbol together in one shot.
+        self.historical_prices['columns'] = {
+            column: np.concatenate([columns[column] for columns in symbol_columns])
+            for column in candle_columns
+        } if symbol_columns else {column: [] for column in candle_columns}
+
+        if aggregate:
+            self.historical_prices['aggregated'] = new_prices
+
+        return self.historical_prices
+
+    @staticmethod
+    def _candles_to_columns(symbol: str, candles: List[dict]) -> Dict[str, np.ndarray]:
+
+        count = len(candles)
+
+        columns = {}
+        columns['symbol'] = np.full(count, symbol, dtype=object)
+
+        for column in ['open', 'close', 'high', 'low']:
+            columns[column] = np.fromiter((candle[column] for candle in candles), dtype='float64', count=count)
+
+        for column in ['volume', 'datetime']:
+            columns[column] = np.fromiter((candle[column] for candle in candles), dtype='int64', count=count)
+
+        return columns
+
+    def _grab_cached_prices(self, symbols: List[str], start: str, end: str, bar_size: int, bar_type: str) -> Dict[str, Dict[str, np.ndarray]]:
+
+        start = int(start)
+        end = int(end)
+
+        # Only ask the broker for the ranges the cache doesn't cover yet.
+        ranges = [
+            (symbol, str(range_start), str(range_end))
+            for symbol in symbols
+            for range_start, range_end in self.candle_cache.missing_ranges(
                 symbol=symbol,
-                period_type='day',
-                start_date=start,
-                end_date=end,
-                frequency_type=bar_type,
-                frequency=bar_size,
-                extended_hours=True
+                bar_type=bar_type,
+                bar_size=bar_size,
+                start=start,
+                end=end
             )
+        ]
+
+        responses = self._fetch_ranges(ranges=ranges, bar_size=bar_size, bar_type=bar_type)
 
+        fetched_candles = {}
+        fetched_ranges = {}
+        for (symbol, range_start, range_end), historical_prices_response in zip(ranges, responses):
+            fetched_candles.setdefault(symbol, []).extend(historical_prices_response['candles'])
+            fetched_ranges.setdefault(symbol, []).append((int(range_start), int(range_end)))
+
+        price_columns = {}
+        for symbol in symbols:
+
+            # Only the freshly fetched candles, the rest lives in the cache.
             self.historical_prices[symbol] = {}
-            self.historical_prices[symbol]['candles'] = historical_prices_response['candles']
+            self.historical_prices[symbol]['candles'] = fetched_candles.get(symbol, [])
 
-            for candle in historical_prices_response['candles']:
+            # Ranges that came back empty count as fetched too.
+            if symbol in fetched_ranges:
+                self.candle_cache.store(
+                    symbol=symbol,
+                    bar_type=bar_type,
+                    bar_size=bar_size,
+                    columns=self._candles_to_columns(symbol=symbol, candles=self.historical_prices[symbol]['candles']),
+                    fetched_ranges=fetched_ranges[symbol]
+                )
 
-                new_price_mini_dict = {}
-                new_price_mini_dict['symbol'] = symbol
-                new_price_mini_dict['open'] = candle['open']
-                new_price_mini_dict['close'] = candle['close']
-                new_price_mini_dict['high'] = candle['high']
-                new_price_mini_dict['low'] = candle['low']
-                new_price_mini_dict['volume'] = candle['volume']
-                new_price_mini_dict['datetime'] = candle['datetime']
-                new_prices.append(new_price_mini_dict)
+            cached_candles = self.candle_cache.load(
+                symbol=symbol,
+                bar_type=bar_type,
+                bar_size=bar_size,
+                start=start,
+                end=end
+            )
 
-        self.historical_prices['aggregated'] = new_prices
+            columns = {column: np.array(cached_candles[column]) for column in cached_candles.dtype.names}
+            columns['symbol'] = np.full(cached_candles.shape[0], symbol, dtype=object)
 
-        return self.historical_prices
+            price_columns[symbol] = columns
+
+        return price_columns
+
+    def _get_price_history(self, symbol: str, start: str, end: str, bar_size: int, bar_type: str) -> dict:
+
+        # Grab the request, retries and throttling are up to the scheduler.
+        return self.scheduler.call(
+            self.session.get_price_history,
+            lane='price_history',
+            symbol=symbol,
+            period_type='day',
+            start_date=start,
+            end_date=end,
+            frequency_type=bar_type,
+            frequency=bar_size,
+            extended_hours=True
+        )
+
+    def _fetch_ranges(self, ranges: List[Tuple[str, str, str]], bar_size: int, bar_type: str) -> List[dict]:
+
+        def fetch(price_range: Tuple[str, str, str]) -> dict:
+            return self._get_price_history(
+                symbol=price_range[0],
+                start=price_range[1],
+                end=price_range[2],
+                bar_size=bar_size,
+                bar_type=bar_type
+            )
+
+        # Fan the requests out over the pool, results keep the request order.
+        if self.max_workers > 1:
+            return list(self.executor.map(fetch, ranges))
+        else:
+            return list(map(fetch, ranges))
+
+    def _fetch_price_histories(self, symbols: List[str], start: str, end: str, bar_size: int, bar_type: str) -> Dict[str, dict]:
+
+        symbols = list(symbols)
+
+        responses = self._fetch_ranges(
+            ranges=[(symbol, start, end) for symbol in symbols],
+            bar_size=bar_size,
+            bar_type=bar_type
+        )
+
+        return dict(zip(symbols, responses))
 
-    def create_stock_frame(self, data: List[dict]) -> StockFrame:
-        self.stock_frame = StockFrame(data=data)
+    def create_stock_frame(self, data: Union[List[dict], Dict[str, np.ndarray]], **kwargs) -> StockFrame:
+        self.stock_frame = StockFrame(data=data, **kwargs)
+
+        # Mark the portfolio to every bar this frame gets from now on, and
+        # keep its daily bars up to date.
+        if getattr(self, 'portfolio', None):
+            self.portfolio.attach(stock_frame=self.stock_frame)
 
         return self.stock_frame
         
+    def save_snapshot(self, folder: Union[str, pathlib.Path], indicator_client: Indicators = None) -> pathlib.Path:
+
+        # Keep the bar settings too, so `get_latest_bar()` works after a restore.
+        return Snapshot(folder=folder).save(
+            stock_frame=self.stock_frame,
+            indicator_client=indicator_client,
+            metadata={
+                'bar_size': getattr(self, '_bar_size', None),
+                'bar_type': getattr(self, '_bar_type', None)
+            }
+        )
+
+    def restore_snapshot(self, folder: Union[str, pathlib.Path]) -> Optional[Indicators]:
+
+        # Pick up where the last session stopped; `get_latest_bar()` then
+        # only fetches the bars after the newest one in the snapshot.
+        self.stock_frame, indicator_client, metadata = Snapshot(folder=folder).load()
+
+        if getattr(self, 'portfolio', None):
+            self.portfolio.attach(stock_frame=self.stock_frame)
+
+        if metadata.get('bar_size') is not None:
+            self._bar_size = metadata['bar_size']
+            self._bar_type = metadata['bar_type']
+
+        return indicator_client
+
     def get_latest_bar(self) -> List[dict]:
 
         bar_size = self._bar_size
         bar_type = self._bar_type
 
-        # Define the start and end date.
+        # Define the end date, and the fallback start date for new symbols.
         end_date = datetime.today()
-        start_date = end_date - timedelta(days=1)
-        start = str(milliseconds_since_epoch(dt_object=start_date))
+        start = str(milliseconds_since_epoch(dt_object=end_date - timedelta(days=1)))
         end = str(milliseconds_since_epoch(dt_object=end_date))
 
-        latest_prices = []
+        last_timestamps = self.stock_frame.last_timestamps() if self.stock_frame else {}
 
+        # Only ask for the bars from the last one we already have on. That
+        # one may have been stored while it was still forming, and `add_rows()`
+        # replaces it with the final bar.
+        ranges = []
+        last_bar_times = {}
         for symbol in self.portfolio.positions:
 
-            try:
+            if symbol in last_timestamps:
+                last_bar_times[symbol] = pd.Timestamp(last_timestamps[symbol]).value // 10**6
+                ranges.append((symbol, str(last_bar_times[symbol]), end))
+            else:
+                last_bar_times[symbol] = -1
+                ranges.append((symbol, start, end))
 
-                # Grab the request.
-                historical_prices_response = self.session.get_price_history(
-                    symbol=symbol,
-                    period_type='day',
-                    start_date=start,
-                    end_date=end,
-                    frequency_type=bar_type,
-                    frequency=bar_size,
-                    extended_hours=True
-                )
+        latest_prices = []
 
-            except:
+        responses = self._fetch_ranges(ranges=ranges, bar_size=bar_size, bar_type=bar_type)
 
-                time_true.sleep(2)
+        for (symbol, _, _), historical_prices_response in zip(ranges, responses):
 
-                # Grab the request.
-                historical_prices_response = self.session.get_price_history(
-                    symbol=symbol,
-                    period_type='day',
-                    start_date=start,
-                    end_date=end,
-                    frequency_type=bar_type,
-                    frequency=bar_size,
-                    extended_hours=True
-                )
+            # parse the candles, keeping every bar we missed.
+            for candle in historical_prices_response['candles']:
 
-            # parse the candles.
-            for candle in historical_prices_response['candles'][-1:]:
+                if candle['datetime'] < last_bar_times[symbol]:
+                    continue
 
                 new_price_mini_dict = {}
                 new_price_mini_dict['symbol'] = symbol
@@ -226,6 +464,45 @@ class PyRobot():
 
         return latest_prices
     
+    def run_stream(self, feed: Iterator[dict], indicator_client: Indicators = None, on_bar: Callable[[List[dict]], Any] = None,
+                   bar_seconds: int = 60) -> None:
+
+        aggregator = BarAggregator(bar_seconds=bar_seconds)
+
+        def close(bars: List[dict]) -> None:
+
+            if not bars:
+                return
+
+            self.stock_frame.add_rows(data=bars)
+
+            if indicator_client:
+                indicator_client.refresh()
+
+            if on_bar:
+                on_bar(bars)
+
+        for message in feed:
+
+            # Finished bars from the feed go straight in.
+            if message['type'] == 'bar':
+                close(bars=[{column: message[column] for column in candle_columns}])
+                continue
+
+            # Any tick past a bar boundary closes that bar for every symbol.
+            closed_bars = aggregator.close_bars(timestamp=message['timestamp'])
+            closed_bars += aggregator.add_tick(
+                symbol=message['symbol'],
+                price=message['price'],
+                volume=message['volume'],
+                timestamp=message['timestamp']
+            )
+
+            close(bars=closed_bars)
+
+        # The feed is done, so whatever is still open is final.
+        close(bars=aggregator.close_bars())
+
     def wait_till_next_bar(self, last_bar_timestamp: pd.DatetimeIndex) -> None:
 
         last_bar_time = last_bar_timestamp.to_pydatetime()[0].replace(tzinfo=timezone.utc)
@@ -258,117 +535,134 @@ class PyRobot():
 
         time_true.sleep(time_to_wait_now)
 
-    def execute_signals(self, signals: List[pd.Series], trades_to_execute: dict) -> List[dict]:
-        
-        # Define the Buy and sells.
-        buys: pd.Series = signals['buys']
-        sells: pd.Series = signals['sells']
+    def _idempotency_key(self, trade_obj: Trade, side: str, symbol: str, bar_time: Any) -> str:
 
-        order_responses = []
+        # The same signal on the same bar always gets the same key, however
+        # many times the loop goes over it.
+        return "{trade_id}:{side}:{symbol}:{bar_time}".format(
+            trade_id=trade_obj.trade_id,
+            side=side,
+            symbol=symbol,
+            bar_time=pd.Timestamp(bar_time).value // 10**6
+        )
 
-        # If we have buys or sells continue.
-        if not buys.empty:
+    def _submit_order(self, trade_obj: Trade, idempotency_key: str) -> dict:
 
-            # Grab the buy Symbols.
-            symbols_list = buys.index.get_level_values(0).to_list()
+        started = time_true.perf_counter()
 
-            # Loop through each symbol.
-            for symbol in symbols_list:
+        try:
 
-                # Check to see if there is a Trade object.
-                if symbol in trades_to_execute:
+            if not self.paper_trading:
 
-                    if self.portfolio.in_portfolio(symbol=symbol):
-                        self.portfolio.set_ownership_status(
-                            symbol=symbol,
-                            ownership=True
-                        )
+                # Execute the order.
+                order_response = self.execute_orders(
+                    trade_obj=trade_obj
+                )
 
-                    # Set the Execution Flag.
-                    trades_to_execute[symbol]['has_executed'] = True
-                    trade_obj: Trade = trades_to_execute[symbol]['buy']['trade_func']
+                order_response = {
+                    'order_id': order_response['order_id'],
+                    'request_body': order_response['request_body']
+                }
 
-                    if not self.paper_trading:
+            else:
 
-                        # Execute the order.
-                        order_response = self.execute_orders(
-                            trade_obj=trade_obj
-                        )
+                order_response = {
+                    'order_id': trade_obj._generate_order_id(),
+                    'request_body': trade_obj.order
+                }
 
-                        order_response = {
-                            'order_id': order_response['order_id'],
-                            'request_body': order_response['request_body'],
-                            'timestamp': datetime.now().isoformat()
-                        }
+        except Exception as error:
 
-                        order_responses.append(order_response)
+            # One failed order shouldn't hold up the rest of the batch.
+            order_response = {
+                'order_id': None,
+                'request_body': trade_obj.order,
+                'error': repr(error)
+            }
 
-                    else:
+        order_response['timestamp'] = self.clock().isoformat()
+        order_response['idempotency_key'] = idempotency_key
+        order_response['latency'] = time_true.perf_counter() - started
 
-                        order_response = {
-                            'order_id': trade_obj._generate_order_id(),
-                            'request_body': trade_obj.order,
-                            'timestamp': datetime.now().isoformat()
-                        }
+        return order_response
 
-                        order_responses.append(order_response)
+    def _already_submitted(self, idempotency_key: str, save: bool) -> bool:
 
-        elif not sells.empty:
+        if idempotency_key in self._submitted_orders:
+            self._submitted_orders.move_to_end(idempotency_key)
+            return True
 
-            # Grab the buy Symbols.
-            symbols_list = sells.index.get_level_values(0).to_list()
+        # After a restart the journal still knows what went out.
+        return save and self.order_journal.get(idempotency_key=idempotency_key) is not None
 
-            # Loop through each symbol.
-            for symbol in symbols_list:
+    def execute_signals(self, signals: List[pd.Series], trades_to_execute: dict, save: bool = True) -> List[dict]:
 
-                # Check to see if there is a Trade object.
-                if symbol in trades_to_execute:
+        orders_to_submit = []
+        idempotency_keys = set()
 
-                    # Set the Execution Flag.
-                    trades_to_execute[symbol]['has_executed'] = True
+        # Buys and sells are collected in the same pass.
+        for side, signal_name, ownership in [('buy', 'buys', True), ('sell', 'sells', False)]:
 
-                    if self.portfolio.in_portfolio(symbol=symbol):
-                        self.portfolio.set_ownership_status(
-                            symbol=symbol,
-                            ownership=False
-                        )
+            signal: pd.Series = signals[signal_name]
 
-                    trade_obj: Trade = trades_to_execute[symbol]['sell']['trade_func']
+            if signal.empty:
+                continue
 
-                    if not self.paper_trading:
+            for symbol, bar_time in zip(signal.index.get_level_values(0), signal.index.get_level_values(1)):
 
-                        # Execute the order.
-                        order_response = self.execute_orders(
-                            trade_obj=trade_obj
-                        )
+                # Check to see if there is a Trade object.
+                if symbol not in trades_to_execute:
+                    continue
+
+                if self.portfolio.in_portfolio(symbol=symbol):
+                    self.portfolio.set_ownership_status(
+                        symbol=symbol,
+                        ownership=ownership
+                    )
+
+                # Set the Execution Flag.
+                trades_to_execute[symbol]['has_executed'] = True
+                trade_obj: Trade = trades_to_execute[symbol][side]['trade_func']
+
+                idempotency_key = self._idempotency_key(trade_obj=trade_obj, side=side, symbol=symbol, bar_time=bar_time)
 
-                        order_response = {
-                            'order_id': order_response['order_id'],
-                            'request_body': order_response['request_body'],
-                            'timestamp': datetime.now().isoformat()
-                        }
+                if idempotency_key in idempotency_keys or self._already_submitted(idempotency_key=idempotency_key, save=save):
+                    continue
 
-                        order_responses.append(order_response)
+                idempotency_keys.add(idempotency_key)
+                orders_to_submit.append((trade_obj, idempotency_key))
 
-                    else:
+        def submit(order_to_submit: Tuple[Trade, str]) -> dict:
+            return self._submit_order(trade_obj=order_to_submit[0], idempotency_key=order_to_submit[1])
 
-                        order_response = {
-                            'order_id': trade_obj._generate_order_id(),
-                            'request_body': trade_obj.order,
-                            'timestamp': datetime.now().isoformat()
-                        }
+        # Send the whole batch at once over the pool, responses keep the order.
+        if self.max_workers > 1 and len(orders_to_submit) > 1:
+            order_responses = list(self.executor.map(submit, orders_to_submit))
+        else:
+            order_responses = list(map(submit, orders_to_submit))
+
+        # Failed orders can be tried again, the rest can't go out twice.
+        for order_response in order_responses:
+            if 'error' not in order_response:
+                self._submitted_orders[order_response['idempotency_key']] = order_response
 
-                        order_responses.append(order_response)
+        # Forget the least recently seen keys past the limit.
+        while len(self._submitted_orders) > self.max_submitted_orders:
+            self._submitted_orders.popitem(last=False)
 
         # Save the response.
-        self.save_orders(order_response_dict=order_responses)
+        if save and order_responses:
+            self.save_orders(order_response_dict=order_responses)
 
         return order_responses
 
     def execute_orders(self, trade_obj: Trade) -> dict:
 
-        # Execute the order.
-        order_dict = self.session.place_order(
+        # Execute the order, only retry when the broker never accepted it.
+        order_dict = self.scheduler.call(
+            self.session.place_order,
+            lane='orders',
+            retry_on=(ExdLmtError,),
             account=self.trading_account,
             order=trade_obj.order
         )
@@ -381,39 +675,9 @@ class PyRobot():
 
         return order_dict
 
-    def save_orders(self, order_response_dict: dict) -> bool:
-
-        def default(obj):
-
-            if isinstance(obj, bytes):
-                return str(obj)
+    def save_orders(self, order_response_dict: List[dict]) -> bool:
 
-        # Define the folder.
-        folder: pathlib.PurePath = pathlib.Path(
-            __file__
-        ).parents[1].joinpath("data")
-
-        # See if it exist, if not create it.
-        if not folder.exists():
-            folder.mkdir()
-
-        # Define the file path.
-        file_path = folder.joinpath('orders.json')
-
-        # First check if the file alread exists.
-        if file_path.exists():
-            with open('data/orders.json', 'r') as order_json:
-                orders_list = json.load(order_json)
-        else:
-            orders_list = []
-
-        # Combine both lists.
-        orders_list = orders_list + order_response_dict
-
-        # Write the new data back.
-        with open(file='data/orders.json', mode='w+') as order_json:
-            json.dump(obj=orders_list, fp=order_json, indent=4, default=default)
+        # Append the new orders to the journal, nothing already written is touched.
+        self.order_journal.append(orders=order_response_dict)
 
         return True
-
-
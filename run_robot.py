@@ -96,7 +96,7 @@ historical_prices = trading_robot.grab_historical_prices(
     bar_type='minute'
 )
 # Data -> Stock Frame
-stock_frame = trading_robot.create_stock_frame(data=historical_prices['aggregated'])
+stock_frame = trading_robot.create_stock_frame(data=historical_prices['columns'])
 
 #Print head of the stock frame
 pprint.pprint(stock_frame.frame.head(n=20))
@@ -147,7 +147,7 @@ indicator_client.ema(period=50)
 
 #Add signal
 indicator_client.set_indicator_signals(
-    indicator='rsi',
+    indicator='rsi_14',
     buy=40.0,
     sell=20.0,
     condition_buy=operator.ge,
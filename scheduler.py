@@ -0,0 +1,147 @@
+import heapq
+import random
+import itertools
+import threading
+import time as time_true
+
+import requests
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class RequestScheduler():
+
+    # Lower numbers are served first when calls are queued on the quota.
+    priorities = {
+        'orders': 0,
+        'quotes': 1,
+        'price_history': 2
+    }
+
+    # Only errors where the request never got through are worth another try,
+    # anything else would just fail the same way again.
+    transient_errors = (requests.ConnectionError, requests.Timeout)
+
+    def __init__(self, requests_per_minute: int = 120, burst: int = None, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_cap: float = 30.0, retry_on: Tuple[type] = None, rate_limit_errors: Tuple[type] = ()) -> None:
+
+        self.requests_per_minute = requests_per_minute
+        self.capacity = float(burst or requests_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_on = self.transient_errors if retry_on is None else retry_on
+        self.rate_limit_errors = rate_limit_errors
+
+        self._rate = requests_per_minute / 60.0
+        self._tokens = self.capacity
+        self._last_refill = time_true.monotonic()
+
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+
+        self._counters = {
+            'submitted': 0,
+            'completed': 0,
+            'throttled': 0,
+            'retried': 0,
+            'failed': 0
+        }
+
+    @property
+    def counters(self) -> Dict[str, int]:
+
+        with self._condition:
+            return dict(self._counters)
+
+    def _count(self, counter: str) -> None:
+
+        with self._condition:
+            self._counters[counter] += 1
+
+    def _refill(self) -> None:
+
+        now = time_true.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def _acquire(self, priority: int) -> None:
+
+        with self._condition:
+
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+
+            throttled = False
+
+            # Wait until we're at the front of the queue and a token is free.
+            while True:
+
+                self._refill()
+
+                if self._waiting[0] == ticket and self._tokens >= 1.0:
+                    heapq.heappop(self._waiting)
+                    self._tokens -= 1.0
+                    self._condition.notify_all()
+                    break
+
+                if self._tokens < 1.0:
+                    throttled = True
+                    self._condition.wait(timeout=(1.0 - self._tokens) / self._rate)
+                else:
+                    self._condition.wait()
+
+            if throttled:
+                self._counters['throttled'] += 1
+
+    def _drain(self) -> None:
+
+        # The broker told us we're over quota, so stop everyone for a while.
+        with self._condition:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+    def backoff(self, attempt: int) -> float:
+
+        # Full jitter keeps retries from lining up after a burst of failures.
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def call(self, function: Callable, *args, lane: str = 'price_history', max_retries: Optional[int] = None,
+             retry_on: Optional[Tuple[type]] = None, **kwargs) -> Any:
+
+        priority = self.priorities[lane]
+        max_retries = self.max_retries if max_retries is None else max_retries
+        retry_on = self.retry_on if retry_on is None else retry_on
+
+        self._count('submitted')
+
+        attempt = 0
+        while True:
+
+            self._acquire(priority=priority)
+
+            try:
+                result = function(*args, **kwargs)
+            except retry_on as request_error:
+
+                if self.rate_limit_errors and isinstance(request_error, self.rate_limit_errors):
+                    self._drain()
+
+                if attempt >= max_retries:
+                    self._count('failed')
+                    raise
+
+                attempt += 1
+                self._count('retried')
+
+                time_true.sleep(self.backoff(attempt=attempt))
+                continue
+
+            except Exception:
+                self._count('failed')
+                raise
+
+            self._count('completed')
+
+            return result
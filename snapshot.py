@@ -0,0 +1,235 @@
+import os
+import json
+import uuid
+import pathlib
+import operator
+import functools
+
+import numpy as np
+import pandas as pd
+
+from typing import Any, Dict, Tuple, Union
+
+from pyrobot import indicator_state
+from pyrobot.stock_frame import StockFrame
+from pyrobot.indicators import Indicators
+
+price_columns = ['open', 'close', 'high', 'low', 'volume']
+
+
+class Snapshot():
+
+    # A StockFrame, and optionally the indicators on top of it, saved as one
+    # `.npy` file per column plus a JSON manifest. Loading memory-maps the
+    # columns, so a restart costs a disk read rather than refetching and
+    # recomputing everything.
+    def __init__(self, folder: Union[str, pathlib.Path]) -> None:
+
+        self.folder = pathlib.Path(folder)
+
+        if not self.folder.exists():
+            self.folder.mkdir(parents=True)
+
+    @property
+    def manifest_path(self) -> pathlib.Path:
+
+        return self.folder.joinpath('manifest.json')
+
+    def exists(self) -> bool:
+
+        return self.manifest_path.exists()
+
+    def _file_name(self, generation: str, name: str) -> str:
+
+        return 'snapshot_{generation}_{name}.npy'.format(generation=generation, name=name)
+
+    def _write_array(self, generation: str, name: str, values: np.ndarray) -> str:
+
+        file_name = self._file_name(generation=generation, name=name)
+        np.save(self.folder.joinpath(file_name), np.ascontiguousarray(values))
+
+        return file_name
+
+    def _read_array(self, file_name: str) -> np.ndarray:
+
+        return np.load(self.folder.joinpath(file_name), mmap_mode='r')
+
+    @staticmethod
+    def _operator_name(condition: Any) -> str:
+
+        # Only the `operator` functions can be looked up again by name.
+        if getattr(operator, getattr(condition, '__name__', ''), None) is not condition:
+            raise ValueError("Only signals using `operator` functions can be saved, got {condition}.".format(condition=condition))
+
+        return condition.__name__
+
+    def _save_indicators(self, generation: str, indicator_client: Indicators) -> dict:
+
+        signals = {}
+        for key, signal in indicator_client._indicator_signals.items():
+
+            signals[key] = dict(signal)
+            signals[key]['buy_operator'] = self._operator_name(condition=signal['buy_operator'])
+            signals[key]['sell_operator'] = self._operator_name(condition=signal['sell_operator'])
+
+        states = {}
+        for position, (column_name, indicator_states) in enumerate(indicator_client._indicator_states.items()):
+
+            symbols = list(indicator_states['symbols'])
+            symbol_states = [indicator_states['symbols'][symbol] for symbol in symbols]
+
+            # Every symbol's state goes in one array, split up again by offsets.
+            values = [state.get_state() for state in symbol_states]
+            offsets = np.zeros(len(values) + 1, dtype='int64')
+            offsets[1:] = np.cumsum([state_values.shape[0] for state_values in values])
+
+            timestamps = np.array([
+                pd.Timestamp(state.last_timestamp).value if state.last_timestamp is not None else pd.NaT.value
+                for state in symbol_states
+            ], dtype='int64')
+
+            template = symbol_states[0] if symbol_states else indicator_states['factory']()
+
+            states[column_name] = {
+                'class': type(template).__name__,
+                'parameters': template.parameters,
+                'symbols': symbols,
+                'values': self._write_array(generation=generation, name='state_{position}_values'.format(position=position), values=np.concatenate(values) if values else np.empty(0)),
+                'offsets': self._write_array(generation=generation, name='state_{position}_offsets'.format(position=position), values=offsets),
+                'timestamps': self._write_array(generation=generation, name='state_{position}_timestamps'.format(position=position), values=timestamps)
+            }
+
+        return {
+            'streaming': indicator_client._streaming,
+            'indicators': {
+                column_name: {
+                    'func': indicator['func'].__name__,
+                    'args': indicator['args']
+                }
+                for column_name, indicator in indicator_client._current_indicators.items()
+            },
+            'signals': signals,
+            'states': states
+        }
+
+    def save(self, stock_frame: StockFrame, indicator_client: Indicators = None, metadata: Dict[str, Any] = None) -> pathlib.Path:
+
+        frame = stock_frame.frame
+        generation = uuid.uuid4().hex
+
+        symbol_level = frame.index.levels[0]
+
+        manifest = {
+            'stock_frame': {
+                'storage': stock_frame._storage,
+                'max_history': stock_frame._max_history,
+                'compact': stock_frame._compact,
+                'price_tolerance': stock_frame._price_tolerance,
+                'symbols': [str(symbol) for symbol in symbol_level],
+                'symbol_codes': self._write_array(generation=generation, name='symbol_codes', values=frame.index.codes[0]),
+                'datetime': self._write_array(generation=generation, name='datetime', values=frame.index.get_level_values(1).as_unit('ms').asi8),
+                'columns': {
+                    column: self._write_array(generation=generation, name='column_{position}'.format(position=position), values=frame[column].to_numpy())
+                    for position, column in enumerate(frame.columns)
+                }
+            },
+            'indicators': self._save_indicators(generation=generation, indicator_client=indicator_client) if indicator_client else None,
+            'metadata': metadata or {}
+        }
+
+        # The manifest goes in last and in one rename, so a crash mid-save
+        # leaves the previous snapshot in place.
+        temporary_path = self.manifest_path.with_suffix('.tmp')
+
+        with open(temporary_path, mode='w') as manifest_file:
+            json.dump(obj=manifest, fp=manifest_file)
+
+        os.replace(temporary_path, self.manifest_path)
+
+        # Files from older snapshots aren't referenced anymore.
+        for file_path in self.folder.glob('snapshot_*.npy'):
+            if not file_path.name.startswith('snapshot_{generation}_'.format(generation=generation)):
+                file_path.unlink()
+
+        return self.manifest_path
+
+    def _load_stock_frame(self, manifest: dict) -> StockFrame:
+
+        symbols = np.array(manifest['symbols'], dtype=object)
+        columns = manifest['columns']
+
+        data = {column: self._read_array(file_name=columns[column]) for column in price_columns}
+        data['symbol'] = symbols[self._read_array(file_name=manifest['symbol_codes'])]
+        data['datetime'] = self._read_array(file_name=manifest['datetime'])
+
+        stock_frame = StockFrame(
+            data=data,
+            storage=manifest['storage'],
+            max_history=manifest['max_history'],
+            compact=manifest['compact'],
+            price_tolerance=manifest['price_tolerance']
+        )
+
+        # The rows were saved in frame order, so the other columns line up as is.
+        frame = stock_frame.frame
+        for column, file_name in columns.items():
+            if column not in price_columns:
+                frame[column] = np.array(self._read_array(file_name=file_name))
+
+        return stock_frame
+
+    def _load_indicators(self, manifest: dict, stock_frame: StockFrame) -> Indicators:
+
+        indicator_client = Indicators(price_data_frame=stock_frame, streaming=manifest['streaming'])
+
+        for column_name, indicator in manifest['indicators'].items():
+            indicator_client._current_indicators[column_name] = {
+                'func': getattr(indicator_client, indicator['func']),
+                'args': indicator['args']
+            }
+
+        for key, signal in manifest['signals'].items():
+
+            indicator_client._indicator_signals[key] = dict(signal)
+            indicator_client._indicator_signals[key]['buy_operator'] = getattr(operator, signal['buy_operator'])
+            indicator_client._indicator_signals[key]['sell_operator'] = getattr(operator, signal['sell_operator'])
+
+        for column_name, states in manifest['states'].items():
+
+            factory = functools.partial(getattr(indicator_state, states['class']), **states['parameters'])
+
+            values = self._read_array(file_name=states['values'])
+            offsets = self._read_array(file_name=states['offsets'])
+            timestamps = self._read_array(file_name=states['timestamps'])
+
+            symbol_states = {}
+            for position, symbol in enumerate(states['symbols']):
+
+                state = factory()
+                state.set_state(values=np.array(values[offsets[position]:offsets[position + 1]]))
+                state.last_timestamp = pd.Timestamp(timestamps[position]) if timestamps[position] != pd.NaT.value else None
+
+                symbol_states[symbol] = state
+
+            indicator_client._indicator_states[column_name] = {
+                'factory': factory,
+                'symbols': symbol_states
+            }
+
+        return indicator_client
+
+    def load(self) -> Tuple[StockFrame, Indicators, Dict[str, Any]]:
+
+        if not self.exists():
+            raise ValueError("There's no snapshot in {folder}.".format(folder=self.folder))
+
+        with open(self.manifest_path, mode='r') as manifest_file:
+            manifest = json.load(manifest_file)
+
+        stock_frame = self._load_stock_frame(manifest=manifest['stock_frame'])
+
+        indicator_client = None
+        if manifest['indicators'] is not None:
+            indicator_client = self._load_indicators(manifest=manifest['indicators'], stock_frame=stock_frame)
+
+        return stock_frame, indicator_client, manifest['metadata']
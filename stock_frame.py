@@ -1,36 +1,126 @@
+import bisect
+
 import numpy as np
 import pandas as pd
 
 from datetime import time, datetime, timezone
 
-from typing import List, Dict, Union
+from typing import Callable, List, Dict, Tuple, Union
 
 from pandas.core.groupby import DataFrameGroupBy
 from pandas.core.window import RollingGroupby
 
+from pyrobot.ring_buffer import SymbolRingBuffer
+
 class StockFrame():
 
-    def __init__(self, data: List[dict]) -> None:
+    def __init__(self, data: Union[List[dict], Dict[str, np.ndarray]], storage: str = 'frame', max_history: int = 20000,
+                 compact: bool = False, price_tolerance: float = 1e-4) -> None:
+
+        if storage not in ['frame', 'ring']:
+            raise ValueError("Storage must be either 'frame' or 'ring'.")
 
         self._data = data
+        self._storage = storage
+        self._max_history = max_history
+
+        # Opt-in smaller layout: categorical symbols, float32 prices when they
+        # round trip within `price_tolerance`, and uint32 volume.
+        self._compact = compact
+        self._price_tolerance = price_tolerance
+        self._buffers: Dict[str, SymbolRingBuffer] = {}
+        self._frame_is_stale = False
         self._frame: pd.DataFrame = self.create_frame()
+
+        # The frame holds everything now, so don't keep the raw input alive too.
+        if self._compact:
+            self._data = None
+
         self._symbol_groups: DataFrameGroupBy = None
         self._symbol_rolling_groups: RollingGroupby
 
+        # Per-symbol row ranges of the symbol-sorted frame, rebuilt only
+        # after rows are added or removed.
+        self._symbol_slices: Dict[str, slice] = None
+        self._grouped_frame: pd.DataFrame = None
+        self._grouped_rows = -1
+
+        # Higher timeframes derived from these bars, kept up to date by `add_rows()`.
+        self._timeframes: Dict[Tuple[str, int], dict] = {}
+
+        # Called with each batch of new bars, after it's been added.
+        self._bar_listeners: List[Callable[[Dict[str, np.ndarray]], None]] = []
+
+        if self._storage == 'ring':
+            self._load_buffers(price_df=self._frame)
+
     @property
     def frame(self) -> pd.DataFrame:
+
+        # The ring buffers only turn into a frame when someone asks for it.
+        if self._frame_is_stale:
+            self._frame = self._frame_from_buffers()
+            self._frame_is_stale = False
+
         return self._frame
     
+    def _invalidate_groups(self) -> None:
+
+        self._symbol_groups = None
+        self._symbol_slices = None
+        self._grouped_frame = None
+
+    def _check_groups(self) -> pd.DataFrame:
+
+        frame = self.frame
+
+        # A new frame object or a different row count means the rows moved.
+        if self._grouped_frame is not frame or self._grouped_rows != frame.shape[0]:
+            self._invalidate_groups()
+            self._grouped_frame = frame
+            self._grouped_rows = frame.shape[0]
+
+        return frame
+
     @property
     def symbol_groups(self) -> DataFrameGroupBy:
-        
-        self._symbol_groups = self._frame.groupby(by='symbol', as_index=False, sort=True)
+
+        frame = self._check_groups()
+
+        if self._symbol_groups is None:
+            self._symbol_groups = frame.groupby(by='symbol', as_index=False, sort=True)
+
         return self._symbol_groups
+
+    @property
+    def symbol_slices(self) -> Dict[str, slice]:
+
+        frame = self._check_groups()
+
+        if self._symbol_slices is None:
+
+            # The frame is kept sorted by symbol, so each symbol is one run of rows.
+            symbol_codes = frame.index.codes[0]
+            starts = np.flatnonzero(np.r_[True, symbol_codes[1:] != symbol_codes[:-1]]) if symbol_codes.shape[0] else np.empty(0, dtype='int64')
+            stops = np.append(starts[1:], symbol_codes.shape[0])
+
+            symbols = frame.index.levels[0][symbol_codes[starts]]
+
+            self._symbol_slices = {
+                symbol: slice(int(start), int(stop))
+                for symbol, start, stop in zip(symbols, starts, stops)
+            }
+
+        return self._symbol_slices
+
+    def symbol_frame(self, symbol: str) -> pd.DataFrame:
+
+        # A view of one symbol's rows, no grouping needed.
+        return self.frame.iloc[self.symbol_slices[symbol]]
     
     def symbol_rolling_groups(self, size: int) -> RollingGroupby:
 
-        if not self._symbol_groups:
-            self.symbol_groups
+        self.symbol_groups
 
         self._symbol_rolling_groups = self._symbol_groups.rolling(size)
 
@@ -40,9 +130,61 @@ class StockFrame():
         # Make a data frame.
         price_df = pd.DataFrame(data=self._data)
         price_df = self._parse_datetime_column(price_df=price_df)
-        price_df = self._set_multi_index(price=price_df)
+        price_df = self._set_multi_index(price_df=price_df)
+
+        if self._compact:
+            price_df = self._compact_frame(price_df=price_df)
 
         return price_df
+
+    def _compact_dtype(self, column: str, values: np.ndarray) -> np.dtype:
+
+        values = np.asarray(values)
+
+        if values.shape[0] == 0:
+            return values.dtype
+
+        if column == 'volume':
+            if values.min() >= 0 and values.max() <= np.iinfo('uint32').max:
+                return np.dtype('uint32')
+            return np.dtype('int64')
+
+        # Only drop to float32 when every price survives the round trip.
+        float_values = values.astype('float64')
+        if np.nanmax(np.abs(float_values.astype('float32') - float_values), initial=0.0) <= self._price_tolerance:
+            return np.dtype('float32')
+
+        return np.dtype('float64')
+
+    def _compact_frame(self, price_df: pd.DataFrame) -> pd.DataFrame:
+
+        price_df = price_df.astype({
+            column: self._compact_dtype(column=column, values=price_df[column].to_numpy())
+            for column in ['open', 'close', 'high', 'low', 'volume']
+        })
+
+        price_df.index = price_df.index.set_levels(pd.CategoricalIndex(price_df.index.levels[0]), level=0)
+
+        return price_df
+
+    def _fit_dtypes(self, frame: pd.DataFrame, batch: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+
+        # New bars take the frame's dtypes, unless they need a wider one, in
+        # which case the frame column is widened first.
+        fitted = dict(batch)
+
+        for column in ['open', 'close', 'high', 'low', 'volume']:
+
+            frame_dtype = frame[column].dtype
+            batch_dtype = self._compact_dtype(column=column, values=batch[column]) if self._compact else batch[column].dtype
+            dtype = np.promote_types(frame_dtype, batch_dtype) if frame.shape[0] > 0 else batch_dtype
+
+            if dtype != frame_dtype:
+                frame[column] = frame[column].astype(dtype)
+
+            fitted[column] = batch[column].astype(dtype)
+
+        return fitted
     
     def _parse_datetime_column(self, price_df: pd.DataFrame) -> pd.DataFrame:
 
@@ -53,82 +195,718 @@ class StockFrame():
 
         price_df = price_df.set_index(keys=['symbol', 'datetime'])
 
+        # Each symbol's rows have to sit together, oldest first.
+        if not price_df.index.is_monotonic_increasing:
+            price_df = price_df.sort_index()
+
         return price_df
     
-    def add_rows(self, data: dict) -> None:
-        column_names = ['open','close','high','low','volume']
-
-        for symbol in data:
-            # Parse that timestamp
-            time_stamp = pd.to_datetime(data[symbol]['quoteTimeInLong'], unit='ms', origin='unix')
-
-            #Define index
-            row_id = (symbol,time_stamp)
-
-            #Define Values
-            row_values = [
-                data[symbol]['openPrice'],
-                data[symbol]['closePrice'],
-                data[symbol]['highPrice'],
-                data[symbol]['lowPrice'],
-                data[symbol]['askSize'] + data[symbol]['bidsize']
-                ]
-            
-            #New Row
-            new_row = pd.Series(data=row_values)
-
-            # Add the row
-            self.frame.loc[row_id, column_names] = new_row.values
-            self.frame.sort_index(inplace=True)
+    def _load_buffers(self, price_df: pd.DataFrame) -> None:
+
+        datetimes = price_df.index.get_level_values(1).to_numpy()
+        columns = {column: price_df[column].to_numpy() for column in ['open', 'close', 'high', 'low', 'volume']}
+
+        for symbol, positions in price_df.groupby(level='symbol', sort=True).indices.items():
+
+            if symbol not in self._buffers:
+                self._buffers[symbol] = SymbolRingBuffer(capacity=self._max_history)
+
+            self._buffers[symbol].extend(
+                datetimes=datetimes[positions],
+                columns={column: values[positions] for column, values in columns.items()}
+            )
+
+        self._frame_is_stale = True
+
+    def _frame_from_buffers(self) -> pd.DataFrame:
+
+        symbols = sorted(self._buffers)
+        symbol_arrays = [self._buffers[symbol].to_arrays() for symbol in symbols]
+        lengths = np.array([datetimes.shape[0] for datetimes, _ in symbol_arrays], dtype='int64')
+
+        # Build the index straight from codes, the symbols are already sorted
+        # and only the datetimes need factorizing.
+        datetimes = np.concatenate([datetimes for datetimes, _ in symbol_arrays])
+        unique_datetimes, datetime_codes = np.unique(datetimes, return_inverse=True)
+
+        index = pd.MultiIndex(
+            levels=[pd.Index(symbols), pd.DatetimeIndex(unique_datetimes)],
+            codes=[np.repeat(np.arange(len(symbols)), lengths), datetime_codes],
+            names=['symbol', 'datetime'],
+            verify_integrity=False
+        )
+
+        price_df = pd.DataFrame(
+            data={
+                column: np.concatenate([columns[column] for _, columns in symbol_arrays])
+                for column in ['open', 'close', 'high', 'low', 'volume']
+            },
+            index=index
+        )
+
+        if self._compact:
+            price_df = self._compact_frame(price_df=price_df)
+
+        # Carry over any indicator columns computed on the previous frame.
+        indicator_columns = [] if self._frame is None else self._frame.columns.difference(price_df.columns, sort=False)
+
+        if len(indicator_columns) > 0:
+
+            old_rows, new_rows = self._carried_rows(symbols=symbols, datetimes=datetimes, lengths=lengths)
+
+            for column in indicator_columns:
+
+                old_values = self._frame[column].to_numpy()
+                values = np.full(datetimes.shape[0], np.nan, dtype=np.result_type(old_values.dtype, np.float64) if old_values.dtype.kind in 'biuf' else object)
+                values[new_rows] = old_values[old_rows]
+
+                price_df[column] = values
+
+        return price_df
+
+    def _carried_rows(self, symbols: List[str], datetimes: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+
+        # A buffer only drops its oldest bars and adds newer ones, so the bars
+        # still in it are one run of the symbol's rows in the previous frame.
+        # Pairs those runs up by position instead of reindexing on labels.
+        old_index = self._frame.index
+        old_codes = old_index.codes[0]
+        old_datetimes = old_index.get_level_values(1).as_unit('ns').asi8
+
+        old_starts = np.flatnonzero(np.r_[True, old_codes[1:] != old_codes[:-1]]) if old_codes.shape[0] else np.empty(0, dtype='int64')
+        old_stops = np.append(old_starts[1:], old_codes.shape[0])
+        old_slices = dict(zip(old_index.levels[0][old_codes[old_starts]], zip(old_starts, old_stops)))
+
+        datetimes = datetimes.view('int64')
+        new_starts = np.r_[0, np.cumsum(lengths)[:-1]]
+
+        old_rows = []
+        new_rows = []
+        for symbol, new_start, length in zip(symbols, new_starts, lengths):
+
+            if symbol not in old_slices or length == 0:
+                continue
+
+            old_start, old_stop = old_slices[symbol]
+            first_kept = old_start + np.searchsorted(old_datetimes[old_start:old_stop], datetimes[new_start])
+            count = min(old_stop - first_kept, length)
+
+            if count > 0:
+                old_rows.append(np.arange(first_kept, first_kept + count))
+                new_rows.append(np.arange(new_start, new_start + count))
+
+        if not old_rows:
+            return np.empty(0, dtype='int64'), np.empty(0, dtype='int64')
+
+        return np.concatenate(old_rows), np.concatenate(new_rows)
+
+    def memory_usage(self, by: str = 'column') -> pd.Series:
+
+        if by not in ['column', 'symbol']:
+            raise ValueError("Memory usage can only be broken down by 'column' or 'symbol'.")
+
+        frame = self.frame
+
+        if by == 'column':
+
+            usage = frame.memory_usage(index=False, deep=True)
+            usage['index'] = frame.index.memory_usage(deep=True)
+
+            if self._storage == 'ring':
+                usage['ring_buffers'] = sum(buffer.nbytes for buffer in self._buffers.values())
+
+            return usage.rename('bytes')
+
+        # Every row costs the same, so split the total by row count.
+        total = frame.memory_usage(index=True, deep=True).sum()
+        bytes_per_row = total / frame.shape[0] if frame.shape[0] > 0 else 0.0
+
+        usage = pd.Series(
+            data={symbol: int(round((symbol_slice.stop - symbol_slice.start) * bytes_per_row)) for symbol, symbol_slice in self.symbol_slices.items()},
+            dtype='int64',
+            name='bytes'
+        )
+
+        if self._storage == 'ring':
+            usage = usage.add(pd.Series({symbol: buffer.nbytes for symbol, buffer in self._buffers.items()}, dtype='int64'), fill_value=0).astype('int64').rename('bytes')
+
+        return usage
+
+    def last_timestamps(self) -> Dict[str, pd.Timestamp]:
+
+        # The ring buffers already know their newest bar.
+        if self._storage == 'ring':
+            return {
+                symbol: pd.Timestamp(buffer.last_timestamp)
+                for symbol, buffer in self._buffers.items()
+                if len(buffer) > 0
+            }
+
+        datetimes = self.frame.index.get_level_values(1)
+
+        return {
+            symbol: datetimes[symbol_slice.stop - 1]
+            for symbol, symbol_slice in self.symbol_slices.items()
+        }
+
+    def _batch_columns(self, data: Union[dict, List[dict], pd.DataFrame]) -> Dict[str, np.ndarray]:
+
+        required_columns = ['symbol', 'datetime', 'open', 'close', 'high', 'low', 'volume']
+
+        if isinstance(data, pd.DataFrame):
+
+            if 'symbol' not in data.columns:
+                data = data.reset_index()
+
+            columns = {column: data[column].to_numpy() for column in required_columns if column in data.columns}
+
+        # Quotes keyed by symbol, the way `grab_current_quotes()` returns them.
+        elif isinstance(data, dict) and data and all(isinstance(quote, dict) for quote in data.values()):
+
+            quotes = list(data.values())
+
+            columns = {
+                'symbol': list(data.keys()),
+                'datetime': [quote['quoteTimeInLong'] for quote in quotes],
+                'open': [quote['openPrice'] for quote in quotes],
+                'close': [quote['closePrice'] for quote in quotes],
+                'high': [quote['highPrice'] for quote in quotes],
+                'low': [quote['lowPrice'] for quote in quotes],
+                'volume': [quote['askSize'] + quote.get('bidSize', quote.get('bidsize', 0)) for quote in quotes]
+            }
+
+        elif isinstance(data, dict):
+            columns = dict(data)
+
+        # A list of candles, like `get_latest_bar()` returns.
+        else:
+
+            columns = {}
+            for column in required_columns:
+                try:
+                    columns[column] = [row[column] for row in data]
+                except KeyError:
+                    pass
+
+        missing_columns = set(required_columns).difference(columns)
+        if missing_columns:
+            raise ValueError("The new rows are missing the following columns: {missing_columns}".format(
+                missing_columns=missing_columns
+            ))
+
+        row_counts = {len(columns[column]) for column in required_columns}
+        if len(row_counts) > 1:
+            raise ValueError("The new rows have columns of different lengths: {row_counts}".format(row_counts=row_counts))
+
+        batch = {
+            'symbol': np.asarray(columns['symbol'], dtype=object),
+            'datetime': self._epoch_milliseconds(values=columns['datetime'])
+        }
+
+        for column in ['open', 'close', 'high', 'low']:
+            batch[column] = np.asarray(columns[column], dtype='float64')
+
+            if not np.isfinite(batch[column]).all():
+                raise ValueError("The new rows have missing or infinite {column} prices.".format(column=column))
+
+        batch['volume'] = np.asarray(columns['volume']).astype('int64')
+
+        return batch
+
+    @staticmethod
+    def _epoch_milliseconds(values: Union[list, np.ndarray]) -> np.ndarray:
+
+        values = np.asarray(values)
+
+        if values.dtype.kind in 'iuf':
+            return values.astype('int64')
+
+        return pd.DatetimeIndex(pd.to_datetime(values)).as_unit('ms').asi8
+
+    def _sorted_batch(self, batch: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+
+        # Order by symbol then datetime; for repeated bars the last one wins.
+        symbol_codes, _ = pd.factorize(batch['symbol'], sort=True)
+        order = np.lexsort((batch['datetime'], symbol_codes))
+
+        symbol_codes = symbol_codes[order]
+        datetimes = batch['datetime'][order]
+
+        is_last = np.ones(order.shape[0], dtype='bool')
+        is_last[:-1] = (symbol_codes[1:] != symbol_codes[:-1]) | (datetimes[1:] != datetimes[:-1])
+
+        return {column: values[order[is_last]] for column, values in batch.items()}
+
+    def _append_to_buffers(self, batch: Dict[str, np.ndarray]) -> np.ndarray:
+
+        symbols = batch['symbol']
+        starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]])
+        stops = np.append(starts[1:], symbols.shape[0])
+
+        datetimes = batch['datetime'].astype('datetime64[ms]')
+
+        # A bar at a buffer's last timestamp replaces the one stored there.
+        revised = np.zeros(symbols.shape[0], dtype='bool')
+
+        for start, stop in zip(starts, stops):
+
+            symbol = symbols[start]
+
+            if symbol not in self._buffers:
+                self._buffers[symbol] = SymbolRingBuffer(capacity=self._max_history)
+
+            last_timestamp = self._buffers[symbol].last_timestamp
+            if last_timestamp is not None:
+                revised[start:stop] = datetimes[start:stop] == last_timestamp
+
+            self._buffers[symbol].extend(
+                datetimes=datetimes[start:stop],
+                columns={column: batch[column][start:stop] for column in ['open', 'close', 'high', 'low', 'volume']}
+            )
+
+        self._frame_is_stale = True
+
+        return revised
+
+    def _merge_into_frame(self, batch: Dict[str, np.ndarray]) -> np.ndarray:
+
+        column_names = ['open', 'close', 'high', 'low', 'volume']
+
+        frame = self.frame
+        symbol_slices = self.symbol_slices
+        existing_symbols = list(symbol_slices)
+
+        batch = self._fit_dtypes(frame=frame, batch=batch)
+
+        existing_datetimes = frame.index.get_level_values(1)
+        new_datetimes = pd.to_datetime(batch['datetime'], unit='ms', origin='unix')
+
+        if frame.shape[0] > 0:
+            new_datetimes = new_datetimes.as_unit(existing_datetimes.unit)
+
+        existing_values = existing_datetimes.asi8
+        new_values = new_datetimes.asi8
+
+        # Find where each new bar belongs in the sorted frame, per symbol.
+        insert_positions = np.empty(new_values.shape[0], dtype='int64')
+        is_update = np.zeros(new_values.shape[0], dtype='bool')
+
+        symbols = batch['symbol']
+        starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]])
+        stops = np.append(starts[1:], symbols.shape[0])
+
+        for start, stop in zip(starts, stops):
+
+            symbol = symbols[start]
+            symbol_slice = symbol_slices.get(symbol)
+
+            if symbol_slice is None:
+                next_symbol = bisect.bisect_right(existing_symbols, symbol)
+                insert_positions[start:stop] = symbol_slices[existing_symbols[next_symbol]].start if next_symbol < len(existing_symbols) else frame.shape[0]
+                continue
+
+            positions = symbol_slice.start + np.searchsorted(existing_values[symbol_slice], new_values[start:stop], side='left')
+            in_range = positions < symbol_slice.stop
+
+            insert_positions[start:stop] = positions
+            is_update[start:stop][in_range] = existing_values[positions[in_range]] == new_values[start:stop][in_range]
+
+        # Bars we already have are overwritten in place.
+        if is_update.any():
+            for column in column_names:
+                frame.iloc[insert_positions[is_update], frame.columns.get_loc(column)] = batch[column][is_update]
+
+        is_new = ~is_update
+        if not is_new.any():
+            return is_update
+
+        new_rows = pd.DataFrame(
+            data={column: batch[column][is_new] for column in column_names},
+            index=pd.MultiIndex.from_arrays([symbols[is_new], new_datetimes[is_new]], names=['symbol', 'datetime'])
+        )
+
+        # Both sides are already sorted, so one take puts every new row in place.
+        order = np.insert(np.arange(frame.shape[0]), insert_positions[is_new], frame.shape[0] + np.arange(new_rows.shape[0]))
+
+        self._frame = pd.concat([frame, new_rows]).take(order)
+
+        if self._compact and not isinstance(self._frame.index.levels[0], pd.CategoricalIndex):
+            self._frame.index = self._frame.index.set_levels(pd.CategoricalIndex(self._frame.index.levels[0]), level=0)
+
+        self._invalidate_groups()
+
+        return is_update
+
+    def add_rows(self, data: Union[dict, List[dict], Dict[str, np.ndarray], pd.DataFrame]) -> None:
+
+        # Takes quotes keyed by symbol, a list of candles, columns of arrays or
+        # a DataFrame, and adds them all in one merge.
+        batch = self._batch_columns(data=data)
+
+        if batch['symbol'].shape[0] == 0:
+            return
+
+        batch = self._sorted_batch(batch=batch)
+
+        # Marks the bars that replaced ones already stored, so whatever was
+        # derived from the old bars knows to rebuild from them.
+        if self._storage == 'ring':
+            batch['revised'] = self._append_to_buffers(batch=batch)
+        else:
+            batch['revised'] = self._merge_into_frame(batch=batch)
+
+        if self._timeframes:
+            self._update_timeframes(batch=batch)
+
+        for listener in self._bar_listeners:
+            listener(batch)
+
+    def add_bar_listener(self, listener: Callable[[Dict[str, np.ndarray]], None]) -> None:
+
+        # Listeners get the batch columns: symbol, datetime (ms since epoch),
+        # open, close, high, low and volume, sorted by symbol then time, and
+        # `revised`, true for bars that replaced a stored bar.
+        self._bar_listeners.append(listener)
+
+    def remove_bar_listener(self, listener: Callable[[Dict[str, np.ndarray]], None]) -> None:
+
+        if listener not in self._bar_listeners:
+            raise KeyError("That listener isn't following this frame.")
+
+        self._bar_listeners.remove(listener)
+
+    @property
+    def timeframes(self) -> Dict[Tuple[str, int], 'StockFrame']:
+
+        return {key: timeframe['stock_frame'] for key, timeframe in self._timeframes.items()}
+
+    def resample(self, bar_size: int, bar_type: str = 'minute', session_timezone: str = 'America/New_York',
+                 session_start: time = time(9, 30), session_end: time = time(16, 0), extended_hours: bool = False) -> 'StockFrame':
+
+        if bar_type not in ['minute', 'day']:
+            raise ValueError("Bars can only be resampled to 'minute' or 'day' bars.")
+
+        key = (bar_type, bar_size)
+
+        if key in self._timeframes:
+            return self._timeframes[key]['stock_frame']
+
+        timeframe = {
+            'bar_type': bar_type,
+            'bar_size': bar_size,
+            'session_timezone': session_timezone,
+            'session_start': session_start,
+            'session_end': session_end,
+            'extended_hours': extended_hours
+        }
+
+        frame = self.frame
+        columns = {column: frame[column].to_numpy() for column in ['open', 'close', 'high', 'low', 'volume']}
+
+        timeframe['stock_frame'] = StockFrame(
+            data=self._aggregate_bars(
+                timeframe=timeframe,
+                symbols=frame.index.get_level_values(0).to_numpy(dtype=object),
+                datetimes=frame.index.get_level_values(1).as_unit('ns').asi8,
+                columns=columns
+            ),
+            storage=self._storage,
+            max_history=self._max_history,
+            compact=self._compact,
+            price_tolerance=self._price_tolerance
+        )
+
+        self._timeframes[key] = timeframe
+
+        return timeframe['stock_frame']
+
+    def _bucket_starts(self, timeframe: dict, datetimes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+
+        # Bars are stored in naive UTC, but sessions open on exchange time.
+        local_times = pd.DatetimeIndex(datetimes).tz_localize('UTC').tz_convert(timeframe['session_timezone']).tz_localize(None)
+
+        local_values = local_times.asi8
+        local_midnights = local_times.normalize().asi8
+        since_midnight = local_values - local_midnights
+
+        session_start = pd.Timedelta(hours=timeframe['session_start'].hour, minutes=timeframe['session_start'].minute).value
+        session_end = pd.Timedelta(hours=timeframe['session_end'].hour, minutes=timeframe['session_end'].minute).value
+
+        if timeframe['extended_hours']:
+            in_session = np.ones(datetimes.shape[0], dtype='bool')
+        else:
+            in_session = (since_midnight >= session_start) & (since_midnight < session_end)
+
+        if timeframe['bar_type'] == 'day':
+
+            # The offset at midnight can differ from the bar's on a clock change day.
+            session_days, day_positions = np.unique(local_midnights, return_inverse=True)
+            session_days = pd.DatetimeIndex(session_days).tz_localize(
+                timeframe['session_timezone'],
+                ambiguous=np.ones(session_days.shape[0], dtype='bool'),
+                nonexistent='shift_forward'
+            )
+
+            return session_days.tz_convert('UTC').tz_localize(None).as_unit('ns').asi8[day_positions], in_session
+
+        # Intraday bars line up with the session open, not the top of the hour.
+        bar_length = timeframe['bar_size'] * pd.Timedelta(minutes=1).value
+        local_buckets = local_midnights + session_start + (since_midnight - session_start) // bar_length * bar_length
+
+        # Shift back to UTC with each bar's own offset.
+        return datetimes - (local_values - local_buckets), in_session
+
+    def _aggregate_bars(self, timeframe: dict, symbols: np.ndarray, datetimes: np.ndarray, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+
+        buckets, in_session = self._bucket_starts(timeframe=timeframe, datetimes=datetimes)
+
+        symbols = symbols[in_session]
+        buckets = buckets[in_session]
+        columns = {column: values[in_session] for column, values in columns.items()}
+
+        if symbols.shape[0] == 0:
+            return {column: np.empty(0) for column in ['symbol', 'datetime', 'open', 'close', 'high', 'low', 'volume']}
+
+        # Rows are sorted by symbol and time, so each new bar is one run of rows.
+        starts = np.flatnonzero(np.r_[True, (symbols[1:] != symbols[:-1]) | (buckets[1:] != buckets[:-1])])
+        stops = np.append(starts[1:], symbols.shape[0])
+
+        return {
+            'symbol': symbols[starts],
+            'datetime': buckets[starts] // 10**6,
+            'open': columns['open'][starts],
+            'close': columns['close'][stops - 1],
+            'high': np.maximum.reduceat(columns['high'], starts),
+            'low': np.minimum.reduceat(columns['low'], starts),
+            'volume': np.add.reduceat(columns['volume'], starts)
+        }
+
+    def _update_timeframes(self, batch: Dict[str, np.ndarray]) -> None:
+
+        batch_datetimes = batch['datetime'] * 10**6
+
+        # The stored bars are pulled out once per batch and sliced per symbol,
+        # never once per symbol.
+        if self._storage == 'frame':
+            frame = self.frame
+            symbol_slices = self.symbol_slices
+            datetimes = frame.index.get_level_values(1).as_unit('ns').asi8
+            columns = {column: frame[column].to_numpy() for column in ['open', 'close', 'high', 'low', 'volume']}
+
+        for timeframe in self._timeframes.values():
+
+            buckets, in_session = self._bucket_starts(timeframe=timeframe, datetimes=batch_datetimes)
+
+            # Rebuild every bar from the earliest one each symbol touched,
+            # revised bars included.
+            first_buckets = {}
+            for symbol, bucket in zip(batch['symbol'][in_session], buckets[in_session]):
+                first_buckets[symbol] = min(bucket, first_buckets.get(symbol, bucket))
+
+            if not first_buckets:
+                continue
+
+            symbol_rows = []
+            for symbol, first_bucket in first_buckets.items():
+
+                if self._storage == 'ring':
+                    symbol_datetimes, symbol_columns = self._buffers[symbol].to_arrays()
+                    symbol_datetimes = symbol_datetimes.view('int64')
+                else:
+                    symbol_slice = symbol_slices[symbol]
+                    symbol_datetimes = datetimes[symbol_slice]
+                    symbol_columns = {column: values[symbol_slice] for column, values in columns.items()}
+
+                first = np.searchsorted(symbol_datetimes, first_bucket, side='left')
+
+                symbol_rows.append(
+                    self._aggregate_bars(
+                        timeframe=timeframe,
+                        symbols=np.full(symbol_datetimes.shape[0] - first, symbol, dtype=object),
+                        datetimes=symbol_datetimes[first:],
+                        columns={column: values[first:] for column, values in symbol_columns.items()}
+                    )
+                )
+
+            timeframe['stock_frame'].add_rows(
+                data={column: np.concatenate([rows[column] for rows in symbol_rows]) for column in symbol_rows[0]}
+            )
 
     def do_indicators_exist(self, column_names: List[str]) -> bool:
 
-        if set(column_names).issubset(self._frame.columns):
+        if set(column_names).issubset(self.frame.columns):
             return True
         else:
             raise KeyError("The following indicator columns are missing from the StockFrame: {missing_columns}".format(
                 missing_columns=set(column_names).difference(
-                    self._frame.columns)
+                    self.frame.columns)
             ))
 
-    def _check_signals(self, indicators: dict, indciators_comp_key: List[str], indicators_key: List[str]) -> Union[pd.DataFrame, None]:
+    def _signal_columns(self, indicators: dict, rule_keys: List[str]) -> List[str]:
+
+        columns = []
+        for rule_key in rule_keys:
+
+            if 'indicator_1' in indicators[rule_key]:
+                columns += [indicators[rule_key]['indicator_1'], indicators[rule_key]['indicator_2']]
+            else:
+                columns.append(rule_key)
+
+        return columns
+
+    def _previous_values(self, column: str, positions: np.ndarray) -> np.ndarray:
+
+        # The same symbol's value one bar earlier, NaN on its first bar.
+        frame = self.frame
+        values = frame[column].to_numpy(dtype='float64')
+        symbol_codes = frame.index.codes[0]
+
+        previous = positions - 1
+        has_previous = previous >= 0
+        has_previous[has_previous] = symbol_codes[previous[has_previous]] == symbol_codes[positions[has_previous]]
+
+        previous_values = np.full(positions.shape[0], np.nan)
+        previous_values[has_previous] = values[previous[has_previous]]
+
+        return previous_values
+
+    def _evaluate_signal(self, rule_key: str, rule: dict, rows: pd.DataFrame, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
 
-        # Grab the last rows.
-        last_rows = self._symbol_groups.tail(1)
+        # Compare against a fixed target.
+        if 'indicator_1' not in rule:
+
+            column = rows[rule_key].to_numpy()
+
+            buys = np.asarray(rule['buy_operator'](column, rule['buy']), dtype='bool')
+            sells = np.asarray(rule['sell_operator'](column, rule['sell']), dtype='bool')
+
+            return buys, sells
+
+        # Compare two indicator columns.
+        first = rows[rule['indicator_1']].to_numpy(dtype='float64')
+        second = rows[rule['indicator_2']].to_numpy(dtype='float64')
+
+        buys = np.asarray(rule['buy_operator'](first, second), dtype='bool')
+        sells = np.asarray(rule['sell_operator'](first, second), dtype='bool')
+
+        # A crossover only counts on the bar where the comparison flips.
+        if rule.get('crossover'):
+
+            previous_first = self._previous_values(column=rule['indicator_1'], positions=positions)
+            previous_second = self._previous_values(column=rule['indicator_2'], positions=positions)
+
+            has_previous = ~np.isnan(previous_first) & ~np.isnan(previous_second)
+
+            buys &= has_previous & ~np.asarray(rule['buy_operator'](previous_first, previous_second), dtype='bool')
+            sells &= has_previous & ~np.asarray(rule['sell_operator'](previous_first, previous_second), dtype='bool')
+
+        return buys, sells
+
+    def _signal_keys(self, indicators: dict, indciators_comp_key: List[str] = None, indicators_key: List[str] = None) -> List[str]:
+
+        if indicators_key is None and indciators_comp_key is None:
+            return list(indicators.keys())
+
+        return (indicators_key or []) + (indciators_comp_key or [])
+
+    def _combine_signals(self, masks: List[np.ndarray], size: int, combine: str) -> np.ndarray:
+
+        # A row buys (or sells) when any rule says so, or with `combine='all'`
+        # only when every rule does.
+        if combine not in ('any', 'all'):
+            raise ValueError("combine must be 'any' or 'all', got {combine!r}.".format(combine=combine))
+
+        if not masks:
+            return np.zeros(size, dtype='bool')
+
+        if combine == 'any':
+            return np.logical_or.reduce(masks)
+
+        return np.logical_and.reduce(masks)
+
+    def _check_signals(self, indicators: dict, indciators_comp_key: List[str] = None, indicators_key: List[str] = None,
+                       last_rows: pd.DataFrame = None, combine: str = 'any') -> Union[pd.DataFrame, None]:
+
+        # Grab the last rows, unless the caller already picked them.
+        if last_rows is None:
+            last_rows = self.frame.iloc[[symbol_slice.stop - 1 for symbol_slice in self.symbol_slices.values()]]
+
+        rule_keys = self._signal_keys(
+            indicators=indicators,
+            indciators_comp_key=indciators_comp_key,
+            indicators_key=indicators_key
+        )
 
         # Define a list of conditions.
-        conditions = {}
+        conditions = {
+            'buys': pd.Series(dtype='bool'),
+            'sells': pd.Series(dtype='bool')
+        }
 
         # Check to see if all the columns exist.
-        if self.do_indicator_exist(column_names=indicators_key):
-
-            for indicator in indicators_key:
+        if self.do_indicators_exist(column_names=self._signal_columns(indicators=indicators, rule_keys=rule_keys)):
 
-                column = last_rows[indicator]
+            positions = self.frame.index.get_indexer(last_rows.index)
 
-                # Grab the Buy & Sell Condition.
-                buy_condition_target = indicators[indicator]['buy']
-                sell_condition_target = indicators[indicator]['sell']
+            buy_masks = []
+            sell_masks = []
 
-                buy_condition_operator = indicators[indicator]['buy_operator']
-                sell_condition_operator = indicators[indicator]['sell_operator']
+            for rule_key in rule_keys:
 
-                condition_1: pd.Series = buy_condition_operator(
-                    column, buy_condition_target
-                )
-                condition_2: pd.Series = sell_condition_operator(
-                    column, sell_condition_target
+                buys, sells = self._evaluate_signal(
+                    rule_key=rule_key,
+                    rule=indicators[rule_key],
+                    rows=last_rows,
+                    positions=positions
                 )
 
-                condition_1 = condition_1.where(lambda x: x == True).dropna()
-                condition_2 = condition_2.where(lambda x: x == True).dropna()
+                buy_masks.append(buys)
+                sell_masks.append(sells)
+
+            buys = self._combine_signals(masks=buy_masks, size=last_rows.shape[0], combine=combine)
+            sells = self._combine_signals(masks=sell_masks, size=last_rows.shape[0], combine=combine)
 
-                conditions['buys'] = condition_1
-                conditions['sells'] = condition_2
+            conditions['buys'] = pd.Series(data=True, index=last_rows.index[buys], dtype='bool')
+            conditions['sells'] = pd.Series(data=True, index=last_rows.index[sells], dtype='bool')
         
         return conditions
 
-            
-    
+    def signal_matrix(self, indicators: dict, indciators_comp_key: List[str] = None, indicators_key: List[str] = None,
+                      combine: str = 'any') -> pd.DataFrame:
+
+        rule_keys = self._signal_keys(
+            indicators=indicators,
+            indciators_comp_key=indciators_comp_key,
+            indicators_key=indicators_key
+        )
+
+        frame = self.frame
+        signals = {}
+
+        # Every rule is one elementwise pass over its whole column.
+        if self.do_indicators_exist(column_names=self._signal_columns(indicators=indicators, rule_keys=rule_keys)):
 
+            positions = np.arange(frame.shape[0])
+
+            for rule_key in rule_keys:
+
+                signals[rule_key + '_buy'], signals[rule_key + '_sell'] = self._evaluate_signal(
+                    rule_key=rule_key,
+                    rule=indicators[rule_key],
+                    rows=frame,
+                    positions=positions
+                )
 
+        # Combined across the rules the same way `_check_signals()` does.
+        signals['buys'] = self._combine_signals(
+            masks=[signals[rule_key + '_buy'] for rule_key in rule_keys if rule_key + '_buy' in signals],
+            size=frame.shape[0],
+            combine=combine
+        )
+        signals['sells'] = self._combine_signals(
+            masks=[signals[rule_key + '_sell'] for rule_key in rule_keys if rule_key + '_sell' in signals],
+            size=frame.shape[0],
+            combine=combine
+        )
+
+        return pd.DataFrame(data=signals, index=frame.index)
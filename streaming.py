@@ -0,0 +1,164 @@
+import json
+import asyncio
+import pathlib
+import time as time_true
+
+from typing import List, Dict, Iterator, Union
+
+from td.client import TDClient
+
+
+class BarAggregator():
+
+    # Rolls ticks up into bars that open on whole multiples of the bar
+    # length, matching the `datetime` of the candles from price history.
+    def __init__(self, bar_seconds: int = 60) -> None:
+
+        self.bar_length = bar_seconds * 1000
+        self._open_bars: Dict[str, dict] = {}
+
+        # The start of each symbol's last closed bar. Ticks for it or anything
+        # older are dropped, a bar rebuilt from them alone would replace the
+        # real one downstream.
+        self._last_closed: Dict[str, int] = {}
+
+    def _close_bar(self, symbol: str) -> dict:
+
+        bar = self._open_bars.pop(symbol)
+        self._last_closed[symbol] = bar['datetime']
+
+        return bar
+
+    def add_tick(self, symbol: str, price: float, volume: int, timestamp: int) -> List[dict]:
+
+        bar_start = timestamp - timestamp % self.bar_length
+        closed_bars = []
+
+        if bar_start <= self._last_closed.get(symbol, bar_start - 1):
+            return closed_bars
+
+        bar = self._open_bars.get(symbol)
+
+        if bar is not None and bar_start > bar['datetime']:
+            closed_bars.append(self._close_bar(symbol=symbol))
+            bar = None
+
+        # A tick for a bar we already closed can't be applied anymore.
+        elif bar is not None and bar_start < bar['datetime']:
+            return closed_bars
+
+        if bar is None:
+            self._open_bars[symbol] = {
+                'symbol': symbol,
+                'open': price,
+                'close': price,
+                'high': price,
+                'low': price,
+                'volume': volume,
+                'datetime': bar_start
+            }
+        else:
+            bar['close'] = price
+            bar['high'] = max(bar['high'], price)
+            bar['low'] = min(bar['low'], price)
+            bar['volume'] += volume
+
+        return closed_bars
+
+    def close_bars(self, timestamp: int = None) -> List[dict]:
+
+        # Close every bar whose window has ended, or all of them if no time is given.
+        closed_symbols = [
+            symbol for symbol, bar in self._open_bars.items()
+            if timestamp is None or bar['datetime'] + self.bar_length <= timestamp
+        ]
+
+        return [self._close_bar(symbol=symbol) for symbol in closed_symbols]
+
+
+class ReplayFeed():
+
+    # Replays a JSON-lines file of recorded feed messages, either as fast as
+    # possible or paced by their timestamps.
+    def __init__(self, file_path: Union[str, pathlib.Path], speed: float = 0.0) -> None:
+
+        self.file_path = pathlib.Path(file_path)
+        self.speed = speed
+
+    def __iter__(self) -> Iterator[dict]:
+
+        last_timestamp = None
+
+        with open(self.file_path, mode='r') as replay_file:
+
+            for line in replay_file:
+
+                if not line.strip():
+                    continue
+
+                message = json.loads(line)
+
+                if self.speed and last_timestamp is not None:
+                    time_true.sleep(max(message['timestamp'] - last_timestamp, 0) / 1000.0 / self.speed)
+
+                last_timestamp = message.get('timestamp', last_timestamp)
+
+                yield message
+
+    @staticmethod
+    def record(file_path: Union[str, pathlib.Path], messages: List[dict]) -> None:
+
+        with open(file_path, mode='a') as replay_file:
+            for message in messages:
+                replay_file.write(json.dumps(message) + '\n')
+
+
+class TDStreamFeed():
+
+    # Turns the level one quote stream into tick messages. Fields are the
+    # symbol, last price, last size and trade time in milliseconds.
+    def __init__(self, td_client: TDClient, symbols: List[str]) -> None:
+
+        self.td_client = td_client
+        self.symbols = symbols
+
+    def __iter__(self) -> Iterator[dict]:
+
+        streaming_client = self.td_client.create_streaming_session()
+        streaming_client.level_one_quotes(symbols=self.symbols, fields=[0, 3, 9, 35])
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(streaming_client.build_pipeline())
+
+        try:
+
+            while True:
+
+                message = loop.run_until_complete(streaming_client.start_pipeline())
+
+                # The pipeline hands back nothing once the connection closes.
+                if message is None:
+                    break
+
+                for data in message.get('data', []):
+
+                    if data.get('service') != 'QUOTE':
+                        continue
+
+                    for content in data['content']:
+
+                        # Partial updates without a trade don't move the bar.
+                        if '3' not in content:
+                            continue
+
+                        yield {
+                            'type': 'tick',
+                            'symbol': content['key'],
+                            'price': content['3'],
+                            'volume': content.get('9', 0),
+                            'timestamp': content.get('35', data['timestamp'])
+                        }
+
+        finally:
+            loop.run_until_complete(streaming_client.close_stream())
+            loop.close()
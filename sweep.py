@@ -0,0 +1,178 @@
+import operator
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Tuple
+
+from pyrobot.stock_frame import StockFrame
+from pyrobot import kernels
+
+# Arrays the worker processes attached to, keyed by name.
+_shared_arrays: Dict[str, np.ndarray] = {}
+_shared_blocks: List[SharedMemory] = []
+
+
+def _attach_shared_arrays(layout: Dict[str, Tuple[str, Tuple[int], str]]) -> None:
+
+    for name, (block_name, shape, dtype) in layout.items():
+
+        block = SharedMemory(name=block_name)
+        _shared_blocks.append(block)
+        _shared_arrays[name] = np.ndarray(shape=shape, dtype=dtype, buffer=block.buf)
+
+
+def _indicator_values(indicator: str, closes: np.ndarray, parameters: Dict[str, Any]) -> np.ndarray:
+
+    # Same kernels as the matching `Indicators` methods, on one symbol's closes.
+    if indicator == 'sma':
+        return kernels.rolling_mean(values=closes, window=parameters['period'])
+
+    elif indicator == 'ema':
+        return kernels.ewm_mean(values=closes, span=parameters['period'])
+
+    elif indicator == 'rsi':
+        return kernels.rsi(values=closes, period=parameters['period'])
+
+    raise ValueError("The sweep doesn't support the {indicator} indicator.".format(indicator=indicator))
+
+
+def _score_signals(buys: np.ndarray, sells: np.ndarray, bar_returns: np.ndarray, segment_starts: np.ndarray) -> Dict[str, float]:
+
+    row_count = buys.shape[0]
+    is_start = np.zeros(row_count, dtype='bool')
+    is_start[segment_starts] = True
+
+    # Long after a buy until the next sell, flat at the start of each symbol.
+    events = np.where(buys, 1, np.where(sells, 0, -1))
+    events[is_start & (events < 0)] = 0
+
+    last_event = np.maximum.accumulate(np.where(events >= 0, np.arange(row_count), 0))
+    position = events[last_event] == 1
+
+    held = np.zeros(row_count, dtype='bool')
+    held[1:] = position[:-1]
+    held[is_start] = False
+
+    strategy_returns = np.where(held, bar_returns, 0.0)
+
+    symbol_returns = np.expm1(np.add.reduceat(np.log1p(strategy_returns), segment_starts))
+    entries = position & ~held
+    entries[is_start] = position[is_start]
+
+    volatility = strategy_returns.std()
+
+    return {
+        'total_return': float(symbol_returns.mean()),
+        'mean_return': float(strategy_returns.mean()),
+        'volatility': float(volatility),
+        # Per bar, not annualized.
+        'sharpe': float(strategy_returns.mean() / volatility) if volatility > 0 else 0.0,
+        'trades': int(entries.sum()),
+        'exposure': float(held.mean())
+    }
+
+
+def _evaluate_parameters(task: Dict[str, Any]) -> List[Dict[str, Any]]:
+
+    closes = _shared_arrays['close']
+    segment_starts = _shared_arrays['segment_starts']
+    segment_ends = np.append(segment_starts[1:], closes.shape[0])
+
+    # Build the indicator once per parameter set, then try every threshold.
+    values = np.concatenate([
+        _indicator_values(indicator=task['indicator'], closes=closes[start:end], parameters=task['parameters'])
+        for start, end in zip(segment_starts, segment_ends)
+    ])
+
+    bar_returns = np.zeros(closes.shape[0])
+    bar_returns[1:] = closes[1:] / closes[:-1] - 1.0
+    bar_returns[segment_starts] = 0.0
+
+    results = []
+    for buy_threshold, sell_threshold in task['thresholds']:
+
+        with np.errstate(invalid='ignore'):
+            buys = np.asarray(task['buy_operator'](values, buy_threshold), dtype='bool')
+            sells = np.asarray(task['sell_operator'](values, sell_threshold), dtype='bool')
+
+        result = dict(task['parameters'])
+        result['buy'] = buy_threshold
+        result['sell'] = sell_threshold
+        result.update(_score_signals(buys=buys, sells=sells, bar_returns=bar_returns, segment_starts=segment_starts))
+
+        results.append(result)
+
+    return results
+
+
+class ParameterSweep():
+
+    # Runs a grid of indicator parameters and signal thresholds over a
+    # StockFrame on a process pool. The prices live in shared memory, so the
+    # workers never get a pickled copy of the frame.
+    def __init__(self, stock_frame: StockFrame, max_workers: int = None) -> None:
+
+        self.stock_frame = stock_frame
+        self.max_workers = max_workers
+
+    def _share(self, arrays: Dict[str, np.ndarray]) -> Tuple[List[SharedMemory], Dict[str, Tuple[str, Tuple[int], str]]]:
+
+        blocks = []
+        layout = {}
+
+        for name, values in arrays.items():
+
+            block = SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(shape=values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+
+            blocks.append(block)
+            layout[name] = (block.name, values.shape, values.dtype.str)
+
+        return blocks, layout
+
+    def run(self, indicator: str, parameter_grid: Dict[str, List[Any]], buy_thresholds: List[float], sell_thresholds: List[float],
+            buy_operator: Any = operator.le, sell_operator: Any = operator.ge, rank_by: str = 'total_return') -> pd.DataFrame:
+
+        frame = self.stock_frame.frame.sort_index()
+        symbols = frame.index.get_level_values(0)
+
+        closes = frame['close'].to_numpy(dtype='float64')
+        segment_starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]]).astype('int64')
+
+        thresholds = list(itertools.product(buy_thresholds, sell_thresholds))
+        parameter_names = list(parameter_grid.keys())
+
+        tasks = [
+            {
+                'indicator': indicator,
+                'parameters': dict(zip(parameter_names, parameter_values)),
+                'thresholds': thresholds,
+                'buy_operator': buy_operator,
+                'sell_operator': sell_operator
+            }
+            for parameter_values in itertools.product(*parameter_grid.values())
+        ]
+
+        blocks, layout = self._share(arrays={'close': closes, 'segment_starts': segment_starts})
+
+        try:
+
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_attach_shared_arrays, initargs=(layout,)) as executor:
+                results = list(itertools.chain.from_iterable(executor.map(_evaluate_parameters, tasks)))
+
+        finally:
+
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        results_df = pd.DataFrame(data=results)
+
+        if not results_df.empty:
+            results_df = results_df.sort_values(by=rank_by, ascending=False).reset_index(drop=True)
+
+        return results_df
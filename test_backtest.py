@@ -0,0 +1,120 @@
+import operator
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datetime import datetime
+
+pytest.importorskip('td')
+
+from pyrobot.backtest import Backtester, SimulatedBroker
+
+
+START = 1_609_770_600_000
+
+
+def make_candles(closes: dict) -> dict:
+
+    columns = {column: [] for column in ['symbol', 'open', 'close', 'high', 'low', 'volume', 'datetime']}
+
+    for symbol, symbol_closes in closes.items():
+        for position, close in enumerate(symbol_closes):
+            columns['symbol'].append(symbol)
+            columns['open'].append(close - 0.5)
+            columns['close'].append(close)
+            columns['high'].append(close + 1.0)
+            columns['low'].append(close - 1.0)
+            columns['volume'].append(100)
+            columns['datetime'].append(START + position * 60_000)
+
+    return {column: np.array(values, dtype=object if column == 'symbol' else None) for column, values in columns.items()}
+
+
+def order(order_type: str, instruction: str, quantity: int = 1, **prices) -> dict:
+
+    return dict(
+        orderType=order_type,
+        orderLegCollection=[{'instruction': instruction, 'quantity': quantity, 'instrument': {'symbol': 'MSFT'}}],
+        **prices
+    )
+
+
+@pytest.mark.parametrize('working_order, bar, fill_price', [
+    (order('MARKET', 'BUY'), (10.0, 11.0, 9.0, 10.5), 10.0),
+    (order('LIMIT', 'BUY', price=9.5), (10.0, 11.0, 9.0, 10.5), 9.5),
+    (order('LIMIT', 'BUY', price=8.0), (10.0, 11.0, 9.0, 10.5), None),
+    (order('LIMIT', 'SELL', price=10.5), (10.0, 11.0, 9.0, 10.5), 10.5),
+    (order('STOP', 'SELL', stopPrice=9.5), (10.0, 11.0, 9.0, 10.5), 9.5),
+    (order('STOP', 'SELL', stopPrice=10.5), (10.0, 11.0, 9.0, 10.5), 10.0),
+    (order('STOP', 'BUY', stopPrice=12.0), (10.0, 11.0, 9.0, 10.5), None),
+])
+def test_simulated_broker_fill_prices(working_order, bar, fill_price):
+
+    broker = SimulatedBroker(initial_cash=1000.0)
+    broker.current_time = datetime(2021, 1, 4, 14, 30)
+    broker.place_order(account='backtest', order=working_order)
+
+    # Nothing fills on the bar the order was placed in.
+    assert broker.process_bars(bar_time=datetime(2021, 1, 4, 14, 30), bars={'MSFT': bar}) == []
+
+    fills = broker.process_bars(bar_time=datetime(2021, 1, 4, 14, 31), bars={'MSFT': bar})
+
+    if fill_price is None:
+        assert fills == [] and len(broker.working_orders) == 1
+    else:
+        quantity = 1 if working_order['orderLegCollection'][0]['instruction'] == 'BUY' else -1
+        assert [fill['price'] for fill in fills] == [fill_price]
+        assert broker.positions == {'MSFT': quantity}
+        assert broker.cash == 1000.0 - quantity * fill_price
+
+
+def test_triggered_children_go_live_after_the_parent_fills():
+
+    broker = SimulatedBroker()
+    broker.current_time = datetime(2021, 1, 4, 14, 30)
+
+    parent = order('MARKET', 'BUY')
+    parent['childOrderStrategies'] = [order('LIMIT', 'SELL', price=12.0)]
+    broker.place_order(account='backtest', order=parent)
+
+    broker.process_bars(bar_time=datetime(2021, 1, 4, 14, 31), bars={'MSFT': (10.0, 11.0, 9.0, 10.5)})
+    broker.current_time = datetime(2021, 1, 4, 14, 31)
+    fills = broker.process_bars(bar_time=datetime(2021, 1, 4, 14, 32), bars={'MSFT': (11.5, 12.5, 11.0, 12.0)})
+
+    assert [fill['order_type'] for fill in broker.fills] == ['MARKET', 'LIMIT']
+    assert fills[0]['price'] == 12.0
+    assert broker.positions == {'MSFT': 0}
+
+
+def test_backtest_fills_signals_on_the_next_open():
+
+    closes = [10.0, 10.0, 12.0, 14.0, 16.0, 12.0, 10.0, 8.0]
+    backtester = Backtester(candles=make_candles(closes={'MSFT': closes}), initial_cash=1000.0)
+
+    backtester.indicator_client.change_in_price()
+    backtester.indicator_client.set_indicator_signals(
+        indicator='change_in_price',
+        buy=2.0,
+        sell=-2.0,
+        condition_buy=operator.ge,
+        condition_sell=operator.le
+    )
+
+    buy_trade = backtester.trading_robot.create_trade(trade_id='buy', enter_or_exit='enter', long_or_short='long', order_type='mkt')
+    buy_trade.instrument(symbol='MSFT', quantity=1, asset_type='EQUITY')
+    sell_trade = backtester.trading_robot.create_trade(trade_id='sell', enter_or_exit='exit', long_or_short='long', order_type='mkt')
+    sell_trade.instrument(symbol='MSFT', quantity=1, asset_type='EQUITY')
+
+    results = backtester.run(trades_to_execute={'MSFT': {'buy': {'trade_func': buy_trade}, 'sell': {'trade_func': sell_trade}}})
+
+    # Buys on bars 2, 3 and 4, sells on bars 5 and 6, each filled at the next open.
+    opens = np.array(closes) - 0.5
+    assert [(fill['quantity'], fill['price']) for fill in results['fills']] == [
+        (1, opens[3]), (1, opens[4]), (1, opens[5]), (-1, opens[6]), (-1, opens[7])
+    ]
+
+    assert results['positions'] == {'MSFT': 1}
+    assert results['cash'] == 1000.0 - opens[3] - opens[4] - opens[5] + opens[6] + opens[7]
+    assert results['equity'].iloc[-1] == results['cash'] + closes[-1]
+    assert isinstance(results['equity'].index, pd.DatetimeIndex)
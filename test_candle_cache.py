@@ -0,0 +1,83 @@
+import numpy as np
+
+from pyrobot.candle_cache import CandleCache, candle_dtype
+
+
+MINUTE = 60_000
+
+
+def candle_columns(first, last, close_offset=0.0):
+
+    positions = np.arange(first, last)
+
+    return {
+        'datetime': positions * MINUTE,
+        'open': positions + 0.25,
+        'close': positions + 0.5 + close_offset,
+        'high': positions + 1.0,
+        'low': positions - 1.0,
+        'volume': positions * 10
+    }
+
+
+def test_empty_cache_misses_the_whole_range(tmp_path):
+
+    candle_cache = CandleCache(folder=tmp_path)
+
+    assert candle_cache.load(symbol='MSFT', bar_type='minute', bar_size=1).dtype == candle_dtype
+    assert candle_cache.missing_ranges(symbol='MSFT', bar_type='minute', bar_size=1, start=0, end=10 * MINUTE) == [(0, 10 * MINUTE)]
+
+
+def test_store_merges_and_new_candles_win(tmp_path):
+
+    candle_cache = CandleCache(folder=tmp_path)
+
+    candle_cache.store(symbol='MSFT', bar_type='minute', bar_size=1, columns=candle_columns(10, 20))
+    candle_cache.store(symbol='MSFT', bar_type='minute', bar_size=1, columns=candle_columns(15, 25, close_offset=100.0))
+
+    candles = candle_cache.load(symbol='MSFT', bar_type='minute', bar_size=1)
+
+    np.testing.assert_array_equal(candles['datetime'], np.arange(10, 25) * MINUTE)
+    np.testing.assert_array_equal(candles['close'][:5], np.arange(10, 15) + 0.5)
+    np.testing.assert_array_equal(candles['close'][5:], np.arange(15, 25) + 100.5)
+
+    window = candle_cache.load(symbol='MSFT', bar_type='minute', bar_size=1, start=12 * MINUTE, end=14 * MINUTE)
+    np.testing.assert_array_equal(window['datetime'], np.arange(12, 15) * MINUTE)
+
+    assert not list(tmp_path.glob('*.tmp.npy'))
+
+
+def test_missing_ranges_cover_the_gaps_and_the_last_bar(tmp_path):
+
+    candle_cache = CandleCache(folder=tmp_path)
+    candle_cache.store(symbol='MSFT', bar_type='minute', bar_size=1, columns=candle_columns(10, 20))
+
+    # Earlier bars are missing, and the last cached bar gets fetched again.
+    assert candle_cache.missing_ranges(symbol='MSFT', bar_type='minute', bar_size=1, start=0, end=30 * MINUTE) == [
+        (0, 10 * MINUTE - 1),
+        (19 * MINUTE, 30 * MINUTE)
+    ]
+
+    assert candle_cache.missing_ranges(symbol='MSFT', bar_type='minute', bar_size=1, start=12 * MINUTE, end=15 * MINUTE) == []
+
+
+def test_holes_in_the_middle_are_missing(tmp_path):
+
+    candle_cache = CandleCache(folder=tmp_path)
+
+    candle_cache.store(symbol='MSFT', bar_type='minute', bar_size=1, columns=candle_columns(10, 20), fetched_ranges=[(5 * MINUTE, 19 * MINUTE)])
+    candle_cache.store(symbol='MSFT', bar_type='minute', bar_size=1, columns=candle_columns(40, 50), fetched_ranges=[(40 * MINUTE, 49 * MINUTE)])
+
+    # A range that came back empty still counts as fetched.
+    candle_cache.store(symbol='MSFT', bar_type='minute', bar_size=1, columns=candle_columns(0, 0), fetched_ranges=[(25 * MINUTE, 30 * MINUTE)])
+
+    assert candle_cache.missing_ranges(symbol='MSFT', bar_type='minute', bar_size=1, start=0, end=80 * MINUTE) == [
+        (0, 5 * MINUTE - 1),
+        (19 * MINUTE + 1, 25 * MINUTE - 1),
+        (30 * MINUTE + 1, 40 * MINUTE - 1),
+        (49 * MINUTE, 80 * MINUTE)
+    ]
+
+    assert candle_cache.missing_ranges(symbol='MSFT', bar_type='minute', bar_size=1, start=12 * MINUTE, end=30 * MINUTE) == [
+        (19 * MINUTE + 1, 25 * MINUTE - 1)
+    ]
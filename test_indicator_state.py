@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from pyrobot.kernels import ewm_mean, rolling_mean
+from pyrobot.indicator_state import IndicatorState, DiffState, EwmState, RollingMeanState, RsiState
+
+
+def test_incomplete_state_fails_when_created():
+
+    class SeedOnlyState(IndicatorState):
+
+        def seed(self, values: np.ndarray) -> None:
+            pass
+
+    with pytest.raises(TypeError):
+        SeedOnlyState()
+
+
+@pytest.mark.parametrize('state_factory, full', [
+    (lambda: DiffState(), lambda values: np.r_[np.nan, np.diff(values)]),
+    (lambda: EwmState(span=20), lambda values: ewm_mean(values=values, span=20)),
+    (lambda: RollingMeanState(window=50), lambda values: rolling_mean(values=values, window=50)),
+])
+def test_update_matches_full_recompute(state_factory, full):
+
+    values = 100.0 + np.cumsum(np.random.default_rng(0).normal(size=400))
+    values[[10, 11, 250]] = np.nan
+
+    state = state_factory()
+    state.seed(values=values[:300])
+
+    streamed = np.concatenate([state.update(values=chunk) for chunk in np.split(values[300:], [1, 5, 60])])
+
+    np.testing.assert_array_equal(streamed, full(values)[300:])
+
+
+def test_rsi_update_matches_full_recompute():
+
+    values = 100.0 + np.cumsum(np.random.default_rng(1).normal(size=300))
+
+    seeded = RsiState(period=14)
+    seeded.seed(values=values[:200])
+
+    replayed = RsiState(period=14)
+    replayed.seed(values=values[:0])
+    replayed.update(values=values[:200])
+
+    np.testing.assert_array_equal(seeded.update(values=values[200:]), replayed.update(values=values[200:]))
@@ -0,0 +1,265 @@
+import operator
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyrobot.stock_frame import StockFrame
+from pyrobot.indicators import Indicators
+
+
+START = 1_600_000_000_000
+
+
+def make_bars(symbols=('AAA', 'BBB', 'CCC'), periods=600, seed=1):
+
+    rng = np.random.default_rng(seed)
+    bars = []
+
+    for symbol in symbols:
+
+        closes = 100.0 + np.cumsum(rng.normal(size=periods))
+
+        for position, close in enumerate(closes):
+            bars.append({
+                'symbol': symbol,
+                'open': close - 0.25,
+                'close': close,
+                'high': close + 1.0,
+                'low': close - 1.0,
+                'volume': 100 + position,
+                'datetime': START + position * 60_000
+            })
+
+    return bars
+
+
+def bars_between(bars, first, last):
+
+    return [bar for bar in bars if START + first * 60_000 <= bar['datetime'] < START + last * 60_000]
+
+
+def add_indicators(indicators: Indicators) -> None:
+
+    indicators.rsi(period=14)
+    indicators.sma(period=50)
+    indicators.ema(period=20)
+    indicators.change_in_price()
+
+
+def test_streaming_refresh_matches_full_recompute():
+
+    bars = make_bars()
+
+    stock_frame = StockFrame(data=bars_between(bars, 0, 400))
+    indicators = Indicators(price_data_frame=stock_frame, streaming=True)
+    add_indicators(indicators=indicators)
+
+    # One bar, a few bars, then a long catch up.
+    for first, last in [(400, 401), (401, 405), (405, 450), (450, 600)]:
+        stock_frame.add_rows(data=bars_between(bars, first, last))
+        indicators.refresh()
+
+    full_frame = StockFrame(data=bars)
+    add_indicators(indicators=Indicators(price_data_frame=full_frame))
+
+    for column in ['rsi_14', 'sma_50', 'ema_20', 'change_in_price']:
+        np.testing.assert_array_equal(stock_frame.frame[column].to_numpy(), full_frame.frame[column].to_numpy())
+
+
+@pytest.mark.parametrize('storage', ['frame', 'ring'])
+def test_streaming_refresh_picks_up_revised_bars(storage):
+
+    bars = make_bars()
+    last_bar = START + 449 * 60_000
+
+    stock_frame = StockFrame(data=bars_between(bars, 0, 450), storage=storage)
+    indicators = Indicators(price_data_frame=stock_frame, streaming=True)
+    add_indicators(indicators=indicators)
+
+    # The last AAA bar is revised together with a new bar for the others,
+    # then a few more bars arrive.
+    revised_bars = [dict(bar, close=bar['close'] + 5.0) for bar in bars if bar['symbol'] == 'AAA' and bar['datetime'] == last_bar]
+    new_bars = [bar for bar in bars_between(bars, 450, 451) if bar['symbol'] != 'AAA']
+
+    stock_frame.add_rows(data=revised_bars + new_bars)
+    indicators.refresh()
+
+    stock_frame.add_rows(data=bars_between(bars, 451, 455))
+    indicators.refresh()
+
+    final_bars = [revised_bars[0] if (bar['symbol'], bar['datetime']) == ('AAA', last_bar) else bar for bar in bars_between(bars, 0, 455)]
+    full_frame = StockFrame(data=[bar for bar in final_bars if bar['symbol'] != 'AAA' or bar['datetime'] != START + 450 * 60_000])
+    add_indicators(indicators=Indicators(price_data_frame=full_frame))
+
+    for column in ['rsi_14', 'sma_50', 'ema_20', 'change_in_price']:
+        np.testing.assert_allclose(stock_frame.frame[column].to_numpy(), full_frame.frame[column].to_numpy(), rtol=1e-12)
+
+
+def test_signal_matrix_matches_check_signals_on_every_bar():
+
+    stock_frame = StockFrame(data=make_bars(periods=120))
+    indicators = Indicators(price_data_frame=stock_frame)
+    indicators.rsi(period=14)
+    indicators.set_indicator_signals(indicator='rsi_14', buy=40.0, sell=60.0, condition_buy=operator.le, condition_sell=operator.ge)
+
+    signal_matrix = indicators.signal_matrix()
+    frame = stock_frame.frame
+
+    assert signal_matrix.index.equals(frame.index)
+    assert signal_matrix['buys'].any() and signal_matrix['sells'].any()
+
+    np.testing.assert_array_equal(signal_matrix['rsi_14_buy'].to_numpy(), (frame['rsi_14'] <= 40.0).to_numpy())
+
+    # Checking any single bar time gives the same rows as the matrix.
+    for bar_time in frame.index.get_level_values(1).unique()[[20, 60, -1]]:
+
+        rows = frame.xs(bar_time, level=1, drop_level=False)
+        signals = stock_frame._check_signals(indicators=indicators._indicator_signals, last_rows=rows)
+
+        assert list(signals['buys'].index) == list(rows.index[signal_matrix.loc[rows.index, 'buys'].to_numpy()])
+        assert list(signals['sells'].index) == list(rows.index[signal_matrix.loc[rows.index, 'sells'].to_numpy()])
+
+    latest = indicators.check_signals()
+    last_rows = signal_matrix.groupby(level='symbol').tail(1)
+
+    assert list(latest['buys'].index) == list(last_rows.index[last_rows['buys'].to_numpy()])
+
+
+def test_indicators_match_pandas_references():
+
+    stock_frame = StockFrame(data=make_bars(periods=200))
+    indicators = Indicators(price_data_frame=stock_frame)
+
+    indicators.bollinger_bands(period=20)
+    indicators.rate_of_change(period=1)
+    indicators.average_true_range(period=14)
+    indicators.stochastic_oscillator()
+    indicators.macd(fast_period=12, slow_period=26)
+    indicators.mass_index(period=9)
+    indicators.kst_oscillator(r1=10, r2=15, r3=20, r4=30, n1=10, n2=10, n3=10, n4=15)
+
+    frame = stock_frame.frame
+    by_symbol = frame.groupby(level=0)
+
+    def per_symbol(series, function):
+        return series.groupby(level=0).transform(function)
+
+    def check(column, expected):
+        np.testing.assert_allclose(frame[column].to_numpy(), expected.to_numpy(), rtol=1e-9, atol=1e-9)
+
+    moving_average = by_symbol['close'].transform(lambda x: x.rolling(20).mean())
+    moving_std = by_symbol['close'].transform(lambda x: x.rolling(20).std())
+    check('band_upper_20_2', moving_average + 2 * moving_std)
+    check('band_lower_20_2', moving_average - 2 * moving_std)
+
+    check('rate_of_change_1', by_symbol['close'].transform(lambda x: x.pct_change(1)))
+
+    previous_close = by_symbol['close'].shift()
+    true_range = pd.concat([frame['high'] - frame['low'], (frame['high'] - previous_close).abs(), (frame['low'] - previous_close).abs()], axis=1).max(axis=1)
+    check('average_true_range_14', per_symbol(true_range, lambda x: x.ewm(alpha=1 / 14).mean()))
+
+    highest = by_symbol['high'].transform(lambda x: x.rolling(14).max())
+    lowest = by_symbol['low'].transform(lambda x: x.rolling(14).min())
+    percent_k = 100 * (frame['close'] - lowest) / (highest - lowest)
+    check('stochastic_oscillator_14_3', percent_k)
+    check('stochastic_signal_14_3', per_symbol(percent_k, lambda x: x.rolling(3).mean()))
+
+    macd = by_symbol['close'].transform(lambda x: x.ewm(span=12).mean()) - by_symbol['close'].transform(lambda x: x.ewm(span=26).mean())
+    check('macd_12_26_9', macd)
+    check('macd_signal_12_26_9', per_symbol(macd, lambda x: x.ewm(span=9).mean()))
+
+    single_ema = per_symbol(frame['high'] - frame['low'], lambda x: x.ewm(span=9).mean())
+    double_ema = per_symbol(single_ema, lambda x: x.ewm(span=9).mean())
+    check('mass_index_9_25', per_symbol(single_ema / double_ema, lambda x: x.rolling(25).sum()))
+
+    kst = sum(
+        weight * by_symbol['close'].transform(lambda x, r=r, n=n: x.pct_change(r).rolling(n).mean())
+        for weight, (r, n) in enumerate(zip([10, 15, 20, 30], [10, 10, 10, 15]), 1)
+    ) * 100
+    check('kst_oscillator_10_15_20_30_10_10_10_15_9', kst)
+
+
+def test_bollinger_bands_with_a_one_bar_window():
+
+    stock_frame = StockFrame(data=make_bars(periods=30))
+    indicators = Indicators(price_data_frame=stock_frame)
+    indicators.bollinger_bands(period=1)
+
+    # `rolling(1).std()` is NaN, so are the bands.
+    assert stock_frame.frame['band_upper_1_2'].isna().all()
+    assert stock_frame.frame['band_lower_1_2'].isna().all()
+
+
+def test_bollinger_bands_are_not_recomputed_when_asked_again():
+
+    stock_frame = StockFrame(data=make_bars(periods=30))
+    indicators = Indicators(price_data_frame=stock_frame)
+    indicators.bollinger_bands(period=5)
+
+    assert list(indicators._current_indicators) == ['band_upper_5_2']
+
+    stock_frame.frame['band_upper_5_2'] = 0.0
+    indicators.bollinger_bands(period=5)
+
+    assert (stock_frame.frame['band_upper_5_2'] == 0.0).all()
+    assert list(indicators._current_indicators) == ['band_upper_5_2']
+
+
+def two_rule_indicators(stock_frame):
+
+    indicators = Indicators(price_data_frame=stock_frame)
+    indicators.rsi(period=14)
+    indicators.sma(period=5)
+    indicators.sma(period=20)
+
+    indicators.set_indicator_signals(indicator='rsi_14', buy=45.0, sell=55.0, condition_buy=operator.le, condition_sell=operator.ge)
+    indicators.set_indicator_signal_compare(indicator_1='sma_5', indicator_2='sma_20', condition_buy=operator.gt,
+                                            condition_sell=operator.lt, crossover=True)
+
+    return indicators
+
+
+def test_crossover_only_fires_on_the_bar_it_turns():
+
+    stock_frame = StockFrame(data=make_bars(periods=200))
+    indicators = two_rule_indicators(stock_frame=stock_frame)
+
+    signal_matrix = indicators.signal_matrix()
+    frame = stock_frame.frame
+
+    above = (frame['sma_5'] > frame['sma_20'])
+    was_above = (frame.groupby(level=0)['sma_5'].shift() > frame.groupby(level=0)['sma_20'].shift())
+    has_previous = frame.groupby(level=0)['sma_20'].shift().notna()
+
+    expected = (above & ~was_above & has_previous).to_numpy()
+
+    assert expected.any()
+    np.testing.assert_array_equal(signal_matrix['sma_5_comp_sma_20_buy'].to_numpy(), expected)
+
+
+def test_several_rules_are_combined():
+
+    stock_frame = StockFrame(data=make_bars(periods=200))
+    indicators = two_rule_indicators(stock_frame=stock_frame)
+
+    rsi_buy = (stock_frame.frame['rsi_14'] <= 45.0).to_numpy()
+    signal_matrix = indicators.signal_matrix()
+    crossover_buy = signal_matrix['sma_5_comp_sma_20_buy'].to_numpy()
+
+    # Rows where only the first rule fires still buy, the last rule doesn't win.
+    assert (rsi_buy & ~crossover_buy).any() and (crossover_buy & ~rsi_buy).any()
+
+    np.testing.assert_array_equal(signal_matrix['buys'].to_numpy(), rsi_buy | crossover_buy)
+    np.testing.assert_array_equal(indicators.signal_matrix(combine='all')['buys'].to_numpy(), rsi_buy & crossover_buy)
+
+    # The last bar check agrees with the matrix for both ways of combining.
+    last_rows = signal_matrix.groupby(level='symbol').tail(1)
+    latest_all = indicators.check_signals(combine='all')
+    all_rows = indicators.signal_matrix(combine='all').groupby(level='symbol').tail(1)
+
+    assert list(indicators.check_signals()['buys'].index) == list(last_rows.index[last_rows['buys'].to_numpy()])
+    assert list(latest_all['sells'].index) == list(all_rows.index[all_rows['sells'].to_numpy()])
+
+    with pytest.raises(ValueError):
+        indicators.signal_matrix(combine='most')
@@ -0,0 +1,106 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyrobot import kernels
+
+
+def random_walk(size=2_000, seed=0):
+
+    return 100.0 + np.cumsum(np.random.default_rng(seed).normal(size=size))
+
+
+@pytest.mark.parametrize('window', [1, 2, 5, 50, 200])
+def test_rolling_sum_and_mean_match_pandas(window):
+
+    values = random_walk()
+    values[[3, 700, 701, 1500]] = np.nan
+
+    np.testing.assert_allclose(kernels.rolling_sum(values=values, window=window), pd.Series(values).rolling(window).sum().to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(kernels.rolling_mean(values=values, window=window), pd.Series(values).rolling(window).mean().to_numpy(), rtol=1e-12)
+
+
+def test_rolling_sum_is_compensated():
+
+    values = random_walk(size=200_000) * 1000.0
+    sums = kernels.rolling_sum(values=values, window=50)
+
+    for position in range(49, values.shape[0], 4999):
+        assert sums[position] == math.fsum(values[position - 49:position + 1])
+
+
+def test_rolling_sum_carries_on_from_earlier_totals():
+
+    values = random_walk()
+    full = kernels.rolling_sum(values=values, window=20)
+
+    # Picking up 19 rows back from the running totals before them gives the
+    # same bits as the pass over the whole column.
+    totals = kernels.running_totals(values=values[:1000 - 19])
+    tail = kernels.rolling_sum(values=values[1000 - 19:], window=20, start=(totals[0, -1], totals[1, -1]))
+
+    np.testing.assert_array_equal(tail[19:], full[1000:])
+
+
+def test_rolling_sum_edges():
+
+    assert np.isnan(kernels.rolling_sum(values=np.arange(3.0), window=5)).all()
+
+    sums = kernels.rolling_sum(values=np.array([1.0, np.inf, 2.0, 3.0, 4.0]), window=2)
+    np.testing.assert_array_equal(sums, [np.nan, np.inf, np.inf, 5.0, 7.0])
+
+
+def test_apply_by_segment_keeps_symbols_apart():
+
+    values = random_walk(size=30)
+    segments = [slice(0, 10), slice(10, 30)]
+
+    output = kernels.apply_by_segment(kernels.rolling_mean, values, segments, window=3)
+
+    np.testing.assert_array_equal(output[:10], kernels.rolling_mean(values=values[:10], window=3))
+    np.testing.assert_array_equal(output[10:], kernels.rolling_mean(values=values[10:], window=3))
+
+
+def test_change_and_exponential_kernels_match_pandas():
+
+    values = pd.Series(random_walk())
+
+    np.testing.assert_array_equal(kernels.diff(values=values.to_numpy()), values.diff().to_numpy())
+    np.testing.assert_array_equal(kernels.shift_change(values=values.to_numpy(), periods=5), (values - values.shift(5)).to_numpy())
+    np.testing.assert_array_equal(kernels.ewm_mean(values=values.to_numpy(), span=20), values.ewm(span=20).mean().to_numpy())
+
+    change = values.diff()
+    up = change.where(change >= 0, 0).ewm(span=14).mean()
+    down = change.where(change < 0, 0).abs().ewm(span=14).mean()
+
+    # Like the original pandas version, an RSI of exactly 0 is reported as 100.
+    relative_strength_index = 100.0 - 100.0 / (1.0 + up / down)
+    relative_strength_index = relative_strength_index.where(relative_strength_index != 0, 100.0)
+
+    np.testing.assert_allclose(kernels.rsi(values=values.to_numpy(), period=14), relative_strength_index.to_numpy(), rtol=1e-12)
+
+
+@pytest.mark.parametrize('window', [1, 2, 20])
+def test_rolling_std_matches_pandas(window):
+
+    values = random_walk()
+    values[[10, 11]] = np.nan
+
+    np.testing.assert_allclose(kernels.rolling_std(values=values, window=window), pd.Series(values).rolling(window).std().to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+def test_rolling_extremes_and_true_range_match_pandas():
+
+    values = pd.Series(random_walk())
+    high, low, close = values + 1.0, values - 1.0, values
+
+    np.testing.assert_array_equal(kernels.rolling_max(values=values.to_numpy(), window=14), values.rolling(14).max().to_numpy())
+    np.testing.assert_array_equal(kernels.rolling_min(values=values.to_numpy(), window=14), values.rolling(14).min().to_numpy())
+    np.testing.assert_allclose(kernels.rate_of_change(values=values.to_numpy(), period=3), values.pct_change(3).to_numpy(), rtol=1e-12, atol=1e-15)
+
+    previous_close = close.shift()
+    true_range = pd.concat([high - low, (high - previous_close).abs(), (low - previous_close).abs()], axis=1).max(axis=1)
+
+    np.testing.assert_array_equal(kernels.true_range(high=high.to_numpy(), low=low.to_numpy(), close=close.to_numpy()), true_range.to_numpy())
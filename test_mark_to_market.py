@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyrobot.stock_frame import StockFrame
+from pyrobot.position_store import PositionStore
+from pyrobot.mark_to_market import MarkToMarket
+
+
+START = 1_600_000_000_000
+
+
+class SimplePortfolio():
+
+    # Just the parts of `Portfolio` the marker reads and writes.
+    def __init__(self) -> None:
+
+        self.positions = PositionStore()
+        self.market_value = 0.0
+        self.profit_loss = 0.0
+
+
+def make_bars(closes, first=0):
+
+    return [
+        {
+            'symbol': symbol,
+            'open': close,
+            'close': close,
+            'high': close,
+            'low': close,
+            'volume': 100,
+            'datetime': START + (first + position) * 60_000
+        }
+        for symbol, symbol_closes in closes.items()
+        for position, close in enumerate(symbol_closes)
+    ]
+
+
+def make_marker(cash=1000.0):
+
+    portfolio = SimplePortfolio()
+    portfolio.positions.add(symbol='AAA', asset_type='equity', purchase_date=None, quantity=10, purchase_price=10.0)
+    portfolio.positions.add(symbol='BBB', asset_type='equity', purchase_date=None, quantity=-5, purchase_price=20.0)
+
+    return portfolio, MarkToMarket(portfolio=portfolio, cash=cash, capacity=2)
+
+
+def test_marks_every_new_bar():
+
+    portfolio, marker = make_marker()
+
+    stock_frame = StockFrame(data=make_bars({'AAA': [11.0], 'BBB': [19.0]}))
+    marker.attach(stock_frame=stock_frame)
+
+    assert marker.market_value == 10 * 11.0 - 5 * 19.0
+
+    stock_frame.add_rows(data=make_bars({'AAA': [12.0, 13.0, 9.0], 'BBB': [18.0, 21.0, 22.0]}, first=1))
+
+    curve = marker.equity_curve()
+    market_values = 10 * np.array([12.0, 13.0, 9.0]) - 5 * np.array([18.0, 21.0, 22.0])
+
+    np.testing.assert_allclose(curve['market_value'].to_numpy(), market_values)
+    np.testing.assert_allclose(curve['equity'].to_numpy(), 1000.0 + market_values)
+    np.testing.assert_allclose(curve['gross_exposure'].to_numpy(), 10 * np.array([12.0, 13.0, 9.0]) + 5 * np.array([18.0, 21.0, 22.0]))
+
+    equity = 1000.0 + market_values
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0
+
+    np.testing.assert_allclose(curve['drawdown'].to_numpy(), drawdown)
+    assert marker.max_drawdown == pytest.approx(drawdown.min())
+
+    assert portfolio.market_value == market_values[-1]
+    assert portfolio.profit_loss == pytest.approx(market_values[-1] - (10 * 10.0 - 5 * 20.0))
+
+
+def test_late_bars_keep_the_curve_in_order():
+
+    portfolio, marker = make_marker()
+
+    stock_frame = StockFrame(data=make_bars({'AAA': [11.0], 'BBB': [19.0]}))
+    marker.attach(stock_frame=stock_frame)
+
+    stock_frame.add_rows(data=make_bars({'AAA': [12.0, 13.0], 'BBB': [18.0, 21.0]}, first=3))
+
+    # A catch-up batch with an older bar and a revision of the last one.
+    stock_frame.add_rows(data=(
+        make_bars({'AAA': [1.0], 'BBB': [1.0]}, first=2) +
+        make_bars({'AAA': [14.0], 'BBB': [20.0]}, first=4) +
+        make_bars({'AAA': [15.0]}, first=5)
+    ))
+
+    curve = marker.equity_curve()
+
+    assert list(curve.index) == [pd.Timestamp(START + minute * 60_000, unit='ms') for minute in [3, 4, 5]]
+    np.testing.assert_allclose(curve['market_value'].to_numpy(), [10 * 12.0 - 5 * 18.0, 10 * 14.0 - 5 * 20.0, 10 * 15.0 - 5 * 20.0])
+    assert marker.market_value == 10 * 15.0 - 5 * 20.0
+
+
+def test_position_changes_are_revalued():
+
+    portfolio, marker = make_marker()
+
+    stock_frame = StockFrame(data=make_bars({'AAA': [11.0], 'BBB': [19.0]}))
+    marker.attach(stock_frame=stock_frame)
+
+    portfolio.positions.remove(symbol='AAA')
+    portfolio.positions.add(symbol='CCC', asset_type='equity', purchase_date=None, quantity=2, purchase_price=50.0)
+
+    # CCC has no close yet, so it's carried at what it cost.
+    stock_frame.add_rows(data=make_bars({'BBB': [18.0]}, first=1))
+    assert marker.market_value == -5 * 18.0 + 2 * 50.0
+
+    profit_loss = marker.position_profit_loss()
+    assert list(profit_loss.index) == ['BBB', 'CCC']
+    assert profit_loss.loc['BBB', 'profit_loss'] == -5 * 18.0 + 5 * 20.0
+
+
+def test_swapping_frames_stops_following_the_old_one():
+
+    portfolio, marker = make_marker()
+
+    old_frame = StockFrame(data=make_bars({'AAA': [11.0], 'BBB': [19.0]}))
+    new_frame = StockFrame(data=make_bars({'AAA': [30.0], 'BBB': [10.0]}, first=5))
+
+    marker.attach(stock_frame=old_frame)
+    marker.attach(stock_frame=new_frame)
+
+    assert marker.market_value == 10 * 30.0 - 5 * 10.0
+
+    # Bars on the old frame don't move anything any more.
+    old_frame.add_rows(data=make_bars({'AAA': [1.0]}, first=1))
+    assert marker.market_value == 10 * 30.0 - 5 * 10.0
+    assert marker.equity_curve().empty
+
+    new_frame.add_rows(data=make_bars({'AAA': [31.0]}, first=6))
+    assert marker.market_value == 10 * 31.0 - 5 * 10.0
+    assert list(marker.equity_curve().index) == [pd.Timestamp(START + 6 * 60_000, unit='ms')]
+
+    # Attaching the same frame again doesn't add a second listener.
+    marker.attach(stock_frame=new_frame)
+    new_frame.add_rows(data=make_bars({'AAA': [32.0]}, first=7))
+    assert marker.equity_curve().shape[0] == 2
+
+    with pytest.raises(KeyError):
+        old_frame.remove_bar_listener(marker.on_bars)
@@ -0,0 +1,129 @@
+import json
+
+from datetime import datetime, timedelta
+
+from pyrobot.order_journal import OrderJournal
+
+
+FIRST_TIME = datetime(2024, 3, 5, 14, 30)
+
+
+def make_order(position, symbol='AAA', **fields):
+
+    order = {
+        'order_id': 1000 + position,
+        'idempotency_key': 'key-{position}'.format(position=position),
+        'timestamp': (FIRST_TIME + timedelta(minutes=position)).isoformat(),
+        'request_body': {'orderLegCollection': [{'instrument': {'symbol': symbol}}]}
+    }
+    order.update(fields)
+
+    return order
+
+
+def test_lookups_and_queries(tmp_path):
+
+    journal = OrderJournal(folder=tmp_path)
+    orders = [make_order(position, symbol=['AAA', 'BBB'][position % 2]) for position in range(10)]
+
+    journal.append(orders=orders[:6])
+
+    # The index is built on the first query, then kept up to date.
+    assert journal.get(order_id=1003) == orders[3]
+    journal.append(orders=orders[6:])
+
+    assert journal.get(order_id='1008') == orders[8]
+    assert journal.get(idempotency_key='key-9') == orders[9]
+    assert journal.get(order_id=999) is None
+
+    assert journal.query() == orders
+    assert journal.query(symbol='BBB') == orders[1::2]
+    assert journal.query(start=FIRST_TIME + timedelta(minutes=2), end=FIRST_TIME + timedelta(minutes=5)) == orders[2:6]
+    assert journal.query(symbol='AAA', start=FIRST_TIME + timedelta(minutes=5)) == orders[6::2]
+
+    journal.close()
+
+
+def test_time_queries_with_late_orders(tmp_path):
+
+    journal = OrderJournal(folder=tmp_path)
+    orders = [make_order(position) for position in [0, 1, 4, 2, 5, 3]]
+
+    journal.append(orders=orders[:3])
+    journal.query()
+    journal.append(orders=orders[3:])
+
+    by_time = sorted(orders, key=lambda order: order['timestamp'])
+
+    assert journal.query(start=FIRST_TIME) == by_time
+    assert journal.query(start=FIRST_TIME + timedelta(minutes=2), end=FIRST_TIME + timedelta(minutes=4)) == by_time[2:5]
+
+    journal.close()
+
+
+def test_failed_orders_do_not_claim_their_key(tmp_path):
+
+    journal = OrderJournal(folder=tmp_path)
+    journal.append(orders=[make_order(0, error='rejected')])
+
+    assert journal.get(idempotency_key='key-0') is None
+
+    journal.append(orders=[make_order(0)])
+
+    assert journal.get(idempotency_key='key-0') == make_order(0)
+
+
+def test_files_rotate_and_reopen(tmp_path):
+
+    orders = [make_order(position) for position in range(20)]
+
+    journal = OrderJournal(folder=tmp_path, max_file_size=600)
+    journal.append(orders=orders[:15])
+    journal.close()
+
+    # A fresh journal finds every file and carries on in the last one.
+    journal = OrderJournal(folder=tmp_path, max_file_size=600)
+    journal.append(orders=orders[15:])
+
+    assert len(list(tmp_path.glob('orders_*.jsonl'))) > 1
+    assert journal.query() == orders
+
+
+def test_half_written_line_is_dropped_on_open(tmp_path):
+
+    journal = OrderJournal(folder=tmp_path)
+    journal.append(orders=[make_order(position) for position in range(3)])
+    journal.close()
+
+    # A crash mid-write, with a partial line longer than one read from the end.
+    file_path = next(tmp_path.glob('orders_*.jsonl'))
+    with open(file_path, mode='ab') as journal_file:
+        journal_file.write(b'{"order_id": "' + b'x' * 10_000)
+
+    journal = OrderJournal(folder=tmp_path)
+    journal.append(orders=[make_order(3)])
+
+    assert journal.query() == [make_order(position) for position in range(4)]
+
+
+def test_legacy_orders_are_imported_once(tmp_path):
+
+    legacy_orders = [make_order(position) for position in range(3)]
+
+    with open(tmp_path.joinpath('orders.json'), mode='w') as legacy_json:
+        json.dump(obj=legacy_orders, fp=legacy_json, indent=4)
+
+    journal = OrderJournal(folder=tmp_path)
+
+    assert journal.get(idempotency_key='key-1') == legacy_orders[1]
+
+    journal.append(orders=[make_order(3)])
+    journal.close()
+
+    # The old file is left alone, and opening again doesn't import it twice.
+    assert tmp_path.joinpath('orders.json').exists()
+
+    journal = OrderJournal(folder=tmp_path)
+    journal.append(orders=[make_order(4)])
+
+    assert journal.query() == [make_order(position) for position in range(5)]
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from pyrobot.position_store import PositionStore
+
+
+def make_store():
+
+    positions = PositionStore(capacity=2)
+    positions.add(symbol='AAA', asset_type='equity', purchase_date='2024-01-02', quantity=10, purchase_price=100.0)
+    positions.add(symbol='BBB', asset_type='equity', purchase_date=None)
+    positions.add(symbol='CCC', asset_type='option', purchase_date='2024-01-03', quantity=-2, purchase_price=5.0)
+
+    return positions
+
+
+def test_reads_like_a_dict_of_positions():
+
+    positions = make_store()
+
+    assert list(positions) == ['AAA', 'BBB', 'CCC'] and len(positions) == 3
+    assert 'BBB' in positions and 'DDD' not in positions
+    assert positions['AAA'] == {
+        'symbol': 'AAA',
+        'quantity': 10.0,
+        'purchase_price': 100.0,
+        'purchase_date': '2024-01-02',
+        'asset_type': 'equity',
+        'ownership_status': True
+    }
+    assert positions['BBB']['ownership_status'] is False
+
+    # Rows are read-only, writes go through the store.
+    with pytest.raises(TypeError):
+        positions['BBB']['quantity'] = 1.0
+
+    assert repr(positions).startswith("PositionStore({'AAA': {'symbol': 'AAA', 'quantity': 10.0,")
+
+    # Adding a symbol again replaces its row rather than adding another one.
+    positions.add(symbol='AAA', asset_type='equity', purchase_date='2024-02-01', quantity=5, purchase_price=110.0)
+
+    assert len(positions) == 3
+    assert positions['AAA']['quantity'] == 5.0 and positions['AAA']['purchase_date'] == '2024-02-01'
+
+
+def test_remove_keeps_the_rows_packed():
+
+    positions = make_store()
+    version = positions.version
+
+    assert positions.remove(symbol='AAA')
+    assert not positions.remove(symbol='AAA')
+
+    # The last row moved into the hole.
+    assert positions.symbols == ['CCC', 'BBB']
+    assert positions.row(symbol='CCC') == 0
+    assert positions['CCC']['quantity'] == -2.0 and positions['CCC']['purchase_date'] == '2024-01-03'
+    np.testing.assert_array_equal(positions.quantity, [-2.0, 0.0])
+    assert positions.version == version + 1
+
+
+def test_valuation_and_allocation():
+
+    positions = make_store()
+
+    prices = positions.price_vector(current_prices={'AAA': {'lastPrice': 120.0}, 'CCC': 4.0})
+    np.testing.assert_array_equal(prices, [120.0, np.nan, 4.0])
+
+    valuation = positions.valuation(prices=prices)
+
+    np.testing.assert_array_equal(valuation['market_value'], [1200.0, np.nan, -8.0])
+    np.testing.assert_array_equal(valuation['profit_loss'], [200.0, np.nan, 2.0])
+    np.testing.assert_array_equal(valuation['profit_loss_pct'], [0.2, 0.0, -0.2])
+    np.testing.assert_array_equal(valuation['is_profitable'], [True, False, False])
+
+    assert positions.allocation(market_value=valuation['market_value']) == {'equity': 1200.0, 'option': -8.0}
+
+    # Arrays are taken as already in row order.
+    np.testing.assert_array_equal(positions.price_vector(current_prices=np.array([1, 2, 3])), [1.0, 2.0, 3.0])
@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+
+from pyrobot.quote_cache import QuoteCache
+
+
+class FakeClock():
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingFetch():
+
+    def __init__(self, release: threading.Event = None) -> None:
+
+        self.calls = []
+        self.release = release
+        self.started = threading.Event()
+
+    def __call__(self, symbols):
+
+        self.calls.append(list(symbols))
+        self.started.set()
+
+        if self.release is not None:
+            self.release.wait(timeout=5)
+
+        return {symbol: {'symbol': symbol, 'request': len(self.calls)} for symbol in symbols if symbol != 'MISSING'}
+
+
+def test_quotes_are_kept_for_their_ttl():
+
+    clock = FakeClock()
+    fetch = CountingFetch()
+    quote_cache = QuoteCache(fetch=fetch, ttl=1.0, clock=clock)
+
+    assert quote_cache.get_quotes(symbols=['AAA', 'BBB'])['AAA']['request'] == 1
+
+    clock.now = 0.5
+    quote_cache.get_quotes(symbols=['AAA', 'BBB', 'CCC'])
+
+    # Only the symbol nobody had asked for yet is fetched.
+    assert fetch.calls == [['AAA', 'BBB'], ['CCC']]
+
+    clock.now = 1.2
+    quotes = quote_cache.get_quotes(symbols=['AAA', 'CCC'])
+
+    assert fetch.calls[-1] == ['AAA']
+    assert quotes['AAA']['request'] == 3 and quotes['CCC']['request'] == 2
+
+
+def test_per_symbol_ttl_and_invalidate():
+
+    clock = FakeClock()
+    fetch = CountingFetch()
+    quote_cache = QuoteCache(fetch=fetch, ttl=10.0, clock=clock)
+
+    quote_cache.set_ttl(symbol='FAST', ttl=0.1)
+    quote_cache.get_quotes(symbols=['FAST', 'SLOW'])
+
+    clock.now = 0.2
+    quote_cache.get_quotes(symbols=['FAST', 'SLOW'])
+    assert fetch.calls[-1] == ['FAST']
+
+    quote_cache.invalidate(symbols=['SLOW'])
+    quote_cache.get_quotes(symbols=['FAST', 'SLOW'])
+    assert fetch.calls[-1] == ['SLOW']
+
+    quote_cache.invalidate()
+    quote_cache.get_quotes(symbols=['FAST', 'SLOW'])
+    assert fetch.calls[-1] == ['FAST', 'SLOW']
+
+
+def test_requests_are_split_into_chunks():
+
+    fetch = CountingFetch()
+    quote_cache = QuoteCache(fetch=fetch, max_symbols_per_request=2)
+
+    symbols = ['S{position}'.format(position=position) for position in range(5)]
+    quotes = quote_cache.get_quotes(symbols=symbols + ['S0', 'MISSING'])
+
+    assert fetch.calls == [['S0', 'S1'], ['S2', 'S3'], ['S4', 'MISSING']]
+    assert quote_cache.requests == 3
+
+    # Symbols the broker didn't return are left out, and asked for again next time.
+    assert list(quotes) == symbols
+    quote_cache.get_quotes(symbols=['MISSING'])
+    assert fetch.calls[-1] == ['MISSING']
+
+
+def test_concurrent_callers_share_one_request():
+
+    release = threading.Event()
+    fetch = CountingFetch(release=release)
+    quote_cache = QuoteCache(fetch=fetch)
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(quote_cache.get_quotes(symbols=['AAA'])))
+    first.start()
+    fetch.started.wait(timeout=5)
+
+    second = threading.Thread(target=lambda: results.append(quote_cache.get_quotes(symbols=['AAA'])))
+    second.start()
+
+    release.set()
+    first.join(timeout=5)
+    second.join(timeout=5)
+
+    assert fetch.calls == [['AAA']]
+    assert results[0] == results[1]
+
+
+def test_a_failed_fetch_releases_its_symbols():
+
+    def failing_fetch(symbols):
+        raise ConnectionError('down')
+
+    quote_cache = QuoteCache(fetch=failing_fetch)
+
+    with pytest.raises(ConnectionError):
+        quote_cache.get_quotes(symbols=['AAA'])
+
+    quote_cache.fetch = CountingFetch()
+    assert quote_cache.get_quotes(symbols=['AAA'])['AAA']['symbol'] == 'AAA'
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from pyrobot.ring_buffer import SymbolRingBuffer
+
+
+def bar_columns(first, last):
+
+    positions = np.arange(first, last)
+
+    return np.datetime64('2021-01-04T14:30', 'ns') + positions * np.timedelta64(1, 'm'), {
+        'open': positions + 0.25,
+        'close': positions + 0.5,
+        'high': positions + 1.0,
+        'low': positions - 1.0,
+        'volume': positions * 10
+    }
+
+
+def test_capacity_has_to_be_positive():
+
+    with pytest.raises(ValueError):
+        SymbolRingBuffer(capacity=0)
+
+
+def test_extend_keeps_the_newest_bars_in_order():
+
+    ring_buffer = SymbolRingBuffer(capacity=8)
+
+    for first, last in [(0, 5), (5, 7), (7, 20), (20, 21)]:
+        ring_buffer.extend(*bar_columns(first, last))
+
+    datetimes, columns = ring_buffer.to_arrays()
+    expected_datetimes, expected_columns = bar_columns(13, 21)
+
+    assert len(ring_buffer) == 8
+    np.testing.assert_array_equal(datetimes, expected_datetimes)
+    for column, values in expected_columns.items():
+        np.testing.assert_array_equal(columns[column], values)
+
+
+def test_append_matches_extend():
+
+    appended = SymbolRingBuffer(capacity=5)
+    extended = SymbolRingBuffer(capacity=5)
+
+    datetimes, columns = bar_columns(0, 12)
+    extended.extend(datetimes, columns)
+
+    for position, datetime in enumerate(datetimes):
+        appended.append(datetime, **{column: values[position] for column, values in columns.items()})
+
+    for appended_values, extended_values in zip(appended.to_arrays()[1].values(), extended.to_arrays()[1].values()):
+        np.testing.assert_array_equal(appended_values, extended_values)
+
+
+def test_repeated_timestamp_updates_the_last_bar_and_older_bars_are_ignored():
+
+    ring_buffer = SymbolRingBuffer(capacity=4)
+    ring_buffer.extend(*bar_columns(0, 3))
+
+    datetimes, _ = bar_columns(0, 3)
+    ring_buffer.append(datetimes[-1], open=1.0, close=99.0, high=100.0, low=0.5, volume=7)
+    ring_buffer.append(datetimes[0], open=1.0, close=-1.0, high=100.0, low=0.5, volume=7)
+
+    _, columns = ring_buffer.to_arrays()
+
+    assert len(ring_buffer) == 3
+    np.testing.assert_array_equal(columns['close'], [0.5, 1.5, 99.0])
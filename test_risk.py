@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyrobot.stock_frame import StockFrame
+from pyrobot.risk import RiskEngine
+
+
+FIRST_DAY = pd.Timestamp('2024-01-02')
+SYMBOLS = ['AAA', 'BBB', 'CCC']
+
+
+def daily_bars(days=60, seed=7, skip=()):
+
+    # `skip` holds (symbol, day) pairs with no bar.
+    rng = np.random.default_rng(seed)
+    bars = []
+
+    for symbol in SYMBOLS:
+
+        closes = 100.0 * np.exp(np.cumsum(rng.normal(scale=0.02, size=days)))
+
+        for day, close in enumerate(closes):
+            if (symbol, day) not in skip:
+                bars.append({
+                    'symbol': symbol,
+                    'open': close,
+                    'close': close,
+                    'high': close,
+                    'low': close,
+                    'volume': 1000,
+                    'datetime': int((FIRST_DAY + pd.Timedelta(days=day)).value // 10**6)
+                })
+
+    return bars
+
+
+def pandas_returns(bars):
+
+    # Each symbol's returns over its own bars, leaving out its latest bar.
+    closes = pd.DataFrame(bars).pivot(index='datetime', columns='symbol', values='close')
+    closed = {symbol: closes[symbol].dropna().iloc[:-1] for symbol in closes.columns}
+
+    return pd.DataFrame({symbol: values.pct_change() for symbol, values in closed.items()})
+
+
+def check_against_pandas(risk_engine, bars):
+
+    returns = pandas_returns(bars=bars)[risk_engine.symbols]
+
+    np.testing.assert_allclose(risk_engine.means, returns.mean().to_numpy(), rtol=1e-10)
+    np.testing.assert_allclose(risk_engine.covariance, returns.cov().to_numpy(), rtol=1e-9)
+
+
+def test_sample_estimates_match_pandas():
+
+    bars = daily_bars(skip={('BBB', 10), ('CCC', 30), ('CCC', 31)})
+
+    risk_engine = RiskEngine()
+    risk_engine.add_bars(stock_frame=StockFrame(data=bars))
+
+    check_against_pandas(risk_engine=risk_engine, bars=bars)
+
+
+def test_day_by_day_with_a_partial_bar_matches_pandas():
+
+    bars = daily_bars(skip={('BBB', 10)})
+    by_day = {}
+    for bar in bars:
+        by_day.setdefault(bar['datetime'], []).append(bar)
+
+    days = sorted(by_day)
+
+    stock_frame = StockFrame(data=[bar for day in days[:20] for bar in by_day[day]])
+    risk_engine = RiskEngine()
+    risk_engine.add_bars(stock_frame=stock_frame)
+
+    for day in days[20:]:
+
+        # The day's bar lands early at another price, then gets its close.
+        stock_frame.add_rows(data=[dict(bar, close=bar['close'] * 1.5) for bar in by_day[day]])
+        risk_engine.add_bars(stock_frame=stock_frame)
+
+        stock_frame.add_rows(data=by_day[day])
+        risk_engine.add_bars(stock_frame=stock_frame)
+
+    check_against_pandas(risk_engine=risk_engine, bars=bars)
+    assert risk_engine.last_timestamps['AAA'] == pd.Timestamp(days[-2], unit='ms')
+
+
+def test_bars_from_a_lagging_symbol_are_not_dropped():
+
+    bars = daily_bars(days=30)
+    day_20 = (FIRST_DAY + pd.Timedelta(days=20)).value // 10**6
+    day_23 = (FIRST_DAY + pd.Timedelta(days=23)).value // 10**6
+
+    # BBB's feed stops after day 19 while the others carry on to day 22.
+    is_early = [bar['datetime'] < day_20 or (bar['symbol'] != 'BBB' and bar['datetime'] < day_23) for bar in bars]
+
+    stock_frame = StockFrame(data=[bar for bar, early in zip(bars, is_early) if early])
+    risk_engine = RiskEngine()
+    risk_engine.add_bars(stock_frame=stock_frame)
+
+    stock_frame.add_rows(data=[bar for bar, early in zip(bars, is_early) if not early])
+    risk_engine.add_bars(stock_frame=stock_frame)
+
+    returns = pandas_returns(bars=bars)[risk_engine.symbols]
+
+    # Every symbol's own numbers take in every day.
+    np.testing.assert_allclose(risk_engine.means, returns.mean().to_numpy(), rtol=1e-10)
+    np.testing.assert_allclose(np.diag(risk_engine.covariance), returns.var().to_numpy(), rtol=1e-9)
+
+    aaa, ccc = risk_engine.symbols.index('AAA'), risk_engine.symbols.index('CCC')
+    np.testing.assert_allclose(risk_engine.covariance[aaa, ccc], returns['AAA'].cov(returns['CCC']), rtol=1e-9)
+
+
+def test_estimator_settings_are_checked():
+
+    with pytest.raises(ValueError):
+        RiskEngine(estimator='median')
+
+    with pytest.raises(ValueError):
+        RiskEngine(estimator='ewm')
+
+    with pytest.raises(ValueError):
+        RiskEngine(shrinkage=1.5)
+
+    assert RiskEngine(estimator='ewm', halflife=1.0).alpha == pytest.approx(0.5)
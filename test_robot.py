@@ -0,0 +1,338 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datetime import datetime, timedelta
+
+pytest.importorskip('td')
+
+from td.client import TDClient
+
+from pyrobot.robot import PyRobot
+from pyrobot.fake_client import FakeTDClient
+from pyrobot.scheduler import RequestScheduler
+from pyrobot.order_journal import OrderJournal
+
+
+SYMBOLS = ['MSFT', 'AAPL', 'SQ']
+
+
+@pytest.fixture
+def robot(tmp_path):
+
+    robot = PyRobot(
+        client_id='client_id',
+        redirect_uri='https://localhost',
+        td_client=FakeTDClient(),
+        scheduler=RequestScheduler(requests_per_minute=10**9),
+        order_journal=OrderJournal(folder=tmp_path.joinpath('orders'))
+    )
+
+    robot.create_portfolio()
+    for symbol in SYMBOLS:
+        robot.portfolio.add_position(symbol=symbol, asset_type='equity', purchase_date=None)
+
+    return robot
+
+
+def test_historical_columns_match_the_candles(robot):
+
+    end = datetime(2021, 3, 1, 16, 0)
+    historical_prices = robot.grab_historical_prices(start=end - timedelta(days=1), end=end, aggregate=True)
+
+    columns = historical_prices['columns']
+    aggregated = pd.DataFrame(historical_prices['aggregated'])
+
+    assert aggregated.shape[0] == columns['close'].shape[0] > 0
+    for column, values in columns.items():
+        np.testing.assert_array_equal(np.asarray(values), aggregated[column].to_numpy())
+
+    for symbol in SYMBOLS:
+        candles = historical_prices[symbol]['candles']
+        np.testing.assert_array_equal(columns['close'][columns['symbol'] == symbol], [candle['close'] for candle in candles])
+
+    from_columns = robot.create_stock_frame(data=columns).frame
+    from_candles = robot.create_stock_frame(data=historical_prices['aggregated']).frame
+
+    pd.testing.assert_frame_equal(from_columns, from_candles)
+
+
+def test_concurrent_price_history_matches_sequential(robot, tmp_path):
+
+    concurrent_robot = PyRobot(
+        client_id='client_id',
+        redirect_uri='https://localhost',
+        td_client=FakeTDClient(latency=0.01),
+        max_workers=4,
+        scheduler=RequestScheduler(requests_per_minute=10**9),
+        order_journal=OrderJournal(folder=tmp_path.joinpath('concurrent_orders'))
+    )
+
+    concurrent_robot.create_portfolio()
+    for symbol in SYMBOLS:
+        concurrent_robot.portfolio.add_position(symbol=symbol, asset_type='equity', purchase_date=None)
+
+    end = datetime(2021, 3, 1, 16, 0)
+
+    sequential = robot.grab_historical_prices(start=end - timedelta(days=1), end=end)['columns']
+    concurrent = concurrent_robot.grab_historical_prices(start=end - timedelta(days=1), end=end)['columns']
+
+    for column in sequential:
+        np.testing.assert_array_equal(concurrent[column], sequential[column])
+
+
+def test_pooled_client_lends_one_session_to_the_library(monkeypatch, tmp_path):
+
+    import td.client
+    from pyrobot.pooled_client import PooledTDClient
+
+    def make_request(self, *args, **kwargs):
+
+        # What the library does: build a session, send, close it.
+        session = td.client.requests.Session()
+        session.close()
+
+        return session
+
+    monkeypatch.setattr(TDClient, '_make_request', make_request)
+
+    td_client = PooledTDClient(
+        pool_size=4,
+        client_id='client_id',
+        redirect_uri='https://localhost',
+        credentials_path=str(tmp_path.joinpath('credentials.json'))
+    )
+
+    first_session = td_client._make_request(method='get', endpoint='marketdata/quotes')
+    second_session = td_client._make_request(method='get', endpoint='marketdata/quotes')
+
+    assert first_session is second_session is td_client.http_session
+    assert td_client.http_session.get_adapter('https://api.tdameritrade.com')._pool_maxsize == 4
+
+    # Plain clients keep getting a fresh session per call.
+    assert td.client.requests.Session() is not td_client.http_session
+
+
+def test_cached_prices_match_a_fresh_fetch_and_only_fetch_the_gaps(tmp_path):
+
+    from pyrobot.candle_cache import CandleCache
+
+    end = datetime(2021, 3, 1, 16, 0)
+
+    def grab(start, end, candle_cache=None):
+
+        td_client = FakeTDClient()
+        robot = PyRobot(
+            client_id='client_id',
+            redirect_uri='https://localhost',
+            td_client=td_client,
+            scheduler=RequestScheduler(requests_per_minute=10**9),
+            candle_cache=candle_cache,
+            order_journal=OrderJournal(folder=tmp_path.joinpath('orders'))
+        )
+
+        return robot.grab_historical_prices(start=start, end=end, symbols=SYMBOLS)['columns'], td_client.calls
+
+    candle_cache = CandleCache(folder=tmp_path.joinpath('candles'))
+
+    grab(start=end - timedelta(days=2), end=end, candle_cache=candle_cache)
+    cached, calls = grab(start=end - timedelta(days=3), end=end + timedelta(hours=2), candle_cache=candle_cache)
+    fresh, _ = grab(start=end - timedelta(days=3), end=end + timedelta(hours=2))
+
+    for column in fresh:
+        np.testing.assert_array_equal(cached[column], fresh[column])
+
+    # One call for the older bars and one for the newer ones, per symbol.
+    assert calls['get_price_history'] == 2 * len(SYMBOLS)
+
+    # Day one and day four are cached, the two days between them are fetched.
+    holed_cache = CandleCache(folder=tmp_path.joinpath('holed'))
+    first_day = end - timedelta(days=3)
+
+    grab(start=first_day - timedelta(hours=8), end=first_day, candle_cache=holed_cache)
+    grab(start=end - timedelta(hours=8), end=end, candle_cache=holed_cache)
+
+    cached, calls = grab(start=first_day - timedelta(hours=8), end=end, candle_cache=holed_cache)
+    fresh, _ = grab(start=first_day - timedelta(hours=8), end=end)
+
+    for column in fresh:
+        np.testing.assert_array_equal(cached[column], fresh[column])
+
+    # One call for the hole and one from the last cached bar on, per symbol.
+    assert calls['get_price_history'] == 2 * len(SYMBOLS)
+
+
+@pytest.mark.parametrize('storage', ['frame', 'ring'])
+def test_latest_bar_asks_for_the_bars_from_the_last_one_on(robot, storage):
+
+    end = datetime.now() - timedelta(minutes=7)
+    historical_prices = robot.grab_historical_prices(start=end - timedelta(hours=3), end=end, symbols=SYMBOLS[:2])
+
+    # The last bar was stored while it was still forming.
+    columns = dict(historical_prices['columns'])
+    columns['close'] = columns['close'].copy()
+    columns['close'][-1] = -1.0
+
+    stock_frame = robot.create_stock_frame(data=columns, storage=storage)
+    last_timestamps = {symbol: pd.Timestamp(timestamp).value // 10**6 for symbol, timestamp in stock_frame.last_timestamps().items()}
+
+    latest_bars = robot.get_latest_bar()
+
+    for symbol in SYMBOLS[:2]:
+
+        datetimes = [bar['datetime'] for bar in latest_bars if bar['symbol'] == symbol]
+
+        assert min(datetimes) == last_timestamps[symbol]
+        assert 7 <= len(datetimes) <= 9
+
+    # A symbol with nothing in the frame gets the whole day.
+    assert sum(bar['symbol'] == SYMBOLS[2] for bar in latest_bars) > 1000
+
+    stock_frame.add_rows(data=latest_bars)
+    assert not stock_frame.frame.index.duplicated().any()
+    assert (stock_frame.frame['close'] > 0).all()
+
+
+def test_daily_bars_follow_the_live_frame(robot):
+
+    robot.portfolio.portfolio_metrics()
+    daily_rows = robot.portfolio.stock_frame_daily.frame.shape[0]
+
+    # Two sessions after the last daily bar, a minute bar at a time.
+    first_day = pd.Timestamp.now().normalize() + pd.Timedelta(days=2)
+
+    def minute_bars(day, minute, close):
+        return [
+            {'symbol': symbol, 'open': close, 'close': close, 'high': close, 'low': close, 'volume': 1,
+             'datetime': (day + pd.Timedelta(hours=15, minutes=minute)).value // 10**6}
+            for symbol in SYMBOLS
+        ]
+
+    stock_frame = robot.create_stock_frame(data=minute_bars(first_day, 0, 10.0))
+    stock_frame.add_rows(data=minute_bars(first_day, 1, 11.0))
+    stock_frame.add_rows(data=minute_bars(first_day + pd.Timedelta(days=1), 0, 12.0))
+    stock_frame.add_rows(data=minute_bars(first_day + pd.Timedelta(days=1), 1, 13.0))
+
+    daily_frame = robot.portfolio.stock_frame_daily.frame
+
+    assert daily_frame.shape[0] == daily_rows + 2 * len(SYMBOLS)
+    assert not daily_frame.index.duplicated().any()
+    assert daily_frame.groupby(level='symbol')['close'].last().tolist() == [13.0] * len(SYMBOLS)
+
+    # The first new day is closed, so the risk estimates take it in.
+    robot.portfolio.portfolio_metrics()
+    first_label = pd.Timestamp(first_day).tz_localize('America/New_York').tz_convert('UTC').tz_localize(None)
+
+    assert all(timestamp == first_label for timestamp in robot.portfolio.risk_engine.last_timestamps.values())
+
+
+def test_run_stream_matches_adding_the_same_bars_in_one_go(robot, tmp_path):
+
+    from pyrobot.indicators import Indicators
+    from pyrobot.streaming import ReplayFeed
+
+    start = 1_700_000_040_000
+    history = [
+        {'symbol': symbol, 'open': 1.0, 'close': 1.0 + position, 'high': 2.0 + position, 'low': 0.5, 'volume': 1,
+         'datetime': start - (100 - position) * 60_000}
+        for symbol in SYMBOLS[:2]
+        for position in range(100)
+    ]
+
+    messages = [
+        {'type': 'tick', 'symbol': symbol, 'price': 100.0 + minute + tick / 10.0, 'volume': 2, 'timestamp': start + minute * 60_000 + tick * 9_000}
+        for minute in range(5)
+        for tick in range(6)
+        for symbol in SYMBOLS[:2]
+    ]
+
+    ReplayFeed.record(file_path=tmp_path.joinpath('replay.jsonl'), messages=messages)
+
+    stock_frame = robot.create_stock_frame(data=history)
+    indicators = Indicators(price_data_frame=stock_frame, streaming=True)
+    indicators.ema(period=5)
+
+    closed = []
+    robot.run_stream(feed=ReplayFeed(file_path=tmp_path.joinpath('replay.jsonl')), indicator_client=indicators, on_bar=closed.append)
+
+    assert [len(bars) for bars in closed] == [2] * 5
+
+    expected_frame = robot.create_stock_frame(data=history + [bar for bars in closed for bar in bars])
+    Indicators(price_data_frame=expected_frame).ema(period=5)
+
+    pd.testing.assert_frame_equal(stock_frame.frame, expected_frame.frame)
+    assert stock_frame.frame.loc['MSFT'].iloc[-1]['close'] == 104.5
+
+
+def signals_for(symbols, bar_time):
+
+    index = pd.MultiIndex.from_arrays([symbols, [pd.Timestamp(bar_time)] * len(symbols)], names=['symbol', 'datetime'])
+
+    return {
+        'buys': pd.Series(True, index=index, dtype='bool'),
+        'sells': pd.Series(dtype='bool')
+    }
+
+
+def trades_for(robot, symbols):
+
+    trades_to_execute = {}
+
+    for symbol in symbols:
+
+        buy_trade = robot.create_trade(trade_id='long_' + symbol, enter_or_exit='enter', long_or_short='long')
+        buy_trade.instrument(symbol=symbol, quantity=1, asset_type='EQUITY')
+        sell_trade = robot.create_trade(trade_id='exit_' + symbol, enter_or_exit='exit', long_or_short='long')
+        sell_trade.instrument(symbol=symbol, quantity=1, asset_type='EQUITY')
+
+        trades_to_execute[symbol] = {'buy': {'trade_func': buy_trade}, 'sell': {'trade_func': sell_trade}, 'has_executed': False}
+
+    return trades_to_execute
+
+
+def test_signal_orders_go_out_once_per_bar(robot, tmp_path):
+
+    robot.paper_trading = False
+    robot.max_workers = 4
+
+    trades_to_execute = trades_for(robot=robot, symbols=SYMBOLS)
+    first_bar = datetime(2021, 3, 1, 15, 59)
+
+    order_responses = robot.execute_signals(signals=signals_for(SYMBOLS, first_bar), trades_to_execute=trades_to_execute)
+
+    assert [response['request_body']['orderLegCollection'][0]['instrument']['symbol'] for response in order_responses] == SYMBOLS
+    assert robot.session.calls['place_order'] == 3
+
+    # The same bar again sends nothing, a new bar sends again.
+    assert robot.execute_signals(signals=signals_for(SYMBOLS, first_bar), trades_to_execute=trades_to_execute) == []
+    assert len(robot.execute_signals(signals=signals_for(SYMBOLS[:1], first_bar + timedelta(minutes=1)), trades_to_execute=trades_to_execute)) == 1
+
+    # After a restart the journal still knows the keys.
+    restarted = PyRobot(
+        client_id='client_id',
+        redirect_uri='https://localhost',
+        td_client=robot.session,
+        paper_trading=False,
+        order_journal=OrderJournal(folder=tmp_path.joinpath('orders'))
+    )
+    restarted.create_portfolio()
+
+    assert restarted.execute_signals(signals=signals_for(SYMBOLS, first_bar), trades_to_execute=trades_to_execute) == []
+    assert robot.session.calls['place_order'] == 4
+
+
+def test_submitted_keys_are_bounded(robot):
+
+    robot.max_submitted_orders = 4
+    trades_to_execute = trades_for(robot=robot, symbols=SYMBOLS)
+
+    first_bar = datetime(2021, 3, 1, 15, 0)
+    for minute in range(5):
+        robot.execute_signals(signals=signals_for(SYMBOLS, first_bar + timedelta(minutes=minute)), trades_to_execute=trades_to_execute, save=False)
+
+    assert len(robot._submitted_orders) == 4
+
+    # The newest keys are the ones kept.
+    latest_bar = pd.Timestamp(first_bar + timedelta(minutes=4)).value // 10**6
+    assert sum(key.endswith(':{bar}'.format(bar=latest_bar)) for key in robot._submitted_orders) == 3
+    assert robot.execute_signals(signals=signals_for(SYMBOLS, first_bar + timedelta(minutes=4)), trades_to_execute=trades_to_execute, save=False) == []
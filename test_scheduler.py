@@ -0,0 +1,102 @@
+import time as time_true
+import threading
+
+import pytest
+import requests
+
+from pyrobot.scheduler import RequestScheduler
+
+
+class RateLimited(Exception):
+    pass
+
+
+def test_calls_are_spaced_out_once_the_burst_is_spent():
+
+    scheduler = RequestScheduler(requests_per_minute=1200, burst=2)
+
+    start = time_true.monotonic()
+    for _ in range(6):
+        scheduler.call(lambda: None)
+    elapsed = time_true.monotonic() - start
+
+    # Two calls from the burst, the other four at 20 a second.
+    assert elapsed >= 0.15
+    assert scheduler.counters['completed'] == 6
+    assert scheduler.counters['throttled'] >= 1
+
+
+def test_orders_jump_the_queue():
+
+    scheduler = RequestScheduler(requests_per_minute=600, burst=1)
+    scheduler.call(lambda: None)
+
+    served = []
+    threads = [
+        threading.Thread(target=scheduler.call, args=(served.append, lane), kwargs={'lane': lane})
+        for lane in ['price_history', 'price_history', 'price_history', 'orders']
+    ]
+
+    # Start the price history calls first, so they're all waiting.
+    for thread in threads[:3]:
+        thread.start()
+    time_true.sleep(0.02)
+    threads[3].start()
+
+    for thread in threads:
+        thread.join()
+
+    assert served.index('orders') < 2
+
+
+def test_retries_then_gives_up():
+
+    scheduler = RequestScheduler(requests_per_minute=10**9, max_retries=2, backoff_base=0.001, retry_on=(RateLimited,), rate_limit_errors=(RateLimited,))
+    attempts = []
+
+    def failing():
+        attempts.append(1)
+        raise RateLimited('Too many requests.')
+
+    with pytest.raises(RateLimited):
+        scheduler.call(failing)
+
+    assert len(attempts) == 3
+    assert scheduler.counters == {'submitted': 1, 'completed': 0, 'throttled': 0, 'retried': 2, 'failed': 1}
+
+
+def test_recovers_after_a_transient_failure():
+
+    scheduler = RequestScheduler(requests_per_minute=10**9, backoff_base=0.001)
+    failures = [requests.ConnectionError('Dropped.')]
+
+    def flaky():
+        if failures:
+            raise failures.pop()
+        return 'ok'
+
+    assert scheduler.call(flaky) == 'ok'
+    assert scheduler.counters['retried'] == 1
+
+
+def test_other_errors_are_not_retried_by_default():
+
+    scheduler = RequestScheduler(requests_per_minute=10**9, backoff_base=0.001)
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise KeyError('candles')
+
+    with pytest.raises(KeyError):
+        scheduler.call(broken)
+
+    assert len(attempts) == 1
+    assert scheduler.counters['retried'] == 0
+
+
+def test_backoff_stays_under_the_cap():
+
+    scheduler = RequestScheduler(backoff_base=0.5, backoff_cap=2.0)
+
+    assert all(0.0 <= scheduler.backoff(attempt=attempt) <= 2.0 for attempt in range(1, 20))
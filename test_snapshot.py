@@ -0,0 +1,94 @@
+import operator
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyrobot.stock_frame import StockFrame
+from pyrobot.indicators import Indicators
+from pyrobot.snapshot import Snapshot
+
+
+START = 1_600_000_000_000
+
+
+def make_columns(symbols=('AAA', 'BBB', 'CCC'), periods=300, first=0, seed=5):
+
+    rng = np.random.default_rng(seed + first)
+    closes = 100.0 + np.cumsum(rng.normal(size=len(symbols) * periods))
+
+    return {
+        'symbol': np.repeat(symbols, periods).astype(object),
+        'datetime': np.tile(START + (first + np.arange(periods)) * 60_000, len(symbols)).astype('int64'),
+        'open': closes - 0.25,
+        'close': closes,
+        'high': closes + 1.0,
+        'low': closes - 1.0,
+        'volume': rng.integers(1, 1000, size=len(symbols) * periods)
+    }
+
+
+def add_indicators(indicators: Indicators) -> None:
+
+    indicators.rsi(period=14)
+    indicators.sma(period=20)
+    indicators.ema(period=50)
+    indicators.macd()
+
+    indicators.set_indicator_signals(indicator='rsi_14', buy=30.0, sell=70.0, condition_buy=operator.le, condition_sell=operator.ge)
+    indicators.set_indicator_signal_compare(indicator_1='sma_20', indicator_2='ema_50', condition_buy=operator.gt,
+                                            condition_sell=operator.lt, crossover=True)
+
+
+@pytest.mark.parametrize('storage, compact', [('frame', False), ('ring', False), ('frame', True)])
+def test_snapshot_round_trip_carries_on_streaming(tmp_path, storage, compact):
+
+    stock_frame = StockFrame(data=make_columns(), storage=storage, compact=compact)
+    indicators = Indicators(price_data_frame=stock_frame, streaming=True)
+    add_indicators(indicators=indicators)
+
+    Snapshot(folder=tmp_path).save(stock_frame=stock_frame, indicator_client=indicators, metadata={'session': 1})
+    loaded_frame, loaded_indicators, metadata = Snapshot(folder=tmp_path).load()
+
+    assert metadata == {'session': 1}
+    pd.testing.assert_frame_equal(loaded_frame.frame, stock_frame.frame)
+
+    # Both carry on from their streaming states and stay identical.
+    new_bars = make_columns(periods=5, first=300)
+    for frame, client in [(stock_frame, indicators), (loaded_frame, loaded_indicators)]:
+        frame.add_rows(data=new_bars)
+        client.refresh()
+
+    pd.testing.assert_frame_equal(loaded_frame.frame, stock_frame.frame)
+    pd.testing.assert_frame_equal(loaded_indicators.signal_matrix(), indicators.signal_matrix())
+
+
+def test_saving_again_replaces_the_old_files(tmp_path):
+
+    snapshot = Snapshot(folder=tmp_path)
+    stock_frame = StockFrame(data=make_columns())
+    indicators = Indicators(price_data_frame=stock_frame, streaming=True)
+    add_indicators(indicators=indicators)
+
+    snapshot.save(stock_frame=stock_frame, indicator_client=indicators)
+    files = set(tmp_path.glob('snapshot_*.npy'))
+
+    snapshot.save(stock_frame=stock_frame)
+
+    assert not files & set(tmp_path.glob('snapshot_*.npy'))
+    assert snapshot.load()[1] is None
+
+
+def test_snapshot_errors(tmp_path):
+
+    with pytest.raises(ValueError):
+        Snapshot(folder=tmp_path).load()
+
+    stock_frame = StockFrame(data=make_columns(periods=30))
+    indicators = Indicators(price_data_frame=stock_frame)
+    indicators.rsi(period=14)
+    indicators.set_indicator_signals(indicator='rsi_14', buy=30.0, sell=70.0, condition_buy=lambda a, b: a < b, condition_sell=operator.ge)
+
+    # A lambda can't be looked up again by name.
+    with pytest.raises(ValueError):
+        Snapshot(folder=tmp_path).save(stock_frame=stock_frame, indicator_client=indicators)
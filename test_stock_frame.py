@@ -0,0 +1,370 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyrobot.stock_frame import StockFrame
+
+
+START = 1_600_000_000_000
+
+
+def make_bars(symbols=('BBB', 'AAA'), periods=50, first=0):
+
+    return [
+        {
+            'symbol': symbol,
+            'open': position + 0.25,
+            'close': position + 0.5,
+            'high': position + 1.0,
+            'low': position - 1.0,
+            'volume': 100 + position,
+            'datetime': START + position * 60_000
+        }
+        for symbol in symbols
+        for position in range(first, first + periods)
+    ]
+
+
+def test_storage_has_to_be_known():
+
+    with pytest.raises(ValueError):
+        StockFrame(data=make_bars(), storage='list')
+
+
+def test_ring_storage_keeps_the_newest_bars_per_symbol():
+
+    ring_frame = StockFrame(data=make_bars(periods=50), storage='ring', max_history=30)
+    ring_frame.add_rows(data=make_bars(symbols=('AAA', 'BBB', 'CCC'), periods=10, first=50))
+
+    full_frame = StockFrame(data=make_bars(periods=60) + make_bars(symbols=('CCC',), periods=10, first=50))
+    expected = full_frame.frame.groupby(level='symbol').tail(30)
+
+    pd.testing.assert_frame_equal(ring_frame.frame, expected, check_dtype=False, check_index_type=False)
+    assert ring_frame.frame.loc['AAA'].shape[0] == 30
+    assert ring_frame.frame.loc['CCC'].shape[0] == 10
+
+
+def test_ring_storage_keeps_indicator_columns_across_appends():
+
+    from pyrobot.indicators import Indicators
+
+    ring_frame = StockFrame(data=make_bars(periods=50), storage='ring', max_history=30)
+    indicators = Indicators(price_data_frame=ring_frame, streaming=True)
+    indicators.sma(period=5)
+
+    for first in range(50, 60):
+        ring_frame.add_rows(data=make_bars(symbols=('AAA', 'BBB', 'CCC'), periods=1, first=first))
+        indicators.refresh()
+
+    groups = ring_frame.frame.groupby(level='symbol')
+    expected = groups['close'].transform(lambda closes: closes.rolling(5).mean())
+
+    # The oldest rows still carry values computed from bars the ring has
+    # since dropped, so only compare once a full window is in the ring.
+    full_window = groups.cumcount().to_numpy() >= 4
+
+    np.testing.assert_array_equal(ring_frame.frame['sma_5'].to_numpy()[full_window], expected.to_numpy()[full_window])
+
+
+def test_ring_rebuild_lines_up_carried_columns_by_bar():
+
+    ring_frame = StockFrame(data=make_bars(symbols=('AAA', 'BBB', 'CCC'), periods=20), storage='ring', max_history=30)
+    ring_frame.frame['marker'] = np.arange(ring_frame.frame.shape[0], dtype='float64')
+    previous_frame = ring_frame.frame
+
+    # AAA outgrows the ring, BBB slides a little, CCC gets nothing and DDD is new.
+    ring_frame.add_rows(data=(
+        make_bars(symbols=('AAA',), periods=40, first=20) +
+        make_bars(symbols=('BBB',), periods=15, first=19) +
+        make_bars(symbols=('DDD',), periods=5)
+    ))
+
+    frame = ring_frame.frame
+
+    assert frame.index.equals(pd.MultiIndex.from_frame(frame.index.to_frame()))
+    np.testing.assert_array_equal(frame['marker'].to_numpy(), previous_frame['marker'].reindex(frame.index).to_numpy())
+    assert frame.loc['BBB', 'marker'].notna().sum() == 16
+
+
+def test_symbol_slices_are_cached_until_rows_change():
+
+    stock_frame = StockFrame(data=make_bars(periods=20))
+
+    symbol_slices = stock_frame.symbol_slices
+    symbol_groups = stock_frame.symbol_groups
+
+    assert stock_frame.symbol_slices is symbol_slices
+    assert stock_frame.symbol_groups is symbol_groups
+    assert symbol_slices == {'AAA': slice(0, 20), 'BBB': slice(20, 40)}
+
+    stock_frame.add_rows(data=make_bars(symbols=('AAA', 'ABC'), periods=2, first=20))
+
+    assert stock_frame.symbol_slices is not symbol_slices
+    assert stock_frame.symbol_groups is not symbol_groups
+
+    # The rebuilt slices match what a groupby finds.
+    expected = {
+        symbol: slice(int(positions[0]), int(positions[-1]) + 1)
+        for symbol, positions in stock_frame.frame.groupby(level='symbol').indices.items()
+    }
+
+    assert stock_frame.symbol_slices == expected
+    pd.testing.assert_frame_equal(stock_frame.symbol_frame(symbol='ABC'), stock_frame.frame.loc[['ABC']])
+
+
+def test_add_rows_takes_every_batch_shape():
+
+    new_bars = make_bars(symbols=('AAA', 'CCC'), periods=3, first=50)
+    expected = StockFrame(data=make_bars(periods=50) + new_bars).frame
+
+    columns = {column: [bar[column] for bar in new_bars] for column in new_bars[0]}
+    quotes = {
+        bar['symbol']: {
+            'openPrice': bar['open'],
+            'closePrice': bar['close'],
+            'highPrice': bar['high'],
+            'lowPrice': bar['low'],
+            'askSize': bar['volume'],
+            'bidSize': 0,
+            'quoteTimeInLong': bar['datetime']
+        }
+        for bar in new_bars[2::3]
+    }
+
+    for data in [new_bars, columns, {column: np.asarray(values) for column, values in columns.items()}, pd.DataFrame(new_bars)]:
+
+        stock_frame = StockFrame(data=make_bars(periods=50))
+        stock_frame.add_rows(data=data)
+
+        pd.testing.assert_frame_equal(stock_frame.frame, expected)
+
+    # Quotes keyed by symbol give one bar each.
+    stock_frame = StockFrame(data=make_bars(periods=50))
+    stock_frame.add_rows(data=quotes)
+
+    pd.testing.assert_frame_equal(stock_frame.frame, StockFrame(data=make_bars(periods=50) + new_bars[2::3]).frame)
+
+
+def test_add_rows_updates_bars_it_already_has():
+
+    stock_frame = StockFrame(data=make_bars(periods=10))
+
+    # The same bar twice in one batch, the last copy wins, and it replaces the stored bar.
+    repeated = make_bars(symbols=('AAA',), periods=1, first=9)
+    repeated_again = [dict(repeated[0], close=42.0)]
+
+    stock_frame.add_rows(data=repeated + repeated_again + make_bars(symbols=('AAA',), periods=1, first=10))
+
+    assert stock_frame.frame.shape[0] == 21
+    assert stock_frame.frame.loc[('AAA', pd.Timestamp(START + 9 * 60_000, unit='ms')), 'close'] == 42.0
+    assert stock_frame.frame.index.is_monotonic_increasing
+
+
+@pytest.mark.parametrize('bad_bar', [
+    {'close': np.nan},
+    {'high': np.inf},
+])
+def test_add_rows_rejects_bad_prices(bad_bar):
+
+    stock_frame = StockFrame(data=make_bars(periods=10))
+
+    with pytest.raises(ValueError):
+        stock_frame.add_rows(data=[dict(make_bars(periods=1, first=10)[0], **bad_bar)])
+
+
+def test_add_rows_rejects_missing_or_ragged_columns():
+
+    stock_frame = StockFrame(data=make_bars(periods=10))
+    columns = {column: [value] for column, value in make_bars(periods=1, first=10)[0].items()}
+
+    with pytest.raises(ValueError):
+        stock_frame.add_rows(data={column: values for column, values in columns.items() if column != 'volume'})
+
+    with pytest.raises(ValueError):
+        stock_frame.add_rows(data=dict(columns, close=[1.0, 2.0]))
+
+    assert stock_frame.frame.shape[0] == 20
+
+
+SESSION_OPEN = int(pd.Timestamp('2024-03-05 14:30').value // 10**6)
+
+
+def session_bars(symbols=('AAA', 'BBB'), days=2, seed=3):
+
+    # A minute bar for every minute from 9:00 to 16:30 New York time, some
+    # of them outside the regular session.
+    rng = np.random.default_rng(seed)
+    bars = []
+
+    for symbol in symbols:
+        for day in range(days):
+            for minute in range(-30, 420):
+
+                close = 100.0 + rng.normal()
+                bars.append({
+                    'symbol': symbol,
+                    'open': close + rng.normal(),
+                    'close': close,
+                    'high': close + 2.0,
+                    'low': close - 2.0,
+                    'volume': int(rng.integers(1, 1000)),
+                    'datetime': SESSION_OPEN + day * 86_400_000 + minute * 60_000
+                })
+
+    return bars
+
+
+def pandas_resample(frame, rule):
+
+    aggregations = {'open': 'first', 'close': 'last', 'high': 'max', 'low': 'min', 'volume': 'sum'}
+
+    return (
+        frame.reset_index(level='symbol')
+        .groupby('symbol')
+        .resample(rule)
+        .agg(aggregations)
+        .dropna()
+        .astype({'volume': 'int64'})
+    )
+
+
+def regular_hours(frame):
+
+    local_times = frame.index.get_level_values(1).tz_localize('UTC').tz_convert('America/New_York')
+    minutes = local_times.hour * 60 + local_times.minute
+
+    return frame[(minutes >= 9 * 60 + 30) & (minutes < 16 * 60)]
+
+
+def test_resample_matches_pandas():
+
+    stock_frame = StockFrame(data=session_bars())
+    regular = regular_hours(stock_frame.frame)
+
+    five_minutes = stock_frame.resample(bar_size=5).frame
+    pd.testing.assert_frame_equal(five_minutes, pandas_resample(regular, '5min'), check_index_type=False, check_names=False)
+
+    # Daily bars are labelled with the exchange midnight, in UTC.
+    days = stock_frame.resample(bar_size=1, bar_type='day').frame
+    expected = pandas_resample(regular, '1D')
+    expected.index = expected.index.set_levels(expected.index.levels[1] + pd.Timedelta(hours=5), level=1)
+
+    pd.testing.assert_frame_equal(days, expected, check_index_type=False, check_names=False)
+
+    assert stock_frame.resample(bar_size=5) is stock_frame.timeframes[('minute', 5)]
+
+    with pytest.raises(ValueError):
+        stock_frame.resample(bar_size=1, bar_type='week')
+
+
+def test_timeframes_follow_new_bars():
+
+    bars = session_bars()
+    split = SESSION_OPEN + 86_400_000 + 100 * 60_000 + 30_000
+
+    stock_frame = StockFrame(data=[bar for bar in bars if bar['datetime'] < split])
+    fifteen_minutes = stock_frame.resample(bar_size=15)
+
+    # A batch that lands in the middle of a fifteen minute bar.
+    stock_frame.add_rows(data=[bar for bar in bars if bar['datetime'] >= split])
+
+    pd.testing.assert_frame_equal(fifteen_minutes.frame, StockFrame(data=bars).resample(bar_size=15).frame)
+
+
+def test_compact_layout_shrinks_the_frame():
+
+    full_frame = StockFrame(data=session_bars())
+    compact_frame = StockFrame(data=session_bars(), compact=True)
+
+    frame = compact_frame.frame
+
+    assert isinstance(frame.index.levels[0], pd.CategoricalIndex)
+    assert frame['volume'].dtype == np.dtype('uint32')
+
+    # Prices around 100 survive float32 within the default tolerance.
+    for column in ['open', 'close', 'high', 'low']:
+        assert frame[column].dtype == np.dtype('float32')
+        np.testing.assert_allclose(frame[column].to_numpy(dtype='float64'), full_frame.frame[column].to_numpy(), rtol=0, atol=1e-4)
+
+    assert compact_frame.memory_usage().sum() < full_frame.memory_usage().sum()
+
+
+def test_compact_columns_widen_for_bars_that_need_it():
+
+    stock_frame = StockFrame(data=make_bars(periods=10), compact=True)
+
+    assert stock_frame.frame['close'].dtype == np.dtype('float32')
+    assert stock_frame.frame['volume'].dtype == np.dtype('uint32')
+
+    stock_frame.add_rows(data=[dict(make_bars(symbols=('AAA',), periods=1, first=10)[0], close=20000000.125, volume=-5)])
+
+    assert stock_frame.frame['close'].dtype == np.dtype('float64')
+    assert stock_frame.frame['volume'].dtype == np.dtype('int64')
+    assert stock_frame.frame['close'].iloc[10] == 20000000.125
+    assert isinstance(stock_frame.frame.index.levels[0], pd.CategoricalIndex)
+
+
+@pytest.mark.parametrize('storage', ['frame', 'ring'])
+def test_memory_usage_by_column_and_symbol(storage):
+
+    stock_frame = StockFrame(data=make_bars(symbols=('AAA', 'BBB', 'CCC'), periods=40), storage=storage)
+
+    by_column = stock_frame.memory_usage()
+    by_symbol = stock_frame.memory_usage(by='symbol')
+
+    assert set(['open', 'close', 'high', 'low', 'volume', 'index']).issubset(by_column.index)
+    assert list(by_symbol.index) == ['AAA', 'BBB', 'CCC']
+
+    # Every symbol has the same number of bars, so the same share.
+    assert by_symbol.nunique() == 1
+    assert abs(by_symbol.sum() - by_column.sum()) <= len(by_symbol)
+
+    with pytest.raises(ValueError):
+        stock_frame.memory_usage(by='row')
+
+
+@pytest.mark.parametrize('storage', ['frame', 'ring'])
+def test_revised_bars_reach_listeners_and_timeframes(storage):
+
+    bars = session_bars(days=1)
+    last_time = max(bar['datetime'] for bar in bars)
+
+    stock_frame = StockFrame(data=bars, storage=storage)
+    fifteen_minutes = stock_frame.resample(bar_size=15, extended_hours=True)
+
+    batches = []
+    stock_frame.add_bar_listener(batches.append)
+
+    # The last AAA bar gets its final prices, and a new BBB bar arrives.
+    revised_bar = [dict(bar, close=500.0, high=500.0) for bar in bars if bar['symbol'] == 'AAA' and bar['datetime'] == last_time]
+    new_bar = [dict(bar, datetime=last_time + 60_000) for bar in bars if bar['symbol'] == 'BBB' and bar['datetime'] == last_time]
+
+    stock_frame.add_rows(data=revised_bar + new_bar)
+
+    assert list(batches[0]['symbol']) == ['AAA', 'BBB']
+    assert list(batches[0]['revised']) == [True, False]
+
+    expected_bars = [revised_bar[0] if (bar['symbol'], bar['datetime']) == ('AAA', last_time) else bar for bar in bars] + new_bar
+
+    # Ring frames keep their times in nanoseconds.
+    pd.testing.assert_frame_equal(
+        fifteen_minutes.frame,
+        StockFrame(data=expected_bars).resample(bar_size=15, extended_hours=True).frame,
+        check_index_type=storage == 'frame'
+    )
+    assert fifteen_minutes.frame.loc['AAA', 'high'].iloc[-1] == 500.0
+
+
+def test_ring_timeframes_are_capped_like_the_base_frame():
+
+    stock_frame = StockFrame(data=session_bars(days=1), storage='ring', max_history=100)
+    five_minutes = stock_frame.resample(bar_size=5, extended_hours=True)
+
+    next_day = sorted([dict(bar, datetime=bar['datetime'] + 86_400_000) for bar in session_bars(days=1)], key=lambda bar: bar['datetime'])
+
+    # Ten minutes at a time, so the ring never drops a bar before it's resampled.
+    for first in range(0, len(next_day), 20):
+        stock_frame.add_rows(data=next_day[first:first + 20])
+
+    assert five_minutes.frame.groupby(level='symbol').size().tolist() == [100, 100]
+    assert five_minutes.frame.index.get_level_values(1).max() == pd.Timestamp(SESSION_OPEN + 86_400_000 + 415 * 60_000, unit='ms')
@@ -0,0 +1,80 @@
+import pytest
+
+pytest.importorskip('td')
+
+from pyrobot.streaming import BarAggregator, ReplayFeed
+
+
+START = 1_700_000_040_000
+
+
+def test_ticks_roll_up_into_aligned_bars():
+
+    aggregator = BarAggregator(bar_seconds=60)
+
+    assert aggregator.add_tick(symbol='MSFT', price=10.0, volume=1, timestamp=START + 1_000) == []
+    aggregator.add_tick(symbol='MSFT', price=12.0, volume=2, timestamp=START + 20_000)
+    aggregator.add_tick(symbol='MSFT', price=9.0, volume=3, timestamp=START + 40_000)
+
+    closed_bars = aggregator.add_tick(symbol='MSFT', price=11.0, volume=4, timestamp=START + 61_000)
+
+    assert closed_bars == [{
+        'symbol': 'MSFT',
+        'open': 10.0,
+        'close': 9.0,
+        'high': 12.0,
+        'low': 9.0,
+        'volume': 6,
+        'datetime': START
+    }]
+
+
+def test_late_ticks_are_dropped_and_close_bars_flushes_by_time():
+
+    aggregator = BarAggregator(bar_seconds=60)
+
+    aggregator.add_tick(symbol='MSFT', price=10.0, volume=1, timestamp=START + 61_000)
+    aggregator.add_tick(symbol='AAPL', price=20.0, volume=1, timestamp=START + 62_000)
+
+    # A tick for the bar before the open one can't change anything.
+    assert aggregator.add_tick(symbol='MSFT', price=99.0, volume=1, timestamp=START + 1_000) == []
+
+    assert aggregator.close_bars(timestamp=START + 119_999) == []
+
+    closed_bars = aggregator.close_bars(timestamp=START + 120_000)
+
+    assert [bar['symbol'] for bar in closed_bars] == ['MSFT', 'AAPL']
+    assert closed_bars[0]['high'] == 10.0
+
+
+def test_late_ticks_do_not_reopen_a_closed_bar():
+
+    aggregator = BarAggregator(bar_seconds=60)
+
+    for price, offset in [(10.0, 1_000), (12.0, 2_000), (10.0, 3_000), (12.0, 4_000)]:
+        aggregator.add_tick(symbol='MSFT', price=price, volume=50, timestamp=START + offset)
+
+    # Time moves on through another symbol's feed, which closes the MSFT bar.
+    closed_bars = aggregator.close_bars(timestamp=START + 60_000)
+    assert closed_bars[0]['volume'] == 200
+
+    # A late MSFT tick for the closed bar is dropped rather than starting a
+    # new bar that would overwrite the real one.
+    assert aggregator.add_tick(symbol='MSFT', price=11.0, volume=100, timestamp=START + 59_000) == []
+    assert aggregator.close_bars() == []
+
+    aggregator.add_tick(symbol='MSFT', price=13.0, volume=1, timestamp=START + 61_000)
+    assert aggregator.close_bars()[0]['datetime'] == START + 60_000
+
+
+def test_replay_feed_round_trips_messages(tmp_path):
+
+    messages = [
+        {'type': 'tick', 'symbol': 'MSFT', 'price': 10.0 + position, 'volume': 1, 'timestamp': START + position * 1_000}
+        for position in range(5)
+    ]
+
+    file_path = tmp_path.joinpath('replay.jsonl')
+    ReplayFeed.record(file_path=file_path, messages=messages)
+
+    assert list(ReplayFeed(file_path=file_path)) == messages
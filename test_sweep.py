@@ -0,0 +1,79 @@
+import operator
+
+import numpy as np
+import pytest
+
+from pyrobot.stock_frame import StockFrame
+from pyrobot.indicators import Indicators
+from pyrobot.sweep import ParameterSweep, _indicator_values
+
+
+START = 1_600_000_000_000
+
+
+def make_stock_frame(periods=300):
+
+    rng = np.random.default_rng(3)
+    bars = []
+
+    for symbol in ['AAA', 'BBB', 'CCC']:
+
+        closes = 100.0 * np.exp(np.cumsum(rng.normal(scale=0.01, size=periods)))
+
+        for position, close in enumerate(closes):
+            bars.append({
+                'symbol': symbol,
+                'open': close,
+                'close': close,
+                'high': close + 0.5,
+                'low': close - 0.5,
+                'volume': 100,
+                'datetime': START + position * 60_000
+            })
+
+    return StockFrame(data=bars)
+
+
+@pytest.mark.parametrize('indicator, column', [('rsi', 'rsi_14'), ('sma', 'sma_14'), ('ema', 'ema_14')])
+def test_sweep_indicators_match_the_indicator_columns(indicator, column):
+
+    stock_frame = make_stock_frame()
+    getattr(Indicators(price_data_frame=stock_frame), indicator)(period=14)
+
+    for symbol in ['AAA', 'CCC']:
+        symbol_frame = stock_frame.symbol_frame(symbol=symbol)
+        np.testing.assert_array_equal(
+            _indicator_values(indicator=indicator, closes=symbol_frame['close'].to_numpy(), parameters={'period': 14}),
+            symbol_frame[column].to_numpy()
+        )
+
+    with pytest.raises(ValueError):
+        _indicator_values(indicator='macd', closes=np.ones(5), parameters={'period': 14})
+
+
+def test_sweep_scores_every_combination():
+
+    stock_frame = make_stock_frame()
+
+    results = ParameterSweep(stock_frame=stock_frame, max_workers=2).run(
+        indicator='rsi',
+        parameter_grid={'period': [7, 14, 21]},
+        buy_thresholds=[30.0, 101.0],
+        sell_thresholds=[70.0, 1000.0],
+        buy_operator=operator.le,
+        sell_operator=operator.ge
+    )
+
+    assert results.shape[0] == 3 * 2 * 2
+    assert results['total_return'].is_monotonic_decreasing
+
+    # RSI has no value on the first bar, so buying whenever it has one and
+    # never selling holds each symbol from the close of its second bar.
+    closes = stock_frame.frame['close'].to_numpy().reshape(3, -1)
+    buy_and_hold = (closes[:, -1] / closes[:, 1] - 1.0).mean()
+
+    always_long = results[(results['buy'] == 101.0) & (results['sell'] == 1000.0)]
+
+    np.testing.assert_allclose(always_long['total_return'].to_numpy(), buy_and_hold)
+    np.testing.assert_allclose(always_long['exposure'].to_numpy(), 1.0 - 6.0 / stock_frame.frame.shape[0])
+    assert (always_long['trades'] == 3).all()
@@ -99,7 +99,7 @@ class Trade():
         return self.order
 
     def instrument(self, symbol: str, quantity: int, asset_type: str, sub_asset_type: str = None, order_leg_id: int = 0) -> dict:
-        leg = self.order['orderLegCollection']['order_leg_id']
+        leg = self.order['orderLegCollection'][order_leg_id]
 
         leg['instrument']['symbol'] = symbol
         leg['instrument']['assetType'] = asset_type
@@ -301,6 +301,11 @@ class Trade():
 
         self._order_response = order_response_dict
 
+    def _process_order_response(self) -> None:
+
+        self.order_id = self._order_response.get('order_id', '')
+        self.order_status = 'PLACED' if self._order_response.get('status_code') in [200, 201] else 'UNKNOWN'
+
     def _generate_order_id(self) -> str:
         if self.order:
 
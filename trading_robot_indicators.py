@@ -50,7 +50,7 @@ historical_prices = trading_robot.grab_historical_prices(
 
 # Convert data to a Data Frame.
 stock_frame = trading_robot.create_stock_frame(
-    data=historical_prices['aggregated']
+    data=historical_prices['columns']
 )
 
 # We can also add the stock frame to the Portfolio object.